@@ -228,3 +228,116 @@ if REDIS_URL:
     SESSION_ENGINE = "django.contrib.sessions.backends.cache"
     SESSION_CACHE_ALIAS = "default"
 # If REDIS_URL is not set (e.g., local development), Django will use its default DB session backend.
+
+# Search execution settings
+# 'concurrent' fans every provider out at once on a shared thread pool; 'sequential' runs them one by one.
+SEARCH_EXECUTION_MODE = os.getenv("SEARCH_EXECUTION_MODE", "concurrent")
+SEARCH_EXECUTOR_MAX_WORKERS = int(os.getenv("SEARCH_EXECUTOR_MAX_WORKERS", "16")) # Upper bound on in-flight provider calls per process
+# 'sdk' uses the vendor SDKs / requests; 'httpx' uses the native asyncio provider layer with pooled keep-alive clients.
+SEARCH_PROVIDER_BACKEND = os.getenv("SEARCH_PROVIDER_BACKEND", "sdk")
+HTTPX_MAX_CONNECTIONS = int(os.getenv("HTTPX_MAX_CONNECTIONS", "100"))
+HTTPX_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTPX_MAX_KEEPALIVE_CONNECTIONS", "20"))
+
+# Exa.ai research report settings
+# When deferred, the report is generated in the background and the chat page polls for it.
+EXA_REPORT_DEFERRED = os.getenv("EXA_REPORT_DEFERRED", "True") == "True"
+EXA_REPORT_PENDING_TIMEOUT = int(os.getenv("EXA_REPORT_PENDING_TIMEOUT", "300")) # Seconds before a stuck report task is given up on
+EXA_REPORT_CACHE_TIMEOUT = int(os.getenv("EXA_REPORT_CACHE_TIMEOUT", "3600")) # Seconds a finished report is kept for reuse
+EXA_REPORT_ERROR_CACHE_TIMEOUT = int(os.getenv("EXA_REPORT_ERROR_CACHE_TIMEOUT", "60")) # Seconds a failed report is kept, long enough for waiting pages to show the error
+
+# Stream search results to the chat page with Server-Sent Events as each provider finishes
+SEARCH_STREAMING_ENABLED = os.getenv("SEARCH_STREAMING_ENABLED", "True") == "True"
+
+# Shared search-result cache (uses CACHES['default']: Redis on Render, locmem locally)
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "True") == "True"
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "3600")) # Seconds a cached result set or report is served as fresh
+SEARCH_CACHE_STALE_TTL = int(os.getenv("SEARCH_CACHE_STALE_TTL", "86400")) # Further seconds it is served stale while refreshing in the background
+
+# Memoization of LLM-optimized query strings (in-process LRU + shared cache)
+QUERY_OPTIMIZER_MEMO_SIZE = int(os.getenv("QUERY_OPTIMIZER_MEMO_SIZE", "1024")) # Entries kept in each process
+QUERY_OPTIMIZER_MEMO_TTL = int(os.getenv("QUERY_OPTIMIZER_MEMO_TTL", str(30 * 24 * 3600))) # Seconds kept in the shared cache
+
+# Query optimizer: 'llm' (Gemini), 'local' (rule-based, no LLM call) or 'hybrid' (local, Gemini only when the local rewrite looks weak)
+QUERY_OPTIMIZER_MODE = os.getenv("QUERY_OPTIMIZER_MODE", "llm")
+# Extra abbreviation expansions for the local optimizer, e.g. {"RAG": "Retrieval Augmented Generation"}
+QUERY_ABBREVIATIONS = {}
+# Ask Gemini for every provider-specific rewrite in one JSON response instead of one call per provider family
+QUERY_OPTIMIZER_BATCHED = os.getenv("QUERY_OPTIMIZER_BATCHED", "True") == "True"
+
+# Speculative dispatch: start these latency-sensitive providers on the raw query while the LLM optimizer runs,
+# keeping their results when the rewrite is equivalent and reissuing them otherwise (costs extra API calls)
+SEARCH_SPECULATIVE_DISPATCH = os.getenv("SEARCH_SPECULATIVE_DISPATCH", "False") == "True"
+SEARCH_SPECULATIVE_PROVIDERS = ["tavily", "exa"]
+
+# Latency budget (seconds) for a whole search; providers still running at the deadline are shown when they arrive. 0 disables it
+SEARCH_LATENCY_BUDGET = float(os.getenv("SEARCH_LATENCY_BUDGET", "6"))
+SEARCH_LATE_RESULTS_TIMEOUT = int(os.getenv("SEARCH_LATE_RESULTS_TIMEOUT", "600")) # Seconds late provider results are kept for the chat page to pick up
+
+# Per-provider circuit breakers (state shared across workers through the cache) and adaptive timeouts
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5")) # Consecutive failures or slow calls that open a breaker
+CIRCUIT_BREAKER_WINDOW = int(os.getenv("CIRCUIT_BREAKER_WINDOW", "60")) # Seconds a failure streak is remembered
+CIRCUIT_BREAKER_COOLDOWN = int(os.getenv("CIRCUIT_BREAKER_COOLDOWN", "30")) # Seconds a provider is skipped before one probe call is let through
+ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "2.0")) # Timeout = observed p95 latency x multiplier
+ADAPTIVE_TIMEOUT_MIN = float(os.getenv("ADAPTIVE_TIMEOUT_MIN", "2.0"))
+# Upper bound (and initial value) of each provider's timeout in seconds, e.g. {"scholar": 10}
+PROVIDER_TIMEOUTS = {}
+
+# Hedged requests: a duplicate is sent when the first attempt has not answered by the provider's p90 latency
+HEDGED_PROVIDERS = ["scholar", "scrape"]
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1")) # Spend cap: at most this many hedges per call in each window
+HEDGE_BUDGET_WINDOW = int(os.getenv("HEDGE_BUDGET_WINDOW", "3600")) # Seconds; hedge counters and metrics reset after each window
+
+# Per-provider token buckets and concurrency limits for outbound API calls (in Redis when it is the cache, else per process).
+# Overrides for rate_limit.DEFAULT_RATE_LIMITS, e.g. {"serpapi": {"rate": 1.0, "burst": 3, "concurrency": 2}}
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True") == "True"
+EXA_RESEARCH_CONCURRENCY = int(os.getenv("EXA_RESEARCH_CONCURRENCY", "15")) # Research reports in flight across all workers; match the Exa.ai key's quota
+EXA_RESEARCH_RATE = float(os.getenv("EXA_RESEARCH_RATE", "1.0")) # Research reports started per second
+PROVIDER_RATE_LIMITS = {
+    "exa_research": {"rate": EXA_RESEARCH_RATE, "concurrency": EXA_RESEARCH_CONCURRENCY},
+}
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "5")) # Seconds a call may queue for a token or slot before failing
+
+# Single-flight: identical searches in flight at the same time (in any worker) wait for one leader instead of repeating it
+SEARCH_SINGLE_FLIGHT = os.getenv("SEARCH_SINGLE_FLIGHT", "True") == "True"
+SINGLE_FLIGHT_WAIT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_WAIT_TIMEOUT", "20")) # Seconds followers wait before one of them takes over a slow search
+SINGLE_FLIGHT_LOCK_TIMEOUT = int(os.getenv("SINGLE_FLIGHT_LOCK_TIMEOUT", "60")) # Seconds before a dead leader's lock expires and waiting followers give up
+
+# Provider registry overrides (see research_assistant/providers.py); the ProviderConfig admin wins over these.
+# e.g. {"scholar": {"enabled": False}, "exa": {"num_results": 5, "timeout": 10}}
+SEARCH_PROVIDER_OVERRIDES = {}
+SEARCH_DISABLED_COST_CLASSES = [] # e.g. ["premium"] to switch off every premium provider
+
+# Near-duplicate collapse of merged results (MinHash over title and snippet, see research_assistant/near_duplicates.py)
+NEAR_DUPLICATE_ENABLED = os.getenv("NEAR_DUPLICATE_ENABLED", "True") == "True"
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.5")) # Estimated Jaccard similarity at which two results are one work
+
+# Searches whose results are kept in the database per user (research_assistant/result_store.py); older ones are deleted
+SEARCH_SESSIONS_KEPT_PER_USER = int(os.getenv("SEARCH_SESSIONS_KEPT_PER_USER", "20"))
+
+# Persistent cache of scraped article text, keyed by canonical URL (research_assistant/scrape_cache.py)
+SCRAPE_CACHE_ENABLED = os.getenv("SCRAPE_CACHE_ENABLED", "True") == "True"
+SCRAPE_CACHE_TTL = int(os.getenv("SCRAPE_CACHE_TTL", str(7 * 24 * 3600))) # Seconds a scrape is fresh; after that it is revalidated
+SCRAPE_CACHE_NEGATIVE_TTL = int(os.getenv("SCRAPE_CACHE_NEGATIVE_TTL", str(6 * 3600))) # Seconds a hard failure (403, 404, no text) is remembered
+SCRAPE_CACHE_MAX_BYTES = int(os.getenv("SCRAPE_CACHE_MAX_BYTES", str(200 * 1024 * 1024))) # Compressed text kept before least recently used entries are evicted
+SCRAPE_CACHE_TOUCH_INTERVAL = int(os.getenv("SCRAPE_CACHE_TOUCH_INTERVAL", "3600")) # Seconds between last-use writes for the same entry (LRU precision)
+
+# Scraping for Summarize/Save: 'race' scrapes the PDF, publication page and result URL at once, 'serial' tries them in turn
+SCRAPE_CANDIDATE_MODE = os.getenv("SCRAPE_CANDIDATE_MODE", "race")
+SCRAPE_MAX_CANDIDATES = int(os.getenv("SCRAPE_MAX_CANDIDATES", "3")) # Caps ScraperAPI requests per click
+SCRAPE_ALTERNATE_URLS = os.getenv("SCRAPE_ALTERNATE_URLS", "False") == "True" # Also try the other URLs a merged result was found under (more paid requests per click)
+SCRAPE_RACE_PREFERENCE_WAIT = float(os.getenv("SCRAPE_RACE_PREFERENCE_WAIT", "3")) # Seconds preferred candidates still get once a less preferred one has succeeded
+
+# Limits for scraped documents: downloads are streamed and cut off at the byte cap (PDF and HTML alike),
+# and PDF text is extracted page by page until enough characters for a summary have been collected
+SCRAPE_MAX_DOWNLOAD_BYTES = int(os.getenv("SCRAPE_MAX_DOWNLOAD_BYTES", str(15 * 1024 * 1024)))
+SCRAPE_PDF_MAX_PAGES = int(os.getenv("SCRAPE_PDF_MAX_PAGES", "30"))
+SCRAPE_MAX_TEXT_CHARS = int(os.getenv("SCRAPE_MAX_TEXT_CHARS", "20000")) # The summary prompt uses the first 10,000
+
+# PDF/HTML text extraction (research_assistant/extraction.py): 'process' runs it in a lazily started process pool, 'inline' in the request thread
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "inline" if DEBUG else "process")
+EXTRACTION_MAX_WORKERS = int(os.getenv("EXTRACTION_MAX_WORKERS", "2")) # Per web worker process
+EXTRACTION_MAX_TASKS_PER_CHILD = int(os.getenv("EXTRACTION_MAX_TASKS_PER_CHILD", "50")) # Jobs before a pool process is replaced (caps pdfminer memory growth)
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "30")) # Seconds one extraction may take
+
+# HTML main-content extractor: 'lxml' (single tree walk, ~3x faster) or 'bs4' (BeautifulSoup); compare with manage.py benchmark_html_extractors
+HTML_EXTRACTOR = os.getenv("HTML_EXTRACTOR", "lxml")
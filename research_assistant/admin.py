@@ -1,8 +1,19 @@
 # research_assistant/admin.py
 from django.contrib import admin
-from .models import Folder, LibraryItem, ChatMessage
+from .models import Folder, LibraryItem, ChatMessage, ProviderConfig, ScrapedPage
 
 admin.site.register(Folder)
 admin.site.register(LibraryItem)
 admin.site.register(ChatMessage)
 
+@admin.register(ProviderConfig)
+class ProviderConfigAdmin(admin.ModelAdmin):
+    list_display = ('key', 'enabled', 'num_results', 'timeout', 'updated_at')
+    list_editable = ('enabled', 'num_results', 'timeout')
+
+
+@admin.register(ScrapedPage)
+class ScrapedPageAdmin(admin.ModelAdmin):
+    list_display = ('url', 'content_type', 'size', 'error', 'fetched_at', 'expires_at', 'last_used_at')
+    search_fields = ('url',)
+    exclude = ('text',)
@@ -0,0 +1,318 @@
+# research_assistant/async_providers.py
+"""
+Native asyncio provider layer built on httpx.
+
+All providers share one keep-alive `httpx.AsyncClient` (HTTP/2 when the `h2` package is installed)
+that lives on a single background event loop per process. Sync code talks to this layer through
+`submit()` (returns a concurrent.futures.Future) and `run_sync()`, so Django's sync views keep working
+while the socket waiting happens on the event loop instead of in a blocked worker thread.
+
+Response parsing is shared with the SDK-based functions in services.py, so both backends return
+identical result dicts.
+"""
+import abc
+import asyncio
+import functools
+import importlib.util
+import threading
+from urllib.parse import quote
+
+import httpx
+from django.conf import settings
+
+from . import rate_limit, resilience, services
+
+# HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 keep-alive without it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+SERPAPI_SEARCH_URL = "https://serpapi.com/search.json"
+EXA_SEARCH_URL = "https://api.exa.ai/search"
+EXA_CHAT_COMPLETIONS_URL = "https://api.exa.ai/chat/completions"
+
+
+class ProviderError(Exception):
+    """Raised by an async provider when a search fails. The message is shown to the user as-is."""
+
+
+# --- Event loop and shared client ---
+
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+
+
+def get_event_loop():
+    """Returns the process-wide event loop, starting its daemon thread on first use."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="async-providers", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def get_http_client():
+    """
+    Returns the shared httpx.AsyncClient. Must be called from the provider event loop,
+    which owns the client's connection pool.
+    """
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=getattr(settings, 'HTTPX_MAX_CONNECTIONS', 100),
+                max_keepalive_connections=getattr(settings, 'HTTPX_MAX_KEEPALIVE_CONNECTIONS', 20),
+                keepalive_expiry=getattr(settings, 'HTTPX_KEEPALIVE_EXPIRY', 30.0),
+            ),
+            timeout=httpx.Timeout(getattr(settings, 'HTTPX_DEFAULT_TIMEOUT', 20.0)),
+            follow_redirects=True,
+        )
+    return _client
+
+
+def submit(coro):
+    """Schedules `coro` on the provider event loop and returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def run_sync(coro, timeout=None):
+    """Sync shim: runs `coro` on the provider event loop and blocks until it finishes."""
+    return submit(coro).result(timeout)
+
+
+# --- Providers ---
+
+class AsyncSearchProvider(abc.ABC):
+    """
+    Base class for native asyncio search providers.
+    Subclasses implement `search(query)`, returning a list of result dicts or raising ProviderError.
+    PROVIDERS instantiates every subclass at import, so one without `search` fails right there.
+    """
+    name = None
+
+    @abc.abstractmethod
+    async def search(self, query, num_results=7, timeout=None):
+        """Returns the provider's raw result dicts for `query`."""
+
+    async def search_with_error(self, query, **kwargs):
+        """Adapts `search` to the (results, error) tuple returned by the sync functions in services.py."""
+        try:
+            return await self.search(query, **kwargs), None
+        except ProviderError as e:
+            return [], str(e)
+        except Exception as e:
+            return [], f"An unexpected error occurred during {self.name} search: {e}"
+
+
+class TavilyProvider(AsyncSearchProvider):
+    name = "tavily"
+
+    async def search(self, query, num_results=7, timeout=None, search_depth="basic"):
+        try:
+            async with rate_limit.limit_async("tavily"):
+                response = await get_http_client().post(
+                    TAVILY_SEARCH_URL,
+                    timeout=timeout or httpx.USE_CLIENT_DEFAULT,
+                    headers={"Authorization": f"Bearer {settings.TAVILY_API_KEY}"},
+                    json={
+                        "query": query,
+                        "search_depth": search_depth,
+                        "max_results": num_results,
+                        "include_domains": services.ACADEMIC_DOMAINS,
+                    },
+                )
+            response.raise_for_status()
+            return response.json().get('results', [])
+        except httpx.HTTPError as e:
+            raise ProviderError(str(e)) from e
+
+
+class GoogleScholarProvider(AsyncSearchProvider):
+    name = "scholar"
+
+    async def search(self, query, num_results=7, timeout=None):
+        # SerpApi has a long latency tail, so slow searches may be hedged
+        return await resilience.hedged_acall(self.name, self._search_once, query, num_results, timeout)
+
+    async def _search_once(self, query, num_results, timeout):
+        try:
+            async with rate_limit.limit_async("serpapi"):
+                response = await get_http_client().get(
+                    SERPAPI_SEARCH_URL,
+                    timeout=timeout or httpx.USE_CLIENT_DEFAULT,
+                    params={
+                        "engine": "google_scholar",
+                        "q": query,
+                        "num": num_results,
+                        "api_key": settings.SERPAPI_API_KEY,
+                    },
+                )
+            # SerpApi reports most failures in the JSON body, which parse_scholar_results handles
+            results, error = services.parse_scholar_results(response.json())
+        except (httpx.HTTPError, ValueError) as e:
+            raise ProviderError(f"SerpApi Google Scholar search failed: {e}") from e
+        if error:
+            raise ProviderError(error)
+        return results
+
+
+class ExaProvider(AsyncSearchProvider):
+    name = "exa"
+
+    async def search(self, query, num_results=7, timeout=None):
+        try:
+            async with rate_limit.limit_async("exa"):
+                response = await get_http_client().post(
+                    EXA_SEARCH_URL,
+                    timeout=timeout or httpx.USE_CLIENT_DEFAULT,
+                    headers={"x-api-key": settings.EXA_API_KEY},
+                    json={
+                        "query": query,
+                        "numResults": num_results,
+                        "type": "neural",
+                        "includeDomains": services.ACADEMIC_DOMAINS,
+                        "contents": {"text": True},
+                    },
+                )
+            response.raise_for_status()
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise ProviderError(f"Exa.ai search failed: {e}") from e
+
+        exa_results = []
+        for result in data.get('results') or []:
+            normalized = services.normalize_exa_result(
+                result.get('title'), result.get('url'), result.get('text'),
+                result.get('author'), result.get('publishedDate'), query,
+            )
+            if normalized:
+                exa_results.append(normalized)
+        return exa_results
+
+
+class DOAJArticleProvider(AsyncSearchProvider):
+    name = "doaj"
+    base_url = services.DOAJ_API_ARTICLES_URL
+    label = "DOAJ API"
+
+    def parse(self, data, query):
+        return services.parse_doaj_articles(data, query)
+
+    async def search(self, query, num_results=7, timeout=None):
+        # DOAJ takes the query as a URL-encoded path parameter
+        full_url = f"{self.base_url}/{quote(query)}"
+        try:
+            async with rate_limit.limit_async("doaj"):
+                response = await get_http_client().get(
+                    full_url, params={"page": 1, "pageSize": num_results}, timeout=timeout or 15,
+                )
+            response.raise_for_status()
+            data = response.json()
+        except httpx.HTTPError as e:
+            raise ProviderError(f"{self.label} request failed: {e}") from e
+        except ValueError as e:
+            raise ProviderError(f"Failed to parse JSON response from {self.label}.") from e
+        return self.parse(data, query)
+
+
+class DOAJJournalProvider(DOAJArticleProvider):
+    name = "doaj_journals"
+    base_url = services.DOAJ_API_JOURNALS_URL
+    label = "DOAJ Journal API"
+
+    def parse(self, data, query):
+        return services.parse_doaj_journals(data, query)
+
+
+PROVIDERS = {
+    provider.name: provider
+    for provider in (
+        TavilyProvider(), GoogleScholarProvider(), ExaProvider(),
+        DOAJArticleProvider(), DOAJJournalProvider(),
+    )
+}
+
+
+# --- Exa research report and ScraperAPI ---
+
+async def generate_exa_research_report(query, timeout=None):
+    """Async counterpart of services.generate_exa_research_report, using the OpenAI-compatible Exa endpoint."""
+    try:
+        async with rate_limit.limit_async("exa_research"):
+            response = await get_http_client().post(
+                EXA_CHAT_COMPLETIONS_URL,
+                headers={"Authorization": f"Bearer {settings.EXA_API_KEY}"},
+                json={"model": "exa-research", "messages": services.exa_research_messages(query), "stream": False},
+                timeout=timeout or getattr(settings, 'EXA_RESEARCH_TIMEOUT', 120.0),
+            )
+        response.raise_for_status()
+        choices = response.json().get('choices') or []
+        content = choices[0].get('message', {}).get('content') if choices else None
+        return content or "No report content generated."
+    except Exception as e:
+        return f"🚨 Error generating Exa.ai Research Report: {e}"
+
+
+async def scrape_article_content(url, validators=None):
+    """
+    Async counterpart of the ScraperAPI fetch behind services.scrape_article_content (the scrape cache
+    stays on the sync side). Returns (text, error, info) like services._scrape_article_content_once.
+    """
+    if not url:
+        return None, "No URL provided.", {}
+    return await resilience.hedged_acall(
+        "scrape", _scrape_once, url, validators,
+        is_failure=lambda result: result[0] is None and not result[2].get("not_modified"),
+    )
+
+
+async def _scrape_once(url, validators=None):
+    try:
+        async with rate_limit.limit_async("scraperapi"):
+            # Streamed, so a huge PDF is cut off at SCRAPE_MAX_DOWNLOAD_BYTES instead of being buffered whole
+            async with get_http_client().stream(
+                "GET",
+                services.SCRAPERAPI_URL,
+                params=services.build_scraperapi_params(url, conditional=bool(validators)),
+                headers=dict(services.SCRAPERAPI_HEADERS, **(validators or {})),
+                timeout=30, # Increased timeout for ScraperAPI
+            ) as response:
+                if response.status_code == 304:
+                    return None, None, {"not_modified": True}
+                response.raise_for_status()
+                info = services.scrape_response_info(response.headers)
+                content, truncated = await _read_capped(response)
+    except httpx.HTTPStatusError as e:
+        info = {"permanent": e.response.status_code in services.PERMANENT_SCRAPE_STATUSES}
+        if e.response.status_code == 403:
+            return None, "Access Forbidden (403): Likely a paywall or anti-scraping measure. Cannot scrape full content even with ScraperAPI.", info
+        return None, f"HTTP error {e.response.status_code} during ScraperAPI request: {e}", info
+    except httpx.TimeoutException as e:
+        return None, f"Timeout during ScraperAPI request: {e}", {}
+    except httpx.TransportError as e:
+        return None, f"Connection error during ScraperAPI request: {e}", {}
+    except Exception as e:
+        return None, f"An unexpected error occurred during ScraperAPI request: {e}", {}
+
+    # Text extraction is CPU-bound; keep it off the event loop
+    text, error, transient = await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(services.extract_scraped_text, content, info["content_type"], truncated=truncated)
+    )
+    info["permanent"] = not transient # As in services._scrape_article_content_once
+    return text, error, info
+
+
+async def _read_capped(response):
+    """Async twin of services.read_capped for a streamed httpx response. Returns (content, truncated)."""
+    limit = getattr(settings, 'SCRAPE_MAX_DOWNLOAD_BYTES', 15 * 1024 * 1024)
+    buffer = bytearray()
+    async for chunk in response.aiter_bytes(services.SCRAPE_CHUNK_SIZE):
+        buffer += chunk
+        if len(buffer) >= limit:
+            print(f"DEBUG: Scrape download cut off at {limit} bytes")
+            return bytes(buffer[:limit]), True
+    return bytes(buffer), False
@@ -0,0 +1,182 @@
+# research_assistant/canonical_urls.py
+"""
+URL canonicalization for deduplication, cache keys and session keys.
+
+canonicalize() maps trivial variants of a URL onto one form: https, lower-case host without 'www.',
+no fragment, no tracking parameters, a sorted query and no trailing slash. The academic sites in
+services.ACADEMIC_DOMAINS also get per-domain rules, e.g. an arXiv PDF link and its abstract page,
+or the doi.org and dx.doi.org forms of a DOI, canonicalize to the same URL.
+
+url_id() is a short, stable hash of the canonical URL. Result cards, routes and session dicts key on
+it instead of on the (up to 2 KB) raw URL. The raw URL is still what gets linked and scraped.
+"""
+import hashlib
+import re
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit, urlunsplit
+
+URL_ID_LENGTH = 16
+
+# Only parameters known to be added by ad, analytics and mailing tools. Generic names such as 'source',
+# 'ref', 'sid' or 'sessionid' are left alone: some sites need them to serve the right document.
+_TRACKING_PARAMS = frozenset([
+    "fbclid", "gclid", "gclsrc", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid", "ttclid",
+    "igshid", "li_fat_id", "mc_cid", "mc_eid", "mkt_tok", "_ga", "_gl", "_hsenc", "_hsmi",
+    "__hstc", "__hssc", "__hsfp", "oly_anon_id", "oly_enc_id", "vero_id", "vero_conv",
+])
+_TRACKING_PREFIXES = ("utm_",)
+_DEFAULT_PORTS = {":80", ":443"}
+
+
+def _doi_host(path, query):
+    # https://dx.doi.org/10.1000/ABC -> https://doi.org/10.1000/abc (DOIs are case-insensitive)
+    return "doi.org", unquote(path).lower(), ""
+
+
+def _arxiv(path, query):
+    # /pdf/2101.00001v2.pdf, /abs/2101.00001v2 and /abs/2101.00001 are the same paper
+    match = re.match(r"^/(?:abs|pdf|html|format)/(.+?)(?:v\d+)?(?:\.pdf)?$", path)
+    if match:
+        return "arxiv.org", f"/abs/{match.group(1)}", ""
+    return "arxiv.org", path, query
+
+
+def _preprint(host):
+    # bioRxiv/medRxiv: /content/10.1101/x.y.zv1(.full|.full.pdf|.abstract) -> /content/10.1101/x.y.z
+    def rule(path, query):
+        return host, re.sub(r"(?:v\d+)?(?:\.full|\.abstract|\.full\.pdf|\.full-text)?$", "", path), ""
+    return rule
+
+
+def _pubmed(path, query):
+    # pubmed.ncbi.nlm.nih.gov/12345/ and ncbi.nlm.nih.gov/pubmed/12345
+    match = re.match(r"^(?:/pubmed)?/(\d+)$", path)
+    if match:
+        return "pubmed.ncbi.nlm.nih.gov", f"/{match.group(1)}", ""
+    return None
+
+
+def _sciencedirect(path, query):
+    # /science/article/abs/pii/S0000 and /science/article/pii/S0000/pdfft -> /science/article/pii/S0000
+    match = re.match(r"^/science/article/(?:abs/)?pii/(\w+)", path)
+    if match:
+        return "sciencedirect.com", f"/science/article/pii/{match.group(1).upper()}", ""
+    return "sciencedirect.com", path, query
+
+
+def _springer(host):
+    # /content/pdf/10.1007/x.pdf and /chapter|article/10.1007/x -> /article/10.1007/x
+    def rule(path, query):
+        match = re.match(r"^/content/pdf/(10\..+?)(?:\.pdf)?$", path)
+        if match:
+            return host, f"/article/{unquote(match.group(1))}", ""
+        return host, path, query
+    return rule
+
+
+def _doi_path(host):
+    # Atypon sites (Wiley, T&F, ACM, Science, NEJM, JAMA): /doi/abs|full|pdf|epdf|reader/10.x -> /doi/10.x
+    def rule(path, query):
+        match = re.match(r"^/doi/(?:abs|full|pdf|epdf|pdfdirect|reader|fullhtml|book)/(10\..+)$", path, re.IGNORECASE)
+        if match:
+            return host, f"/doi/{match.group(1)}", ""
+        return host, path, query
+    return rule
+
+
+def _nature(path, query):
+    # /articles/s41586-020-0000-0.pdf -> /articles/s41586-020-0000-0
+    return "nature.com", re.sub(r"^(/articles/[^/]+?)\.pdf$", r"\1", path), query
+
+
+def _frontiers(path, query):
+    # /articles/10.3389/x/full|pdf|abstract -> /articles/10.3389/x
+    return "frontiersin.org", re.sub(r"/(?:full|pdf|abstract)$", "", path, flags=re.IGNORECASE), query
+
+
+def _plos(host):
+    # /plosone/article/file?id=10.1371/x&type=printable -> /plosone/article?id=10.1371/x
+    def rule(path, query):
+        params = dict(parse_qsl(query))
+        if params.get("id", "").startswith("10."):
+            return host, re.sub(r"/article/file$", "/article", path), urlencode({"id": params["id"].lower()})
+        return host, path, query
+    return rule
+
+
+def _mdpi(path, query):
+    # /2073-4441/12/3/456/htm|pdf -> /2073-4441/12/3/456
+    return "mdpi.com", re.sub(r"/(?:htm|html|pdf)$", "", path), ""
+
+
+def _ieee(path, query):
+    # /abstract/document/123/, /document/123/figures and stamp/stamp.jsp?arnumber=123 -> /document/123
+    match = re.match(r"^(?:/abstract)?/document/(\d+)", path)
+    if match:
+        return "ieeexplore.ieee.org", f"/document/{match.group(1)}", ""
+    arnumber = dict(parse_qsl(query)).get("arnumber")
+    if arnumber and arnumber.isdigit():
+        return "ieeexplore.ieee.org", f"/document/{arnumber}", ""
+    return "ieeexplore.ieee.org", path, query
+
+
+# host (after 'www.' is stripped) -> rule(path, query) returning (host, path, query), or None to keep the URL as is
+DOMAIN_RULES = {
+    "doi.org": _doi_host,
+    "dx.doi.org": _doi_host,
+    "arxiv.org": _arxiv,
+    "export.arxiv.org": _arxiv,
+    "biorxiv.org": _preprint("biorxiv.org"),
+    "medrxiv.org": _preprint("medrxiv.org"),
+    "pubmed.ncbi.nlm.nih.gov": _pubmed,
+    "ncbi.nlm.nih.gov": _pubmed,
+    "sciencedirect.com": _sciencedirect,
+    "link.springer.com": _springer("link.springer.com"),
+    "onlinelibrary.wiley.com": _doi_path("onlinelibrary.wiley.com"),
+    "tandfonline.com": _doi_path("tandfonline.com"),
+    "dl.acm.org": _doi_path("dl.acm.org"),
+    "science.org": _doi_path("science.org"),
+    "nejm.org": _doi_path("nejm.org"),
+    "jamanetwork.com": _doi_path("jamanetwork.com"),
+    "nature.com": _nature,
+    "frontiersin.org": _frontiers,
+    "journals.plos.org": _plos("journals.plos.org"),
+    "mdpi.com": _mdpi,
+    "ieeexplore.ieee.org": _ieee,
+}
+
+
+def canonicalize(url):
+    """Returns the canonical form of `url` (see the module docstring). Unparseable input is returned stripped."""
+    url = (url or "").strip()
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    if not parts.netloc:
+        return url
+
+    host = parts.netloc.lower().rsplit("@", 1)[-1]
+    for port in _DEFAULT_PORTS:
+        if host.endswith(port):
+            host = host[:-len(port)]
+    if host.startswith("www."):
+        host = host[4:]
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/") or "/"
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not _is_tracking_param(k)))
+
+    rule = DOMAIN_RULES.get(host)
+    if rule:
+        canonical = rule(path, query)
+        if canonical:
+            host, path, query = canonical
+    return urlunsplit(("https", host, path, query, ""))
+
+
+def _is_tracking_param(key):
+    key = key.lower()
+    return key in _TRACKING_PARAMS or key.startswith(_TRACKING_PREFIXES)
+
+
+def url_id(url):
+    """Short, stable ID of a URL: the first URL_ID_LENGTH hex digits of the canonical URL's SHA-256."""
+    return hashlib.sha256(canonicalize(url).encode("utf-8")).hexdigest()[:URL_ID_LENGTH]
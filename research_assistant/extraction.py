@@ -0,0 +1,328 @@
+# research_assistant/extraction.py
+"""
+Text extraction for scraped PDF and HTML documents.
+
+pdfminer and BeautifulSoup are pure Python and CPU-bound. Run in the request thread they stall the
+gunicorn worker, and under gthread workers they hold the GIL away from every other request. With
+EXTRACTION_MODE = 'process', extract() hands the raw bytes to a small ProcessPoolExecutor instead:
+
+- The pool is started on first use, with EXTRACTION_MAX_WORKERS processes per web worker.
+- Each process is replaced after EXTRACTION_MAX_TASKS_PER_CHILD jobs, which caps pdfminer's memory growth.
+- A job that runs longer than EXTRACTION_TIMEOUT seconds is stopped by an alarm inside its worker, which
+  stays usable. A worker that does not even answer the alarm (stuck in C code) gets its pool replaced,
+  so the next job starts on a fresh one.
+
+Timeouts and a broken pool are reported as transient failures (see extract()), which the scrape cache
+must not store: the same page may well extract fine on the next try.
+
+EXTRACTION_MODE = 'inline' runs extraction in the calling thread (the default when DEBUG is on).
+
+HTML_EXTRACTOR picks the HTML engine: 'lxml' (the default), which finds the content block in one lxml
+tree walk (extract_html_text_lxml), or 'bs4' (BeautifulSoup with html.parser). Both return the same
+cleaned-text contract; `manage.py benchmark_html_extractors` compares their speed and output on a saved
+corpus of article pages.
+
+The functions that run in the pool only take plain arguments and import nothing from Django, so they
+also work in freshly spawned processes.
+"""
+import multiprocessing
+import re
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import lxml.html
+from bs4 import BeautifulSoup
+from django.conf import settings
+from lxml import etree
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LAParams, LTTextContainer
+
+# Layout analysis for scraped PDFs: only reading order matters for a summary, so figures and
+# vertical text are skipped and the (slow) boxes_flow ordering is turned off
+PDF_LAPARAMS = LAParams(boxes_flow=None, detect_vertical=False, all_texts=False)
+
+# Shared by both HTML engines
+_CONTENT_CLASS = re.compile(r'(article|content|main|body|post|entry)', re.I)
+_BOILERPLATE_TAGS = ['script', 'style', 'nav', 'footer', 'header', 'aside', 'form', 'img', 'svg', 'canvas', 'noscript']
+_BOILERPLATE_PHRASES = re.compile(r'(Skip to content|Privacy Policy|Terms of Use|Cookie Policy|All Rights Reserved|Copyright © \d{4}.*?|Read more|Continue reading)', re.IGNORECASE)
+_MIN_HTML_TEXT_LENGTH = 200
+
+# lxml engine only: whole class/id tokens of page furniture, and when a block counts as a link list.
+# Tokens are compared whole, so e.g. 'tag-social-media' on a post or 'has-sidebar' on a content block never match.
+_BOILERPLATE_CLASS_TOKENS = frozenset([
+    'nav', 'navbar', 'navigation', 'main-nav', 'site-nav', 'menu', 'main-menu', 'breadcrumb', 'breadcrumbs',
+    'footer', 'site-footer', 'page-footer', 'sidebar', 'site-sidebar', 'cookie', 'cookies', 'cookie-banner',
+    'cookie-consent', 'cookie-notice', 'consent', 'banner', 'share', 'sharing', 'share-buttons', 'social',
+    'social-share', 'social-links', 'related', 'related-posts', 'related-articles', 'recommended', 'comments',
+    'comment-list', 'advert', 'advertisement', 'ads', 'ad-container', 'promo', 'newsletter', 'subscribe',
+    'skip-link',
+])
+_LINK_LIST_TAGS = frozenset(['div', 'section', 'ul', 'ol', 'table', 'p'])
+_MAX_LINK_DENSITY = 0.5 # Share of a block's text inside <a> tags above which it is treated as navigation
+_LINK_LIST_MAX_TEXT = 1000 # Longer blocks are kept whatever their link density (e.g. reference lists)
+_LINKED_METADATA_CLASS = re.compile(r'(author|affiliation|citation|reference|keyword)', re.I) # Link lists worth keeping
+
+
+def html_extractor():
+    return getattr(settings, 'HTML_EXTRACTOR', 'lxml')
+
+
+def extract(content, content_type, truncated=False):
+    """
+    Extracts cleaned text from a raw PDF or HTML body. `truncated` means the download was cut off at
+    SCRAPE_MAX_DOWNLOAD_BYTES; a partial PDF is still read as far as pdfminer can.
+    Returns (text, error, transient). `transient` is True when extraction did not finish (timeout,
+    broken pool), so a retry may succeed; any other error is a property of the document itself.
+    """
+    args = (
+        content, content_type, truncated,
+        getattr(settings, 'SCRAPE_PDF_MAX_PAGES', 30), getattr(settings, 'SCRAPE_MAX_TEXT_CHARS', 20000),
+        html_extractor(),
+    )
+    if getattr(settings, 'EXTRACTION_MODE', 'inline') != 'process':
+        text, error = extract_text(*args)
+        return text, error, False
+    try:
+        text, error = _run_in_pool(extract_text, *args)
+    except (ExtractionTimeout, FutureTimeoutError):
+        return None, f"Text extraction took longer than {getattr(settings, 'EXTRACTION_TIMEOUT', 30)} seconds and was stopped.", True
+    except BrokenProcessPool as e:
+        return None, f"Text extraction failed, its worker process stopped: {e}", True
+    return text, error, False
+
+
+def extract_text(content, content_type, truncated, max_pages, max_chars, html_engine='lxml'):
+    """The extraction itself; runs in the pool or inline. Returns (text, error)."""
+    if 'application/pdf' in content_type:
+        try:
+            text = extract_pdf_text(BytesIO(content), max_pages, max_chars)
+            text = re.sub(r'\s+', ' ', text).strip()
+            if not text and truncated:
+                return None, "PDF is larger than the download limit and its first part could not be read."
+            return text, None
+        except Exception as e:
+            if truncated:
+                return None, f"PDF is larger than the download limit and its first part could not be read: {e}"
+            return None, f"Failed to extract text from PDF returned by ScraperAPI: {e}"
+    elif 'text/html' in content_type:
+        if html_engine == 'lxml':
+            return extract_html_text_lxml(content)
+        return extract_html_text(content)
+    else:
+        return None, f"ScraperAPI returned unsupported content type: {content_type}"
+
+
+def extract_pdf_text(pdf_file, max_pages, max_chars):
+    """
+    Extracts a PDF's text page by page, stopping after `max_pages` pages or once `max_chars`
+    characters have been collected (the summary prompt only uses the start).
+    """
+    parts = []
+    collected = 0
+    for page_layout in extract_pages(pdf_file, maxpages=max_pages, laparams=PDF_LAPARAMS):
+        page_text = "".join(element.get_text() for element in page_layout if isinstance(element, LTTextContainer))
+        parts.append(page_text)
+        collected += len(page_text)
+        if collected >= max_chars:
+            break
+    return "".join(parts)
+
+
+def extract_html_text(content):
+    """Main article text of an HTML page, with BeautifulSoup. Returns (text, error)."""
+    soup = BeautifulSoup(content, 'html.parser')
+
+    main_content = None
+    for tag_name in ['article', 'main', 'div']:
+        main_content = soup.find(tag_name, class_=_CONTENT_CLASS)
+        if main_content:
+            break
+
+    if not main_content:
+        main_content = soup.find('body')
+
+    if main_content:
+        for unwanted_tag in main_content(_BOILERPLATE_TAGS):
+            unwanted_tag.decompose()
+
+        return _clean_html_text(main_content.get_text(separator=' ', strip=True))
+    else:
+        return None, "Could not identify main article content on the page."
+
+
+def extract_html_text_lxml(content):
+    """
+    Main article text of an HTML page, with lxml. Returns (text, error) like extract_html_text.
+
+    One walk over the body finds the content block and the boilerplate at the same time:
+    - The content block is the first article, main or div with a content-like class, as in the bs4 engine.
+      Blocks with a page-furniture class (e.g. 'main-nav') or too little text are passed over.
+    - Boilerplate is dropped by tag (as in the bs4 engine), by a whole class/id token ('sidebar',
+      'cookie-banner', 'share', ...) and by link density: short blocks whose text is mostly links are menus.
+      Blocks with a content-like class are never dropped by class/id.
+    The body is used when no content block qualifies.
+    """
+    try:
+        root = lxml.html.document_fromstring(content)
+    except (etree.ParserError, ValueError):
+        return None, "Could not identify main article content on the page."
+    body = root.find('body')
+    if body is None:
+        return None, "Could not identify main article content on the page."
+
+    candidates = {'article': [], 'main': [], 'div': []} # Content-class blocks in document order
+    text_lengths = {} # Kept blocks -> length of their text
+    dropped = []
+    sizes = [[0, 0]] # Per open element: [text length, link text length]
+    walker = etree.iterwalk(body, events=('start', 'end'))
+    for event, element in walker:
+        if event == 'start':
+            if element is not body and _is_lxml_boilerplate(element):
+                dropped.append(element)
+                walker.skip_subtree()
+                sizes.append(None)
+                continue
+            if element.tag in candidates and _CONTENT_CLASS.search(element.get('class', '')):
+                candidates[element.tag].append(element)
+            sizes.append([len((element.text or '').strip()), 0])
+            continue
+
+        size = sizes.pop()
+        if size is not None:
+            text_length, link_length = size
+            if element.tag == 'a':
+                link_length = text_length
+            if element.tag in _LINK_LIST_TAGS and 0 < text_length < _LINK_LIST_MAX_TEXT \
+                    and link_length / text_length > _MAX_LINK_DENSITY \
+                    and not _LINKED_METADATA_CLASS.search(element.get('class', '')):
+                dropped.append(element)
+            else:
+                text_lengths[element] = text_length
+                sizes[-1][0] += text_length
+                sizes[-1][1] += link_length
+        if element is not body:
+            sizes[-1][0] += len((element.tail or '').strip())
+
+    main_content = None
+    for tag_name in ('article', 'main', 'div'):
+        main_content = next((element for element in candidates[tag_name] if text_lengths.get(element, 0) >= _MIN_HTML_TEXT_LENGTH), None)
+        if main_content is not None:
+            break
+    if main_content is None:
+        main_content = body
+
+    for element in dropped:
+        element.drop_tree()
+    return _clean_html_text(' '.join(main_content.itertext()))
+
+
+def _is_lxml_boilerplate(element):
+    if not isinstance(element.tag, str) or element.tag in _BOILERPLATE_TAGS:
+        return True
+    class_names = element.get('class', '')
+    if _CONTENT_CLASS.search(class_names):
+        return False
+    tokens = f"{class_names} {element.get('id', '')}".lower().split()
+    return any(token in _BOILERPLATE_CLASS_TOKENS for token in tokens)
+
+
+def _clean_html_text(text):
+    text = re.sub(r'\s+', ' ', text).strip()
+    text = _BOILERPLATE_PHRASES.sub('', text).strip()
+
+    if len(text) < _MIN_HTML_TEXT_LENGTH:
+        return None, "Scraped HTML content was too short or seemed to lack main article text."
+
+    return text, None
+
+
+# --- Process pool ---
+
+_pool = None
+_pool_lock = threading.Lock()
+_TIMEOUT_GRACE = 5 # Seconds past EXTRACTION_TIMEOUT before a worker that ignored its alarm is given up on
+
+
+class ExtractionTimeout(BaseException):
+    """
+    Raised inside a pool worker when its job exceeds EXTRACTION_TIMEOUT. A BaseException, so the
+    `except Exception` around PDF parsing in extract_text does not turn it into a document error.
+    """
+
+
+def get_pool():
+    """Returns the process pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # max_tasks_per_child does not work with 'fork'; spawned workers start clean anyway
+                _pool = ProcessPoolExecutor(
+                    max_workers=getattr(settings, 'EXTRACTION_MAX_WORKERS', 2),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    max_tasks_per_child=getattr(settings, 'EXTRACTION_MAX_TASKS_PER_CHILD', 50),
+                )
+                print("DEBUG: Started text extraction process pool")
+    return _pool
+
+
+def _run_in_pool(fn, *args):
+    """
+    Runs fn(*args) in the pool, stopped after EXTRACTION_TIMEOUT seconds (ExtractionTimeout, or
+    FutureTimeoutError if the worker does not respond). A pool that cannot take the job (broken, or
+    being shut down) is replaced and the job resubmitted; a job whose worker died is retried once on a
+    fresh pool, then BrokenProcessPool is raised.
+    """
+    timeout = getattr(settings, 'EXTRACTION_TIMEOUT', 30)
+    for attempt in range(2):
+        pool = get_pool()
+        try:
+            future = pool.submit(_call_with_alarm, timeout, fn, *args)
+        except RuntimeError as e: # BrokenProcessPool, or a pool that another request is shutting down
+            print(f"DEBUG: Text extraction pool unusable ({e}), starting a new one")
+            _discard_pool(pool)
+            continue
+        try:
+            return future.result(timeout=timeout + _TIMEOUT_GRACE)
+        except FutureTimeoutError:
+            print(f"DEBUG: Text extraction worker unresponsive after {timeout}s, replacing the pool")
+            _discard_pool(pool)
+            raise
+        except BrokenProcessPool as e:
+            print(f"DEBUG: Text extraction worker died ({e}), starting a new pool")
+            _discard_pool(pool)
+            if attempt:
+                raise
+    raise BrokenProcessPool("The text extraction pool could not be started.")
+
+
+def _call_with_alarm(timeout, fn, *args):
+    """Runs in a pool worker: fn(*args), interrupted with ExtractionTimeout after `timeout` seconds."""
+    if not hasattr(signal, 'setitimer'): # Windows: only the pool-side timeout applies
+        return fn(*args)
+    signal.signal(signal.SIGALRM, _raise_extraction_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _raise_extraction_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+
+def _discard_pool(pool):
+    """
+    Replaces the pool: the next job starts a new one. Queued jobs are cancelled; a job still running
+    keeps its worker until it returns or its alarm fires, and then the worker exits.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,87 @@
+# research_assistant/management/commands/benchmark_html_extractors.py
+"""
+Compares the two HTML extractor engines (see extraction.py) on a saved corpus of pages:
+time per page for each engine, the speedup, and how closely the lxml output matches the bs4 output.
+A page saved as <page>.html with its article text in <page>.txt also gets the share of that reference
+text each engine keeps.
+
+    python manage.py benchmark_html_extractors
+    python manage.py benchmark_html_extractors --corpus path/to/pages --repeat 50
+"""
+import difflib
+import statistics
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from research_assistant import extraction
+
+DEFAULT_CORPUS = Path(__file__).resolve().parents[2] / "benchmarks" / "html_corpus"
+ENGINES = {
+    "bs4": extraction.extract_html_text,
+    "lxml": extraction.extract_html_text_lxml,
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the bs4 and lxml HTML extractors on a saved corpus of article pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="Directory of saved .html pages")
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per page and engine; the median is reported")
+
+    def handle(self, *args, **options):
+        pages = sorted(Path(options["corpus"]).glob("*.html"))
+        if not pages:
+            raise CommandError(f"No .html files in {options['corpus']}")
+
+        self.stdout.write(f"{'page':<28}{'KB':>6}{'bs4 ms':>9}{'lxml ms':>9}{'speedup':>9}{'bs4 chars':>11}{'lxml chars':>12}{'match':>7}")
+        totals = {engine: 0.0 for engine in ENGINES}
+        for page in pages:
+            content = page.read_bytes()
+            timings = {}
+            outputs = {}
+            for engine, extract in ENGINES.items():
+                runs = []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    outputs[engine] = extract(content)
+                    runs.append(time.perf_counter() - started)
+                timings[engine] = statistics.median(runs) * 1000
+                totals[engine] += timings[engine]
+
+            bs4_text, lxml_text = outputs["bs4"][0] or "", outputs["lxml"][0] or ""
+            self.stdout.write(
+                f"{page.name[:27]:<28}{len(content) / 1024:>6.0f}{timings['bs4']:>9.2f}{timings['lxml']:>9.2f}"
+                f"{timings['bs4'] / timings['lxml']:>8.1f}x{len(bs4_text):>11}{len(lxml_text):>12}"
+                f"{_similarity(bs4_text, lxml_text):>7.0%}"
+            )
+            reference = page.with_suffix(".txt")
+            if reference.exists():
+                reference_text = reference.read_text(encoding="utf-8")
+                self.stdout.write(
+                    f"    reference kept: bs4 {_similarity(reference_text, bs4_text):.0%}, "
+                    f"lxml {_similarity(reference_text, lxml_text):.0%}"
+                )
+            for engine, (text, error) in outputs.items():
+                if error:
+                    self.stdout.write(f"    {engine}: {error}")
+
+        self.stdout.write(
+            f"Total: bs4 {totals['bs4']:.1f} ms, lxml {totals['lxml']:.1f} ms, "
+            f"speedup {totals['bs4'] / totals['lxml']:.1f}x over {len(pages)} pages"
+        )
+        self.stdout.write(
+            "match: share of the bs4 output's words that the lxml output keeps in the same order. "
+            "Lower values mean lxml dropped more boilerplate (menus, cookie banners, sidebars)."
+        )
+
+
+def _similarity(reference, candidate):
+    """Share of the reference's words that appear, in order, in the candidate."""
+    reference_words = reference.split()
+    if not reference_words:
+        return 1.0 if not candidate else 0.0
+    matcher = difflib.SequenceMatcher(None, reference_words, candidate.split(), autojunk=False)
+    return sum(block.size for block in matcher.get_matching_blocks()) / len(reference_words)
@@ -0,0 +1,146 @@
+# research_assistant/merge.py
+"""
+Indexed merge of search results from several providers.
+
+The same paper often comes back under different URLs (a publisher page from Google Scholar, a
+doaj.org page from DOAJ, an arXiv page from Exa.ai). ResultMerger keeps hash indexes on the DOI,
+the canonical URL (see canonical_urls.py) and a normalized-title fingerprint, so each incoming
+result is matched to an existing record in O(1) and the whole merge is a single pass. A merged
+record keeps the URL it was first seen under (its `id` is derived from it) and lists the other
+URLs in `alternate_urls`.
+
+Field precedence, applied per field:
+- A later provider's non-empty value overrides an earlier one; empty values never erase data.
+- Exa.ai and DOAJ only replace the snippet when theirs is longer.
+- Publisher and ISSN are only taken from journal providers.
+"""
+import re
+import unicodedata
+
+from .canonical_urls import canonicalize
+from .results import NO_SNIPPET, NO_TITLE, SearchResult, is_placeholder
+
+RESULT_FIELDS = (
+    "title", "content_snippet", "source_type", "authors", "year", "pdf_url", "main_pub_url",
+    "doi", "journal_name", "volume", "pages", "publisher", "issn",
+)
+LONGEST_SNIPPET_PROVIDERS = ("exa", "doaj")
+JOURNAL_PROVIDERS = ("doaj_journals",)
+JOURNAL_FIELDS = ("publisher", "issn")
+
+_DOI_RE = re.compile(r"\b(10\.\d{4,9}/[^\s?#]+)", re.IGNORECASE)
+# Titles shorter than this are too generic ("Introduction", "Editorial") to identify a paper
+_MIN_FINGERPRINT_WORDS = 4
+
+
+def normalize_doi(doi):
+    """Returns a DOI as a bare, lower-case '10.xxxx/...' string, or '' if there is none."""
+    match = _DOI_RE.search(doi or "")
+    return match.group(1).rstrip(".").lower() if match else ""
+
+
+def title_fingerprint(title):
+    """Accent-, case- and punctuation-insensitive title key, or None for titles too short to trust."""
+    if not title or is_placeholder(title):
+        return None
+    text = unicodedata.normalize("NFKD", title)
+    words = re.sub(r"[^a-z0-9]+", " ", text.encode("ascii", "ignore").decode().lower()).split()
+    if len(words) < _MIN_FINGERPRINT_WORDS:
+        return None
+    return " ".join(words)
+
+
+def normalize_result(provider_key, result):
+    """Maps a provider's raw result onto the common field names (Tavily uses its own)."""
+    if provider_key == "tavily":
+        return {
+            "url": result.get('url'),
+            "title": result.get('title', NO_TITLE),
+            "content_snippet": result.get('content', NO_SNIPPET),
+            "source_type": result.get('source', 'Website'),
+        }
+    return result
+
+
+class ResultMerger:
+    """Merges provider results into SearchResult records keyed by their primary URL. See the module docstring."""
+
+    def __init__(self, records=()):
+        self.records = {}
+        self._by_doi = {}
+        self._by_url = {}
+        self._by_title = {}
+        for record in records:
+            self.records[record.url] = record
+            self._index(record.url, record)
+            for alternate_url in record.alternate_urls:
+                self._by_url.setdefault(canonicalize(alternate_url), record.url)
+
+    def add_all(self, provider_key, results, query, optimized_query):
+        """Merges one provider's results. Returns the primary URLs of the records touched, in order."""
+        touched = {}
+        for result in results:
+            primary_url = self.add(provider_key, result, query, optimized_query)
+            if primary_url:
+                touched[primary_url] = True
+        return list(touched)
+
+    def add(self, provider_key, result, query, optimized_query):
+        """Merges one result and returns the primary URL of its record, or None if it has no URL."""
+        result = normalize_result(provider_key, result)
+        url = result.get('url')
+        if not url:
+            return None
+
+        primary_url = self._find(url, result)
+        if primary_url is None:
+            record = self.records[url] = SearchResult(url, query=query, optimized_query=optimized_query)
+            primary_url = url
+        else:
+            record = self.records[primary_url]
+            record.query = query
+            record.optimized_query = optimized_query
+            if url != primary_url and url not in record.alternate_urls:
+                record.alternate_urls.append(url)
+
+        for field in RESULT_FIELDS:
+            value = result.get(field)
+            current = getattr(record, field)
+            if value in (None, "") or (is_placeholder(value) and not is_placeholder(current)):
+                continue
+            if field in JOURNAL_FIELDS and provider_key not in JOURNAL_PROVIDERS:
+                continue
+            if field == "content_snippet" and provider_key in LONGEST_SNIPPET_PROVIDERS \
+                    and not is_placeholder(current) and len(value) <= len(current):
+                continue
+            setattr(record, field, value)
+
+        self._index(primary_url, record, url)
+        return primary_url
+
+    def results(self):
+        return list(self.records.values())
+
+    def _find(self, url, result):
+        doi = normalize_doi(result.get('doi')) or normalize_doi(url)
+        if doi and doi in self._by_doi:
+            return self._by_doi[doi]
+        canonical = canonicalize(url)
+        if canonical in self._by_url:
+            return self._by_url[canonical]
+        fingerprint = title_fingerprint(result.get('title'))
+        if fingerprint and fingerprint in self._by_title:
+            return self._by_title[fingerprint]
+        return None
+
+    def _index(self, primary_url, record, url=None):
+        for key in (normalize_doi(record.doi), normalize_doi(url or primary_url)):
+            if key:
+                self._by_doi.setdefault(key, primary_url)
+        self._by_url.setdefault(canonicalize(primary_url), primary_url)
+        if url:
+            self._by_url.setdefault(canonicalize(url), primary_url)
+        fingerprint = title_fingerprint(record.title)
+        if fingerprint:
+            self._by_title.setdefault(fingerprint, primary_url)
+
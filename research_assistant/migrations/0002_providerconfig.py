@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("research_assistant", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProviderConfig",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=50, unique=True)),
+                ("enabled", models.BooleanField(default=True)),
+                ("num_results", models.PositiveIntegerField(blank=True, null=True)),
+                ("timeout", models.FloatField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["key"],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-17 14:05
+
+import hashlib
+
+from django.db import migrations, models
+
+from research_assistant.canonical_urls import url_id
+
+
+def fill_url_ids(apps, schema_editor):
+    """Sets url_id on existing items. Items that canonicalize to one already saved keep a raw-URL id."""
+    LibraryItem = apps.get_model("research_assistant", "LibraryItem")
+    seen = set()
+    for item in LibraryItem.objects.order_by("added_timestamp").iterator():
+        item.url_id = url_id(item.url)
+        if (item.user_id, item.url_id) in seen:
+            item.url_id = hashlib.sha256(item.url.encode("utf-8")).hexdigest()[:16]
+        seen.add((item.user_id, item.url_id))
+        item.save(update_fields=["url_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("research_assistant", "0002_providerconfig"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="libraryitem",
+            name="url_id",
+            field=models.CharField(default="", editable=False, max_length=16),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_url_ids, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name="libraryitem",
+            unique_together={("user", "url_id")},
+        ),
+    ]
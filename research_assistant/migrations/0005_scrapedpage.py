@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("research_assistant", "0004_searchsession_searchresultrecord"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScrapedPage",
+            fields=[
+                ("url_id", models.CharField(max_length=16, primary_key=True, serialize=False)),
+                ("url", models.URLField(max_length=2048)),
+                ("content_type", models.CharField(blank=True, max_length=100)),
+                ("text", models.BinaryField(null=True)),
+                ("error", models.TextField(blank=True)),
+                ("size", models.PositiveIntegerField(default=0)),
+                ("etag", models.CharField(blank=True, max_length=255)),
+                ("last_modified", models.CharField(blank=True, max_length=64)),
+                ("fetched_at", models.DateTimeField()),
+                ("expires_at", models.DateTimeField()),
+                ("last_used_at", models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
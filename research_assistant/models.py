@@ -2,6 +2,7 @@
 from django.db import models
 from django.contrib.auth.models import User # Django's built-in User model
 import uuid # For unique IDs
+from .canonical_urls import url_id
 
 class Folder(models.Model):
     """
@@ -31,6 +32,7 @@ class LibraryItem(models.Model):
     
     title = models.CharField(max_length=512)
     url = models.URLField(max_length=2048)
+    url_id = models.CharField(max_length=16, editable=False) # Short id of the canonical URL (canonical_urls.py), set on save
     query = models.TextField(blank=True) # The original query that led to this item
     source_type = models.CharField(max_length=100, default="Website")
     added_timestamp = models.DateTimeField(auto_now_add=True)
@@ -53,15 +55,19 @@ class LibraryItem(models.Model):
     issn = models.CharField(max_length=255, blank=True) # New field for journals
 
     class Meta:
-        # A user cannot save the exact same URL twice (assuming URL is unique enough for an item)
-        # This will prevent duplicate entries for the same user.
-        unique_together = ('user', 'url')
+        # A user cannot save the same URL twice, including trivial variants of it
+        # (http/https, tracking parameters, arXiv abs/pdf, ...), since the canonical URL id is compared.
+        unique_together = ('user', 'url_id')
         ordering = ['-added_timestamp'] # Order by most recently added
 
     def __str__(self):
         folder_name = self.folder.name if self.folder else 'Root'
         return f"{self.title[:50]}... (User: {self.user.username}, Folder: {folder_name})"
 
+    def save(self, *args, **kwargs):
+        self.url_id = url_id(self.url)
+        super().save(*args, **kwargs)
+
 class ChatMessage(models.Model):
     """
     Stores chat messages for a user persistently.
@@ -78,3 +84,84 @@ class ChatMessage(models.Model):
     def __str__(self):
         return f"{self.user.username} ({self.role}): {self.content[:50]}..."
 
+class SearchSession(models.Model):
+    """
+    One search run by a user. Its results live in SearchResultRecord rows, so the Django session
+    only has to hold the search id (see result_store.py).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_sessions')
+    query = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.query[:50]} (User: {self.user.username})"
+
+class SearchResultRecord(models.Model):
+    """
+    One result of a SearchSession, in SearchResult.to_compact() form. Each result is read and
+    updated on its own, so generating a summary rewrites only that row.
+    """
+    search = models.ForeignKey(SearchSession, on_delete=models.CASCADE, related_name='results')
+    result_id = models.CharField(max_length=16) # SearchResult.id (short id of the canonical URL)
+    position = models.PositiveIntegerField() # Display order
+    data = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('search', 'result_id')
+        ordering = ['position']
+
+    def __str__(self):
+        return f"{self.result_id} (Search: {self.search_id})"
+
+class ScrapedPage(models.Model):
+    """
+    Cached text of a scraped article, keyed by the short id of its canonical URL (see scrape_cache.py).
+    A row with an error and no text is a negative entry: a scrape that failed in a way a retry won't fix.
+    """
+    url_id = models.CharField(max_length=16, primary_key=True) # canonical_urls.url_id(url)
+    url = models.URLField(max_length=2048)
+    content_type = models.CharField(max_length=100, blank=True)
+    text = models.BinaryField(null=True) # zlib-compressed UTF-8 text
+    error = models.TextField(blank=True)
+    size = models.PositiveIntegerField(default=0) # Compressed bytes, for the cache's size bound
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    fetched_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+    last_used_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.url[:80]} ({'failed' if self.error else self.content_type})"
+
+class ProviderConfig(models.Model):
+    """
+    Runtime overrides for a registered search provider (see providers.py), editable in the admin.
+    Empty fields keep the provider's own default.
+    """
+    key = models.CharField(max_length=50, unique=True) # Provider key, e.g. 'scholar' or 'doaj_journals'
+    enabled = models.BooleanField(default=True)
+    num_results = models.PositiveIntegerField(null=True, blank=True) # Result quota per search
+    timeout = models.FloatField(null=True, blank=True) # Seconds; upper bound of the adaptive timeout
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['key']
+
+    def __str__(self):
+        return f"{self.key} ({'enabled' if self.enabled else 'disabled'})"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .providers import clear_admin_overrides
+        clear_admin_overrides()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from .providers import clear_admin_overrides
+        clear_admin_overrides()
+        return result
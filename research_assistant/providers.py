@@ -0,0 +1,125 @@
+# research_assistant/providers.py
+"""
+Registry of the search providers used by services.perform_unified_search.
+
+Each provider declares how it is searched: the query variant it takes ('scholar' or 'doaj', see
+services.optimize_queries), how many results to ask for, its timeout, a cost class and whether it is
+critical. Providers are merged in registration order, so a later provider's fields override an
+earlier one's for the same work (see merge.py).
+
+Operators can disable a provider or change its result quota and timeout without a code change, either
+in settings.SEARCH_PROVIDER_OVERRIDES or in the admin (ProviderConfig), which wins over settings.
+Whole cost classes can be switched off with SEARCH_DISABLED_COST_CLASSES.
+
+New sources register themselves with register(), e.g. a local library index:
+
+    providers.register(providers.SearchProvider("library", search_library, "scholar", "Library search", cost_class="free"))
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+FREE = "free"
+STANDARD = "standard"
+PREMIUM = "premium"
+
+_ADMIN_OVERRIDES_KEY = "providers:admin_overrides"
+
+
+class SearchProvider:
+    """
+    One registered search source. `search_fn(query, num_results=..., timeout=...)` returns (results, error).
+    `timeout` caps the provider's adaptive timeout; None uses settings.PROVIDER_TIMEOUTS (see resilience.py).
+    Failures of a critical provider keep the result set out of the search cache; other providers'
+    failures are only reported.
+    """
+
+    def __init__(self, key, search_fn, variant, label, num_results=7, timeout=None,
+                 cost_class=STANDARD, critical=False, enabled=True):
+        self.key = key
+        self.search_fn = search_fn
+        self.variant = variant
+        self.label = label
+        self.num_results = num_results
+        self.timeout = timeout
+        self.cost_class = cost_class
+        self.critical = critical
+        self.enabled = enabled
+
+    def configured(self, overrides):
+        """Returns a copy with the given overrides (enabled, num_results, timeout) applied."""
+        provider = SearchProvider(
+            self.key, self.search_fn, self.variant, self.label, self.num_results, self.timeout,
+            self.cost_class, self.critical, self.enabled,
+        )
+        for field in ("enabled", "num_results", "timeout"):
+            if overrides.get(field) is not None:
+                setattr(provider, field, overrides[field])
+        return provider
+
+    def search(self, query, timeout=None):
+        return self.search_fn(query, num_results=self.num_results, timeout=timeout)
+
+    def __repr__(self):
+        return f"<SearchProvider {self.key}>"
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def register(provider):
+    """Adds (or replaces) a provider. Registration order is merge-precedence order."""
+    with _registry_lock:
+        _registry[provider.key] = provider
+    return provider
+
+
+def get_provider(key):
+    return _registry.get(key)
+
+
+def all_providers():
+    return list(_registry.values())
+
+
+def enabled_providers():
+    """Registered providers with settings and admin overrides applied, minus the disabled ones."""
+    setting_overrides = getattr(settings, 'SEARCH_PROVIDER_OVERRIDES', {})
+    admin_overrides = _admin_overrides()
+    disabled_cost_classes = getattr(settings, 'SEARCH_DISABLED_COST_CLASSES', [])
+    providers = []
+    for provider in all_providers():
+        overrides = dict(setting_overrides.get(provider.key, {}))
+        # Fields left empty in the admin keep the settings override (or the provider's default)
+        overrides.update({
+            field: value for field, value in admin_overrides.get(provider.key, {}).items() if value is not None
+        })
+        provider = provider.configured(overrides)
+        if provider.enabled and provider.cost_class not in disabled_cost_classes:
+            providers.append(provider)
+    return providers
+
+
+def _admin_overrides():
+    """ProviderConfig rows as {key: overrides}, cached briefly so searches do not hit the database."""
+    overrides = cache.get(_ADMIN_OVERRIDES_KEY)
+    if overrides is None:
+        from .models import ProviderConfig
+        try:
+            overrides = {
+                config.key: {"enabled": config.enabled, "num_results": config.num_results, "timeout": config.timeout}
+                for config in ProviderConfig.objects.all()
+            }
+        except DatabaseError:
+            # e.g. migrations not applied yet; fall back to settings only
+            return {}
+        cache.set(_ADMIN_OVERRIDES_KEY, overrides, timeout=getattr(settings, 'PROVIDER_CONFIG_CACHE_TIMEOUT', 60))
+    return overrides
+
+
+def clear_admin_overrides():
+    """Called when a ProviderConfig changes, so the next search sees it."""
+    cache.delete(_ADMIN_OVERRIDES_KEY)
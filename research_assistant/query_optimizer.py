@@ -0,0 +1,160 @@
+# research_assistant/query_optimizer.py
+"""
+Deterministic, rule-based query optimizer.
+
+Does locally what the Gemini few-shot optimizers are asked to do: strip conversational filler and
+stopwords, and expand common research abbreviations (AI, EHR, ...). It runs in microseconds, so with
+QUERY_OPTIMIZER_MODE = 'local' or 'hybrid' the LLM round trips come off the search critical path.
+The returned string still goes through the same post-processing as the LLM output (see
+services.clean_scholar_query / clean_doaj_query).
+"""
+import re
+
+from django.conf import settings
+
+# Conversational phrases that carry no search meaning. Matched case-insensitively, longest first.
+FILLER_PHRASES = [
+    "i want to research", "i want to learn about", "i want to know about", "i want to find",
+    "i would like to research", "i would like to know about", "i would like", "i'd like",
+    "i am looking for", "i'm looking for", "looking for", "i need", "i want",
+    "can you find", "could you find", "please find", "find me", "search for", "show me", "give me",
+    "tell me about", "information about", "information on", "anything about",
+    "articles about", "articles on", "papers about", "papers on", "research about", "research on",
+    "studies about", "studies on", "literature on", "sources on", "sources about",
+]
+
+STOPWORDS = frozenset("""
+a an the and or but of in on at to for from by with without about into onto over under between
+among through during before after above below up down out off than then so as is are was were be
+been being am do does did doing have has had having it its this that these those there here
+i me my we our you your he she they them their what which who whom whose when where why how
+can could would should will shall may might must please some any all more most such very just
+also using use used based via vs versus
+""".split())
+
+# Default abbreviation expansions. Extend or override with settings.QUERY_ABBREVIATIONS.
+DEFAULT_ABBREVIATIONS = {
+    "AI": "Artificial Intelligence",
+    "ML": "Machine Learning",
+    "DL": "Deep Learning",
+    "RL": "Reinforcement Learning",
+    "NLP": "Natural Language Processing",
+    "LLM": "Large Language Model",
+    "LLMs": "Large Language Models",
+    "CNN": "Convolutional Neural Network",
+    "RNN": "Recurrent Neural Network",
+    "GNN": "Graph Neural Network",
+    "GAN": "Generative Adversarial Network",
+    "EHR": "Electronic Health Record",
+    "EMR": "Electronic Medical Record",
+    "IoT": "Internet of Things",
+    "AR": "Augmented Reality",
+    "VR": "Virtual Reality",
+    "HCI": "Human Computer Interaction",
+    "GIS": "Geographic Information System",
+    "UAV": "Unmanned Aerial Vehicle",
+    "ERP": "Enterprise Resource Planning",
+    "CRM": "Customer Relationship Management",
+    "HRM": "Human Resource Management",
+    "CSR": "Corporate Social Responsibility",
+    "SME": "Small and Medium Enterprises",
+    "SMEs": "Small and Medium Enterprises",
+    "ICT": "Information and Communication Technology",
+    "SDG": "Sustainable Development Goals",
+    "SDGs": "Sustainable Development Goals",
+}
+
+_FILLER_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(p) for p in sorted(FILLER_PHRASES, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+_TOKEN_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9'+.#]*")
+
+_abbreviations = None
+_folded_abbreviations = None
+
+
+def get_abbreviations():
+    """Returns the abbreviation dictionary, merged with settings.QUERY_ABBREVIATIONS on first use."""
+    global _abbreviations, _folded_abbreviations
+    if _abbreviations is None:
+        abbreviations = dict(DEFAULT_ABBREVIATIONS)
+        abbreviations.update(getattr(settings, 'QUERY_ABBREVIATIONS', {}))
+        folded = {}
+        for abbreviation, expansion in abbreviations.items():
+            folded.setdefault(abbreviation.casefold(), expansion)
+        _folded_abbreviations = folded
+        _abbreviations = abbreviations
+    return _abbreviations
+
+
+def expand_abbreviation(token):
+    """Expansion of `token`, matched exactly first ('IoT') and then ignoring case ('ai'), or None."""
+    abbreviations = get_abbreviations()
+    if token in abbreviations:
+        return abbreviations[token]
+    return _folded_abbreviations.get(token.casefold())
+
+
+def _is_acronym(token):
+    """All-caps tokens like 'IT' or 'US' are acronyms, not the stopwords they spell."""
+    return len(token) > 1 and token.isupper()
+
+
+def optimize_query_locally(user_query):
+    """
+    Rewrites a natural-language query into space-separated keywords without calling an LLM.
+    Example: "i want AI-Enhanced EHR systems" -> "Artificial Intelligence Enhanced Electronic Health Record systems"
+    """
+    abbreviations = get_abbreviations()
+    text = _FILLER_RE.sub(" ", user_query.replace('"', ' ').replace(',', ' '))
+
+    keywords = []
+    seen = set()
+    for token in _TOKEN_RE.findall(text):
+        # Hyphens are token boundaries, so "AI-Enhanced" yields "AI" and "Enhanced"
+        token = token.rstrip(".")
+        # The token as typed is checked first, so a user abbreviation is never lost as a stopword
+        expansion = abbreviations.get(token)
+        if expansion is None:
+            if token.lower() in STOPWORDS and not _is_acronym(token):
+                continue
+            expansion = expand_abbreviation(token) or token
+        for word in expansion.split():
+            if word.lower() not in seen:
+                seen.add(word.lower())
+                keywords.append(word)
+    return " ".join(keywords)
+
+
+def looks_weak(optimized_query, user_query):
+    """
+    Heuristic for 'hybrid' mode: True when the local rewrite is probably worse than what the LLM
+    would produce, e.g. almost nothing survived, or the query is long and conversational.
+    """
+    keywords = optimized_query.split()
+    original_words = _TOKEN_RE.findall(user_query)
+    if len(keywords) < getattr(settings, 'QUERY_OPTIMIZER_MIN_KEYWORDS', 2):
+        return True
+    if len(keywords) > getattr(settings, 'QUERY_OPTIMIZER_MAX_KEYWORDS', 16):
+        return True
+    # Unknown all-caps acronyms are left unexpanded; the LLM can usually do better
+    if any(_is_acronym(word) and expand_abbreviation(word) is None for word in original_words):
+        return True
+    return False
+
+
+def query_terms(query):
+    """Normalized set of terms in a query: case-folded words, ignoring punctuation, quotes and order."""
+    return frozenset(word.casefold() for word in _TOKEN_RE.findall(query.replace('"', ' ')))
+
+
+def queries_equivalent(raw_query, rewritten_query):
+    """
+    True when a rewrite is trivially equivalent to the raw query, i.e. both contain the same terms
+    once case, punctuation, word order and stopwords are ignored. Used to decide whether a search
+    started speculatively on the raw query can stand in for the optimized one.
+    """
+    raw_terms = {term for term in query_terms(raw_query) if term not in STOPWORDS}
+    rewritten_terms = {term for term in query_terms(rewritten_query) if term not in STOPWORDS}
+    return raw_terms == rewritten_terms
@@ -0,0 +1,298 @@
+# research_assistant/rate_limit.py
+"""
+Rate and concurrency limits for the paid APIs (ScraperAPI, SerpApi, Tavily, Exa.ai, Gemini) and DOAJ.
+
+Each limiter is a token bucket (a sustained `rate` of calls per second with room for `burst` calls)
+plus a concurrency semaphore (`concurrency` calls in flight). With the Redis cache from
+settings.CACHES both live in Redis and are updated by Lua scripts, so the limits hold across all
+gunicorn workers; otherwise (local development) each process keeps its own in-memory limiter.
+
+Callers queue for up to RATE_LIMIT_MAX_WAIT seconds instead of failing straight away:
+
+    with rate_limit.limit("serpapi"):
+        ...
+
+The time a call spends queueing (and whether it was turned away) is added to the Waits object
+installed by measure()/ameasure(), so the circuit breakers can leave self-imposed throttling out of
+their latency and failure accounting.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+
+# rate: calls per second, burst: bucket size, concurrency: calls in flight,
+# lease: seconds after which a slot held by a dead worker is reclaimed (Redis only)
+DEFAULT_RATE_LIMITS = {
+    "scraperapi": {"rate": 2.0, "burst": 5, "concurrency": 5, "lease": 60},
+    "serpapi": {"rate": 2.0, "burst": 5, "concurrency": 5, "lease": 60},
+    "tavily": {"rate": 2.0, "burst": 5, "concurrency": 5, "lease": 60},
+    "exa": {"rate": 2.0, "burst": 5, "concurrency": 5, "lease": 60},
+    # Exa.ai allows 15 concurrent research tasks per API key (settings.EXA_RESEARCH_CONCURRENCY)
+    "exa_research": {"rate": 1.0, "burst": 5, "concurrency": 15, "lease": 180},
+    "gemini": {"rate": 1.0, "burst": 5, "concurrency": 5, "lease": 60},
+    "doaj": {"rate": 2.0, "burst": 5, "concurrency": 4, "lease": 30},
+}
+
+# Returns 0 when a token was taken, otherwise the milliseconds until one is available
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(now - updated, 0) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return wait
+"""
+
+# Returns 1 when a concurrency slot was taken (expired leases are reclaimed first), otherwise 0
+_SEMAPHORE_ACQUIRE_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local lease = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) < limit then
+    redis.call('ZADD', KEYS[1], now + lease, ARGV[3])
+    redis.call('EXPIRE', KEYS[1], math.ceil(lease) + 1)
+    return 1
+end
+return 0
+"""
+
+_SLOT_POLL_INTERVAL = 0.05
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call could not get a token or slot within RATE_LIMIT_MAX_WAIT seconds."""
+
+
+class Waits:
+    """Seconds one provider call spent queueing for tokens and slots, and whether a limiter turned it away."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.rejected = False
+
+
+_current_waits = contextvars.ContextVar("rate_limit_waits", default=None)
+
+
+def measure(waits, fn, *args, **kwargs):
+    """Calls fn(*args, **kwargs), adding the queueing of every limit() block inside it to `waits`."""
+    token = _current_waits.set(waits)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _current_waits.reset(token)
+
+
+async def ameasure(waits, coro):
+    """Asyncio counterpart of measure() for limit_async() blocks."""
+    token = _current_waits.set(waits)
+    try:
+        return await coro
+    finally:
+        _current_waits.reset(token)
+
+
+def _note_wait(queued, rejected=False):
+    waits = _current_waits.get()
+    if waits is not None:
+        waits.seconds += time.monotonic() - queued
+        waits.rejected = waits.rejected or rejected
+
+
+def get_limit_config(name):
+    config = dict(DEFAULT_RATE_LIMITS.get(name, {"rate": 1.0, "burst": 1, "concurrency": 1, "lease": 60}))
+    config.update(getattr(settings, 'PROVIDER_RATE_LIMITS', {}).get(name, {}))
+    return config
+
+
+class LocalLimiter:
+    """In-process token bucket and semaphore, used when no Redis cache is configured."""
+
+    def __init__(self, name, config):
+        self.name = name
+        self.rate = config["rate"]
+        self.burst = config["burst"]
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(config["concurrency"])
+
+    def try_take_token(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def try_acquire_slot(self):
+        return True if self._semaphore.acquire(blocking=False) else None
+
+    def release_slot(self, slot):
+        self._semaphore.release()
+
+
+class RedisLimiter:
+    """Token bucket and semaphore kept in Redis, shared by every worker."""
+
+    def __init__(self, name, config, connection):
+        self.name = name
+        self.config = config
+        self._bucket_key = f"rate_limit:{name}:bucket"
+        self._slots_key = f"rate_limit:{name}:slots"
+        self._connection = connection
+        self._take_token = connection.register_script(_TOKEN_BUCKET_SCRIPT)
+        self._acquire_slot = connection.register_script(_SEMAPHORE_ACQUIRE_SCRIPT)
+
+    def try_take_token(self):
+        wait_ms = self._take_token(keys=[self._bucket_key], args=[self.config["rate"], self.config["burst"]])
+        return int(wait_ms) / 1000
+
+    def try_acquire_slot(self):
+        slot = uuid.uuid4().hex
+        acquired = self._acquire_slot(
+            keys=[self._slots_key], args=[self.config["concurrency"], self.config["lease"], slot]
+        )
+        return slot if int(acquired) else None
+
+    def release_slot(self, slot):
+        self._connection.zrem(self._slots_key, slot)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _uses_redis():
+    return "django_redis" in settings.CACHES.get("default", {}).get("BACKEND", "")
+
+
+def get_limiter(name):
+    """Returns the limiter for a provider: Redis-backed when the default cache is Redis, else in-memory."""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                config = get_limit_config(name)
+                if _uses_redis():
+                    from django_redis import get_redis_connection
+                    limiter = RedisLimiter(name, config, get_redis_connection("default"))
+                else:
+                    limiter = LocalLimiter(name, config)
+                _limiters[name] = limiter
+    return limiter
+
+
+def _next_wait(limiter, deadline, state):
+    """
+    One non-blocking acquisition step. Takes a token first, then a concurrency slot, storing the slot
+    in `state`. Returns the seconds to sleep before the next step, or None once both are held.
+    """
+    if not state.get("token"):
+        wait = limiter.try_take_token()
+        if wait:
+            if time.monotonic() + wait > deadline:
+                raise RateLimitExceeded(f"{limiter.name} rate limit: no request slot within {_max_wait():g}s, please retry.")
+            return wait
+        state["token"] = True
+    slot = limiter.try_acquire_slot()
+    if slot is None:
+        if time.monotonic() + _SLOT_POLL_INTERVAL > deadline:
+            raise RateLimitExceeded(f"{limiter.name} concurrency limit: no request slot within {_max_wait():g}s, please retry.")
+        return _SLOT_POLL_INTERVAL
+    state["slot"] = slot
+    return None
+
+
+def _max_wait():
+    return getattr(settings, 'RATE_LIMIT_MAX_WAIT', 5.0)
+
+
+def _enabled():
+    return getattr(settings, 'RATE_LIMIT_ENABLED', True)
+
+
+@contextmanager
+def limit(name):
+    """Waits for a token and a concurrency slot of provider `name`, holding the slot for the block."""
+    if not _enabled():
+        yield
+        return
+    limiter = get_limiter(name)
+    deadline = time.monotonic() + _max_wait()
+    state = {}
+    queued = time.monotonic()
+    try:
+        while (wait := _next_wait(limiter, deadline, state)) is not None:
+            time.sleep(wait)
+    except RateLimitExceeded:
+        _note_wait(queued, rejected=True)
+        raise
+    _note_wait(queued)
+    try:
+        yield
+    finally:
+        limiter.release_slot(state["slot"])
+
+
+@asynccontextmanager
+async def limit_async(name):
+    """
+    Asyncio counterpart of limit() for the httpx backend. Queued callers sleep with asyncio.sleep, and
+    every limiter step (a Redis round trip when Redis is configured) runs in the loop's executor, so
+    neither blocks the shared event loop.
+    """
+    if not _enabled():
+        yield
+        return
+    loop = asyncio.get_running_loop()
+    limiter = await loop.run_in_executor(None, get_limiter, name)
+    deadline = time.monotonic() + _max_wait()
+    state = {}
+    queued = time.monotonic()
+    while True:
+        step = loop.run_in_executor(None, _next_wait, limiter, deadline, state)
+        try:
+            wait = await asyncio.shield(step)
+        except RateLimitExceeded:
+            _note_wait(queued, rejected=True)
+            raise
+        except asyncio.CancelledError:
+            # The step carries on in its thread and may still take a slot; hand that back once it is done
+            step.add_done_callback(lambda done: _release_taken_slot(loop, done, limiter, state))
+            raise
+        if wait is None:
+            break
+        await asyncio.sleep(wait)
+    _note_wait(queued)
+    try:
+        yield
+    finally:
+        # Submitted to the executor before the await, so the slot is released even if this task is cancelled again
+        await loop.run_in_executor(None, limiter.release_slot, state["slot"])
+
+
+def _release_taken_slot(loop, step, limiter, state):
+    if not step.cancelled() and step.exception() is None and "slot" in state:
+        loop.run_in_executor(None, limiter.release_slot, state["slot"])
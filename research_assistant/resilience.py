@@ -0,0 +1,341 @@
+# research_assistant/resilience.py
+"""
+Circuit breakers, adaptive timeouts and hedged requests for the outbound provider calls.
+
+Each provider (Tavily, Google Scholar, Exa.ai, DOAJ, the Exa.ai research report) has a breaker whose
+state lives in the Django cache, so when one gunicorn worker trips a breaker every worker skips the
+provider. A breaker opens after CIRCUIT_BREAKER_FAILURE_THRESHOLD consecutive failures or latency
+violations, fails fast for CIRCUIT_BREAKER_COOLDOWN seconds, then lets a single probe call through
+(half-open) and closes again if the probe succeeds.
+
+Timeouts adapt to each provider's observed p95 latency, measured per process over the last
+ADAPTIVE_TIMEOUT_SAMPLES calls and capped by PROVIDER_TIMEOUTS.
+
+Providers listed in HEDGED_PROVIDERS are hedged: when the first attempt has not answered by the
+provider's running p90, a duplicate is sent and the first successful answer wins. Hedges are capped at HEDGE_MAX_RATIO of the calls made in each HEDGE_BUDGET_WINDOW.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import cache
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Timeout (seconds) used until enough latency samples exist, and the ceiling of the adaptive timeout
+DEFAULT_PROVIDER_TIMEOUTS = {
+    "tavily": 20.0,
+    "scholar": 20.0,
+    "exa": 20.0,
+    "doaj": 15.0,
+    "doaj_journals": 15.0,
+    "exa_report": 120.0,
+}
+
+
+class LatencyTracker:
+    """Per-process window of recent call latencies for one provider."""
+
+    def __init__(self, maxlen):
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction):
+        """Returns the given percentile (0-1) of the recorded latencies, or None without enough samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < getattr(settings, 'ADAPTIVE_TIMEOUT_MIN_SAMPLES', 20):
+            return None
+        return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+class CircuitBreaker:
+    """Cache-backed circuit breaker for one provider. See the module docstring for the state machine."""
+
+    def __init__(self, name):
+        self.name = name
+        self.latency = LatencyTracker(getattr(settings, 'ADAPTIVE_TIMEOUT_SAMPLES', 200))
+        self._open_key = f"breaker:{name}:open_until"
+        self._failures_key = f"breaker:{name}:failures"
+        self._probe_key = f"breaker:{name}:probe"
+
+    def state(self):
+        open_until = cache.get(self._open_key)
+        if open_until is None:
+            return CLOSED
+        return OPEN if open_until > time.time() else HALF_OPEN
+
+    def allow(self):
+        """True if a call may go out now. In half-open state only one caller across workers gets through."""
+        state = self.state()
+        if state == CLOSED:
+            return True
+        if state == OPEN:
+            return False
+        return cache.add(self._probe_key, True, timeout=self._max_timeout())
+
+    def timeout(self, ceiling=None):
+        """
+        Adaptive timeout: the observed p95 times ADAPTIVE_TIMEOUT_MULTIPLIER, within [minimum, ceiling].
+        The ceiling defaults to PROVIDER_TIMEOUTS; registered providers may set their own.
+        """
+        ceiling = ceiling or self._max_timeout()
+        p95 = self.latency.percentile(0.95)
+        if p95 is None:
+            return ceiling
+        floor = getattr(settings, 'ADAPTIVE_TIMEOUT_MIN', 2.0)
+        return min(max(p95 * getattr(settings, 'ADAPTIVE_TIMEOUT_MULTIPLIER', 2.0), floor), ceiling)
+
+    def record(self, elapsed, failed, timeout=None):
+        """Records one finished call. A call slower than its timeout counts as a failure even if it succeeded."""
+        self.latency.add(elapsed)
+        if timeout is not None and elapsed > timeout:
+            print(f"DEBUG: {self.name} took {elapsed:.1f}s, over its {timeout:.1f}s timeout")
+            failed = True
+        if failed:
+            self._record_failure()
+        elif self.state() != CLOSED or cache.get(self._failures_key):
+            self.reset()
+
+    def reset(self):
+        cache.delete_many([self._open_key, self._failures_key, self._probe_key])
+
+    def open_error(self):
+        """The fast error returned instead of calling the provider while the breaker is open."""
+        open_until = cache.get(self._open_key) or time.time()
+        return f"Skipped after repeated failures; retrying in about {max(int(open_until - time.time()), 1)}s."
+
+    def _record_failure(self):
+        cooldown = getattr(settings, 'CIRCUIT_BREAKER_COOLDOWN', 30)
+        if self.state() == HALF_OPEN:
+            # The probe failed, so stay open for another cooldown
+            self._open(cooldown)
+            return
+        window = getattr(settings, 'CIRCUIT_BREAKER_WINDOW', 60)
+        try:
+            cache.add(self._failures_key, 0, timeout=window)
+            failures = cache.incr(self._failures_key)
+        except ValueError:
+            # The counter expired between add and incr; start counting again
+            cache.set(self._failures_key, 1, timeout=window)
+            failures = 1
+        if failures >= getattr(settings, 'CIRCUIT_BREAKER_FAILURE_THRESHOLD', 5):
+            self._open(cooldown)
+
+    def _open(self, cooldown):
+        print(f"DEBUG: Circuit breaker for {self.name} opened for {cooldown}s")
+        # Keep the marker past the cooldown so the breaker is seen as half-open, not closed, afterwards
+        cache.set(self._open_key, time.time() + cooldown, timeout=cooldown + self._max_timeout() + 60)
+        cache.delete_many([self._failures_key, self._probe_key])
+
+    def _max_timeout(self):
+        timeouts = dict(DEFAULT_PROVIDER_TIMEOUTS, **getattr(settings, 'PROVIDER_TIMEOUTS', {}))
+        return timeouts.get(self.name, 20.0)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Returns the process-wide breaker for a provider (its state is shared through the cache)."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def track(breaker, started, future, failed, timeout=None, waits=None):
+    """
+    Records the outcome of a provider call, started at time.monotonic() `started`, when its Future completes.
+    `failed(result)` decides whether a returned value is a failure; raised exceptions always are.
+    With the call's rate_limit.Waits, time spent queueing in our own limiters is not counted as latency,
+    and a failure caused by a limiter rejection is not recorded at all.
+    Futures of the async providers complete on their event loop, so the (cache-backed) record is then
+    made in the loop's executor instead of blocking the loop.
+    """
+    def _done(done):
+        elapsed = time.monotonic() - started
+        try:
+            is_failure = done.exception() is not None or failed(done.result())
+        except Exception:
+            is_failure = True
+        if waits is not None:
+            if is_failure and waits.rejected:
+                print(f"DEBUG: {breaker.name} call rejected by its rate limiter, not counted as a failure")
+                return
+            elapsed = max(elapsed - waits.seconds, 0.0)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            breaker.record(elapsed, is_failure, timeout)
+        else:
+            loop.run_in_executor(None, breaker.record, elapsed, is_failure, timeout)
+
+    future.add_done_callback(_done)
+    return future
+
+
+# --- Hedged requests ---
+
+_HEDGE_STATS_PREFIX = "hedge:stats"
+
+_attempt_latency = {}
+_hedge_executor = None
+_hedge_lock = threading.Lock()
+
+
+def hedging_enabled(name):
+    return name in getattr(settings, 'HEDGED_PROVIDERS', ["scholar", "scrape"])
+
+
+def hedge_delay(name):
+    """The provider's running p90 latency per attempt, or None (no hedging) without enough samples."""
+    tracker = _attempt_latency.get(name)
+    return tracker.percentile(0.90) if tracker else None
+
+
+def _record_attempt(name, started):
+    tracker = _attempt_latency.get(name)
+    if tracker is None:
+        with _hedge_lock:
+            tracker = _attempt_latency.setdefault(name, LatencyTracker(getattr(settings, 'ADAPTIVE_TIMEOUT_SAMPLES', 200)))
+    tracker.add(time.monotonic() - started)
+
+
+def _count(name, counter):
+    stats_key = f"{_HEDGE_STATS_PREFIX}:{name}:{counter}"
+    try:
+        cache.add(stats_key, 0, timeout=getattr(settings, 'HEDGE_BUDGET_WINDOW', 3600))
+        cache.incr(stats_key)
+    except ValueError:
+        pass
+
+
+def _claim_hedge(name):
+    """Spend cap: True if one more hedge keeps hedges within HEDGE_MAX_RATIO of this window's calls."""
+    stats = get_hedge_stats(name)
+    if stats["hedges"] + 1 > stats["calls"] * getattr(settings, 'HEDGE_MAX_RATIO', 0.1):
+        return False
+    _count(name, "hedges")
+    return True
+
+
+def get_hedge_stats(name):
+    """Hedging metrics for the current budget window: calls, hedges, hedge wins, hedge rate and win rate."""
+    counters = ("calls", "hedges", "hedge_wins")
+    keys = {f"{_HEDGE_STATS_PREFIX}:{name}:{counter}": counter for counter in counters}
+    values = cache.get_many(list(keys))
+    stats = {counter: values.get(key, 0) for key, counter in keys.items()}
+    stats["hedge_rate"] = stats["hedges"] / stats["calls"] if stats["calls"] else 0.0
+    stats["win_rate"] = stats["hedge_wins"] / stats["hedges"] if stats["hedges"] else 0.0
+    return stats
+
+
+def get_hedge_executor():
+    """
+    Dedicated pool for hedged attempts. Hedged calls usually already run on the search executor,
+    and waiting there on work queued to the same pool could deadlock it.
+    """
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'HEDGE_EXECUTOR_MAX_WORKERS', 8),
+                    thread_name_prefix="hedged-request",
+                )
+    return _hedge_executor
+
+
+def hedged_call(name, fn, *args, is_failure=lambda result: False, **kwargs):
+    """
+    Calls fn(*args, **kwargs), hedging it when `name` is in HEDGED_PROVIDERS.
+    Both attempts run in the hedge executor and the first successful answer wins; the other attempt is
+    cancelled if it has not started yet (a blocking SDK call that is already running cannot be
+    interrupted, its result is discarded). If both attempts fail, the first attempt's outcome is returned.
+    Until the provider has enough latency samples there is nothing to hedge against, so fn runs inline.
+    """
+    if not hedging_enabled(name):
+        return fn(*args, **kwargs)
+
+    def attempt():
+        started = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record_attempt(name, started)
+
+    _count(name, "calls")
+    delay = hedge_delay(name)
+    if delay is None:
+        return attempt()
+
+    # Each attempt gets a copy of the caller's context, so rate limiter waits are still measured
+    executor = get_hedge_executor()
+    primary = executor.submit(contextvars.copy_context().run, attempt)
+    done, _pending = wait([primary], timeout=delay)
+    if done or not _claim_hedge(name):
+        return primary.result()
+
+    print(f"DEBUG: Hedging slow {name} request")
+    hedge = executor.submit(contextvars.copy_context().run, attempt)
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None and not is_failure(future.result()):
+                if future is hedge:
+                    _count(name, "hedge_wins")
+                for loser in pending:
+                    loser.cancel()
+                return future.result()
+    return primary.result()
+
+
+async def hedged_acall(name, coro_fn, *args, is_failure=lambda result: False, **kwargs):
+    """
+    Asyncio counterpart of hedged_call for the httpx backend; the losing attempt is cancelled outright.
+    The hedge counters live in the (possibly Redis) cache, so they are updated in a worker thread
+    rather than on the shared event loop.
+    """
+    if not hedging_enabled(name):
+        return await coro_fn(*args, **kwargs)
+
+    async def attempt():
+        started = time.monotonic()
+        try:
+            return await coro_fn(*args, **kwargs)
+        finally:
+            _record_attempt(name, started)
+
+    await asyncio.to_thread(_count, name, "calls")
+    primary = asyncio.ensure_future(attempt())
+    done, _pending = await asyncio.wait({primary}, timeout=hedge_delay(name))
+    if done or not await asyncio.to_thread(_claim_hedge, name):
+        return await primary
+
+    print(f"DEBUG: Hedging slow {name} request")
+    hedge = asyncio.ensure_future(attempt())
+    pending = {primary, hedge}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None and not is_failure(task.result()):
+                for loser in pending:
+                    loser.cancel()
+                if task is hedge:
+                    await asyncio.to_thread(_count, name, "hedge_wins")
+                return task.result()
+    return primary.result()
@@ -0,0 +1,84 @@
+# research_assistant/result_store.py
+"""
+Database store for the results of a user's searches.
+
+Results used to live in the Django session as one blob that was re-serialized on every request and
+grew with every summary and annotation. Now each search is a SearchSession row and each result a
+SearchResultRecord row; the session only keeps the current search id ('current_search_id'). Results
+are read and written one at a time, so two browser tabs summarizing different results no longer
+overwrite each other's work.
+
+Every lookup is scoped to the user, so a search id taken from another session finds nothing.
+Only the newest SEARCH_SESSIONS_KEPT_PER_USER searches of each user are kept.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from .models import SearchResultRecord, SearchSession
+from .results import SearchResult
+
+
+def create_search(user, query, results):
+    """Stores a new search with its results (in display order) and returns its id as a string."""
+    with transaction.atomic():
+        search = SearchSession.objects.create(user=user, query=query)
+        SearchResultRecord.objects.bulk_create([
+            SearchResultRecord(search=search, result_id=result.id, position=position, data=result.to_compact())
+            for position, result in enumerate(results)
+        ])
+    _prune(user)
+    return str(search.id)
+
+
+def load_results(user, search_id):
+    """All results of a search as {id: SearchResult}, in display order. Empty if the search is gone."""
+    if not search_id:
+        return {}
+    records = SearchResultRecord.objects.filter(search_id=search_id, search__user=user).only('result_id', 'data')
+    return {record.result_id: SearchResult.from_dict(record.data) for record in records}
+
+
+def get_result(user, search_id, result_id):
+    """One result of a search, or None."""
+    if not search_id:
+        return None
+    record = SearchResultRecord.objects.filter(
+        search_id=search_id, search__user=user, result_id=result_id
+    ).only('data').first()
+    return SearchResult.from_dict(record.data) if record else None
+
+
+def save_result(user, search_id, result):
+    """Writes one result back (e.g. after a summary was generated), leaving the search's other results alone."""
+    SearchResultRecord.objects.filter(
+        search_id=search_id, search__user=user, result_id=result.id
+    ).update(data=result.to_compact())
+
+
+def save_results(user, search_id, results):
+    """Writes changed results back and appends the ones the search did not have yet (late provider results)."""
+    search = SearchSession.objects.filter(id=search_id, user=user).first()
+    if search is None:
+        return
+    with transaction.atomic():
+        existing = set(search.results.values_list('result_id', flat=True))
+        next_position = search.results.count()
+        for result in results:
+            if result.id in existing:
+                search.results.filter(result_id=result.id).update(data=result.to_compact())
+            else:
+                SearchResultRecord.objects.create(
+                    search=search, result_id=result.id, position=next_position, data=result.to_compact()
+                )
+                next_position += 1
+
+
+def delete_results(user, search_id, result_ids):
+    SearchResultRecord.objects.filter(search_id=search_id, search__user=user, result_id__in=list(result_ids)).delete()
+
+
+def _prune(user):
+    keep = getattr(settings, 'SEARCH_SESSIONS_KEPT_PER_USER', 20)
+    stale_ids = list(SearchSession.objects.filter(user=user).values_list('id', flat=True)[keep:])
+    if stale_ids:
+        SearchSession.objects.filter(id__in=stale_ids).delete()
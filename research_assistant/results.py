@@ -0,0 +1,94 @@
+# research_assistant/results.py
+"""
+The SearchResult record shared by the search pipeline (services.py, merge.py) and the views.
+
+A merged result used to be a 20-key dict, rebuilt on every merge step and serialized in full into
+the session. SearchResult is a slotted object instead: no per-instance __dict__, fields updated in
+place. to_compact() drops every field still at its default, which is most of them for web results,
+and from_dict() reads both that compact form and the full dict shape, so cached entries and
+sessions written before the change still load. to_dict() gives the full shape back.
+
+Templates read the attributes directly ({{ result.title }}), and get() lets helpers that also take
+plain dicts (e.g. services.generate_citations) accept a SearchResult.
+"""
+from .canonical_urls import url_id
+
+# Placeholders the providers put in for a missing title or snippet. They are not real text, so merging,
+# near-duplicate detection and the like must never compare or prefer them.
+NO_TITLE = "No Title"
+NO_SNIPPET = "No snippet available."
+NO_DOAJ_SNIPPET = "No snippet available from DOAJ search result."
+NO_JOURNAL_DESCRIPTION = "No detailed description available for this journal."
+PLACEHOLDERS = frozenset({NO_TITLE, NO_SNIPPET, NO_DOAJ_SNIPPET, NO_JOURNAL_DESCRIPTION, "N/A"})
+
+# Field -> default. Mutable defaults are copied per instance.
+DEFAULTS = {
+    "title": NO_TITLE,
+    "url": "",
+    "id": "", # Short id of the canonical URL, derived from `url` when not given
+    "content_snippet": NO_SNIPPET,
+    "source_type": "Website",
+    "query": "", # Original query
+    "optimized_query": "", # Query actually sent to the provider
+    "summary": None,
+    "annotation": None,
+    "authors": "",
+    "year": "",
+    "pdf_url": "",
+    "main_pub_url": "",
+    "doi": "",
+    "journal_name": "",
+    "volume": "",
+    "pages": "",
+    "publisher": "", # Only journal entries carry publisher/ISSN
+    "issn": "",
+    "alternate_urls": [], # Other URLs the same work was found under
+}
+
+
+def is_placeholder(value):
+    """True for empty strings and provider placeholders (PLACEHOLDERS)."""
+    return isinstance(value, str) and (not value.strip() or value in PLACEHOLDERS)
+
+
+class SearchResult:
+    """One merged search result. See the module docstring."""
+
+    __slots__ = tuple(DEFAULTS)
+
+    def __init__(self, url, **fields):
+        for field, default in DEFAULTS.items():
+            value = fields.get(field, default)
+            setattr(self, field, list(value) if isinstance(value, list) else value)
+        self.url = url
+        if not self.id:
+            self.id = url_id(url)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a record from the full dict shape or from to_compact() output. Unknown keys are ignored."""
+        return cls(data["url"], **{field: data[field] for field in DEFAULTS if field in data and field != "url"})
+
+    def to_dict(self):
+        """The full dict shape, every field included."""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def to_compact(self):
+        """Only the fields that differ from their defaults; url and id are always kept."""
+        compact = {"url": self.url, "id": self.id}
+        for field, default in DEFAULTS.items():
+            value = getattr(self, field)
+            if value != default and value not in ("", None, []):
+                compact[field] = value
+        return compact
+
+    def get(self, field, default=None):
+        """Dict-style read, for code shared with plain result dicts."""
+        value = getattr(self, field, None)
+        return default if value is None else value
+
+    def __eq__(self, other):
+        return isinstance(other, SearchResult) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"<SearchResult {self.id} {self.url}>"
@@ -0,0 +1,149 @@
+# research_assistant/scrape_cache.py
+"""
+Persistent cache of scraped article text.
+
+Every Summarize and every Save used to send a paid ScraperAPI request (often with render=true) and
+run pdfminer or BeautifulSoup again, even for a URL that was scraped a minute earlier by the same
+or another user. Scrapes are now stored in the ScrapedPage table, keyed by the short id of the
+canonical URL (canonical_urls.url_id), so URL variants share one entry:
+
+- The extracted text is stored zlib-compressed, with the content type, fetch time and the ETag and
+  Last-Modified validators of the response.
+- An entry is fresh for SCRAPE_CACHE_TTL seconds. A stale entry is revalidated with a conditional
+  request when it has validators, and its text is still served if that refresh fails.
+- Failures a retry won't fix (403/404/410, pages without extractable text) are stored as negative
+  entries for SCRAPE_CACHE_NEGATIVE_TTL seconds. Timeouts (of the download or of text extraction),
+  a broken extraction pool and 5xx errors are never cached.
+- The table is bounded to SCRAPE_CACHE_MAX_BYTES of compressed text; the least recently used
+  entries are evicted first, in one batch down to 90% of the bound. The running total lives in the
+  Django cache and is recounted from the table after each eviction and every _SIZE_RECOUNT seconds.
+- A hit only writes its last use time when the stored one is older than SCRAPE_CACHE_TOUCH_INTERVAL,
+  which is plenty of precision for LRU eviction and spares most reads a write.
+"""
+import datetime
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from .canonical_urls import url_id
+from .models import ScrapedPage
+
+# Evict down to this share of SCRAPE_CACHE_MAX_BYTES, so not every store has to evict
+_EVICT_TO = 0.9
+
+_SIZE_KEY = "scrape_cache:total_bytes"
+_SIZE_RECOUNT = 3600 # Seconds the running total is trusted before it is recounted (corrects drift)
+_PURGE_KEY = "scrape_cache:purged"
+_PURGE_INTERVAL = 600 # Seconds between sweeps of expired negative entries
+
+
+def is_enabled():
+    return getattr(settings, 'SCRAPE_CACHE_ENABLED', True)
+
+
+def lookup(url):
+    """The cached entry for `url` (fresh, stale or negative), or None. Expired negative entries are ignored."""
+    page = ScrapedPage.objects.filter(url_id=url_id(url)).first()
+    if page is None:
+        return None
+    now = timezone.now()
+    if page.error and page.expires_at <= now:
+        return None
+    touch_interval = getattr(settings, 'SCRAPE_CACHE_TOUCH_INTERVAL', 3600)
+    if page.last_used_at <= now - datetime.timedelta(seconds=touch_interval):
+        ScrapedPage.objects.filter(url_id=page.url_id).update(last_used_at=now)
+        page.last_used_at = now
+    return page
+
+
+def is_fresh(page):
+    return page.expires_at > timezone.now()
+
+
+def get_text(page):
+    return zlib.decompress(page.text).decode("utf-8") if page.text else None
+
+
+def validators(page):
+    """Conditional request headers for revalidating a stale entry."""
+    headers = {}
+    if page.etag:
+        headers['If-None-Match'] = page.etag
+    if page.last_modified:
+        headers['If-Modified-Since'] = page.last_modified
+    return headers
+
+
+def store(url, text, content_type="", etag="", last_modified=""):
+    """Stores scraped text for `url`, replacing any earlier entry."""
+    compressed = zlib.compress(text.encode("utf-8"))
+    _save(url, getattr(settings, 'SCRAPE_CACHE_TTL', 7 * 24 * 3600),
+          content_type=content_type[:100], text=compressed, error="", size=len(compressed),
+          etag=etag[:255], last_modified=last_modified[:64])
+
+
+def store_failure(url, error):
+    """Stores a negative entry, so the same hard failure is not paid for again until it expires."""
+    _save(url, getattr(settings, 'SCRAPE_CACHE_NEGATIVE_TTL', 6 * 3600),
+          content_type="", text=None, error=error, size=0, etag="", last_modified="")
+
+
+def mark_revalidated(page):
+    """The source answered 304 Not Modified: the entry is fresh again."""
+    now = timezone.now()
+    ttl = getattr(settings, 'SCRAPE_CACHE_TTL', 7 * 24 * 3600)
+    ScrapedPage.objects.filter(url_id=page.url_id).update(
+        fetched_at=now, expires_at=now + datetime.timedelta(seconds=ttl), last_used_at=now
+    )
+
+
+def _save(url, ttl, **fields):
+    now = timezone.now()
+    page_id = url_id(url)
+    old_size = ScrapedPage.objects.filter(url_id=page_id).values_list('size', flat=True).first() or 0
+    ScrapedPage.objects.update_or_create(
+        url_id=page_id,
+        defaults=dict(fields, url=url[:2048], fetched_at=now, last_used_at=now,
+                      expires_at=now + datetime.timedelta(seconds=ttl)),
+    )
+    _evict(fields["size"] - old_size)
+
+
+def _total_bytes(delta):
+    """The running size of the stored text after a store that changed it by `delta` bytes."""
+    if delta:
+        try:
+            return cache.incr(_SIZE_KEY, delta)
+        except ValueError:
+            pass # Not counted yet (or expired); the recount below includes this store
+    else:
+        total = cache.get(_SIZE_KEY)
+        if total is not None:
+            return total
+    total = ScrapedPage.objects.aggregate(total=Sum('size'))['total'] or 0
+    cache.set(_SIZE_KEY, total, timeout=_SIZE_RECOUNT)
+    return total
+
+
+def _evict(delta):
+    """Drops expired negative entries now and then, and the least recently used entries once over the size bound."""
+    if cache.add(_PURGE_KEY, True, timeout=_PURGE_INTERVAL):
+        ScrapedPage.objects.filter(text__isnull=True, expires_at__lte=timezone.now()).delete()
+    max_bytes = getattr(settings, 'SCRAPE_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+    total = _total_bytes(delta)
+    if total <= max_bytes:
+        return
+
+    to_free = total - int(max_bytes * _EVICT_TO)
+    stale_ids = []
+    for page_id, size in ScrapedPage.objects.order_by('last_used_at').values_list('url_id', 'size').iterator():
+        if to_free <= 0:
+            break
+        stale_ids.append(page_id)
+        to_free -= size
+    ScrapedPage.objects.filter(url_id__in=stale_ids).delete()
+    cache.delete(_SIZE_KEY) # Recounted on the next store
+    print(f"DEBUG: Scrape cache over {max_bytes} bytes, evicted {len(stale_ids)} entries")
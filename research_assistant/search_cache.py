@@ -0,0 +1,135 @@
+# research_assistant/search_cache.py
+"""
+Shared cache for search results and Exa.ai research reports.
+
+Entries live in the Django cache (Redis on Render, locmem locally) and are keyed by the normalized
+query plus the set of providers that produced them. Each entry is stored together with the time it
+stops being fresh: fresh entries are served as-is, stale entries are still served but trigger one
+background refresh (stale-while-revalidate), and entries past the stale window are evicted by the
+cache backend itself.
+"""
+import hashlib
+import re
+import threading
+import time
+
+from cachetools import LRUCache
+from django.conf import settings
+from django.core.cache import cache
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+_STATS_PREFIX = "search_cache:stats"
+
+
+def is_enabled():
+    return getattr(settings, 'SEARCH_CACHE_ENABLED', True)
+
+
+def normalize_query(query):
+    """Normalizes a user query for use in cache keys: case-folded with collapsed whitespace."""
+    return re.sub(r'\s+', ' ', (query or '')).strip().casefold()
+
+
+def make_key(namespace, query, providers=()):
+    """Builds a cache key from the normalized query and the (order-independent) provider set."""
+    raw = normalize_query(query) + "|" + ",".join(sorted(providers))
+    return f"search_cache:{namespace}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+def lookup(key):
+    """Returns (value, state) where state is FRESH, STALE or MISS. Records a hit or miss."""
+    namespace = key.split(":")[1]
+    entry = cache.get(key)
+    if entry is None:
+        _incr(namespace, "misses")
+        return None, MISS
+    if entry["fresh_until"] > time.time():
+        _incr(namespace, "hits")
+        return entry["value"], FRESH
+    _incr(namespace, "stale_hits")
+    return entry["value"], STALE
+
+
+def store(key, value, ttl=None):
+    """Stores `value` as fresh for `ttl` seconds, then servable as stale for SEARCH_CACHE_STALE_TTL more."""
+    ttl = getattr(settings, 'SEARCH_CACHE_TTL', 3600) if ttl is None else ttl
+    stale_ttl = getattr(settings, 'SEARCH_CACHE_STALE_TTL', 86400)
+    cache.set(key, {"value": value, "fresh_until": time.time() + ttl}, timeout=ttl + stale_ttl)
+
+
+def claim_refresh(key):
+    """
+    Returns True for exactly one caller (across workers) that should refresh a stale entry.
+    The claim expires on its own, so a refresh that dies is retried after SEARCH_CACHE_REFRESH_LOCK_TIMEOUT.
+    """
+    return cache.add(f"{key}:refreshing", True, timeout=getattr(settings, 'SEARCH_CACHE_REFRESH_LOCK_TIMEOUT', 120))
+
+
+def release_refresh(key):
+    cache.delete(f"{key}:refreshing")
+
+
+def _incr(namespace, counter):
+    stats_key = f"{_STATS_PREFIX}:{namespace}:{counter}"
+    try:
+        cache.add(stats_key, 0, timeout=None)
+        cache.incr(stats_key)
+    except ValueError:
+        # The counter was evicted between add and incr; losing one sample is fine
+        pass
+
+
+def get_stats(namespace):
+    """Returns the hit/stale-hit/miss counters for a cache namespace, e.g. 'search' or 'report'."""
+    counters = ("hits", "stale_hits", "misses")
+    values = cache.get_many([f"{_STATS_PREFIX}:{namespace}:{counter}" for counter in counters])
+    return {counter: values.get(f"{_STATS_PREFIX}:{namespace}:{counter}", 0) for counter in counters}
+
+
+def prompt_version(prompt_template):
+    """Short, stable fingerprint of a prompt template; changes whenever the template text changes."""
+    return hashlib.sha256(prompt_template.encode('utf-8')).hexdigest()[:12]
+
+
+class TwoTierMemo:
+    """
+    Memo for small computed values such as optimized query strings.
+    The first tier is a size-bounded, in-process LRU; the second is the shared Django cache,
+    so a value computed by one worker is reused by all of them.
+    """
+
+    def __init__(self, namespace, maxsize=1024, ttl=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._local = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock() # LRUCache is not thread-safe
+
+    def make_key(self, *parts):
+        """Builds a memo key; the last part is treated as a query and normalized."""
+        *prefix, query = parts
+        digest = hashlib.sha256(normalize_query(query).encode('utf-8')).hexdigest()
+        return ":".join(["memo", self.namespace, *prefix, digest])
+
+    def get(self, key):
+        with self._lock:
+            value = self._local.get(key)
+        if value is not None:
+            _incr(self.namespace, "hits")
+            return value
+
+        value = cache.get(key)
+        if value is None:
+            _incr(self.namespace, "misses")
+            return None
+        _incr(self.namespace, "hits")
+        with self._lock:
+            self._local[key] = value
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._local[key] = value
+        cache.set(key, value, timeout=self.ttl)
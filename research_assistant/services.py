@@ -4,6 +4,9 @@ import json
 import uuid
 import datetime
 import time
+import threading
+import hashlib
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
 # import redis # REMOVED: No longer used for application data or local client config
 from tavily import TavilyClient
 import google.generativeai as genai
@@ -12,10 +15,13 @@ from exa_py import Exa
 from openai import OpenAI
 import re
 import requests
-from bs4 import BeautifulSoup
-from io import BytesIO
-from pdfminer.high_level import extract_text
 from django.conf import settings # Import Django settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from . import extraction, merge, near_duplicates, providers, query_optimizer, rate_limit, resilience, scrape_cache, search_cache, single_flight
+from .canonical_urls import url_id
+from .results import NO_DOAJ_SNIPPET, NO_JOURNAL_DESCRIPTION, NO_SNIPPET, NO_TITLE, SearchResult
+from .search_cache import normalize_query
 
 # Define a list of common academic/journal domains for focused search
 ACADEMIC_DOMAINS = [
@@ -97,23 +103,25 @@ configure_clients()
 # --- All Redis-related data persistence functions were already removed in the previous step. ---
 # --- Only API call helpers and citation formatting functions remain. ---
 
-def scrape_article_content(url):
-    """
-    Attempts to scrape the full text content from a given URL using ScraperAPI.
-    Handles both HTML and PDF links.
-    Returns the scraped text and an error message (or None).
-    """
-    if not url:
-        return None, "No URL provided."
+# Base ScraperAPI URL
+SCRAPERAPI_URL = "http://api.scraperapi.com/"
 
-    # Base ScraperAPI URL
-    scraperapi_url = "http://api.scraperapi.com/"
-    
-    # Headers to pass to ScraperAPI (ScraperAPI handles User-Agent rotation itself)
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/555.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/555.36'
-    }
+# Headers to pass to ScraperAPI (ScraperAPI handles User-Agent rotation itself)
+SCRAPERAPI_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/555.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/555.36'
+}
+
+# Chunk size for streamed scrape downloads (see read_capped)
+SCRAPE_CHUNK_SIZE = 64 * 1024
 
+# Statuses that will not change on a retry; these failures are cached as negative entries (see scrape_cache.py)
+PERMANENT_SCRAPE_STATUSES = {401, 403, 404, 410, 451}
+
+def build_scraperapi_params(url, conditional=False):
+    """
+    Builds the ScraperAPI query parameters for scraping `url`.
+    A conditional request (revalidating a cached scrape) needs ScraperAPI to forward our If-None-Match/If-Modified-Since headers.
+    """
     # Determine if it's likely a PDF to avoid unnecessary JS rendering
     is_pdf_url = ".pdf" in url.lower()
 
@@ -125,81 +133,251 @@ def scrape_article_content(url):
     if not is_pdf_url:
         # Enable JavaScript rendering for HTML pages, unless it's likely a PDF
         params['render'] = 'true' 
+    if conditional:
+        params['keep_headers'] = 'true'
+    return params
+
+def scrape_response_info(headers):
+    """Content type and validators of a ScraperAPI response, for the scrape cache."""
+    return {
+        "content_type": headers.get('Content-Type', '').lower(),
+        "etag": headers.get('ETag', ''),
+        "last_modified": headers.get('Last-Modified', ''),
+    }
 
-    try:
-        response = requests.get(scraperapi_url, params=params, headers=headers, timeout=30) # Increased timeout for ScraperAPI
-        response.raise_for_status()
+def scrape_article_content(url):
+    """
+    Attempts to scrape the full text content from a given URL using ScraperAPI.
+    Handles both HTML and PDF links.
+    Returns the scraped text and an error message (or None).
+    Results are cached per canonical URL (see scrape_cache.py), so Summarize and Save share one scrape.
+    """
+    if not url:
+        return None, "No URL provided."
 
-        content_type = response.headers.get('Content-Type', '').lower()
+    cached = scrape_cache.lookup(url) if scrape_cache.is_enabled() else None
+    if cached and (cached.error or scrape_cache.is_fresh(cached)):
+        print(f"DEBUG: Scrape cache hit for {url}")
+        return scrape_cache.get_text(cached), cached.error or None
+
+    text, error, info = _fetch_article_content(url, scrape_cache.validators(cached) if cached else {})
+    if not scrape_cache.is_enabled():
+        return text, error
+    if cached and info.get("not_modified"):
+        scrape_cache.mark_revalidated(cached)
+        return scrape_cache.get_text(cached), None
+    if text:
+        scrape_cache.store(url, text, info["content_type"], info["etag"], info["last_modified"])
+    elif cached:
+        # The refresh failed; the stale copy is still better than nothing
+        print(f"DEBUG: Serving stale scrape of {url} after: {error}")
+        return scrape_cache.get_text(cached), None
+    elif info.get("permanent"):
+        scrape_cache.store_failure(url, error)
+    return text, error
+
+def _fetch_article_content(url, validators):
+    """Scrapes `url` through ScraperAPI. Returns (text, error, info); see _scrape_article_content_once."""
+    if _use_async_providers():
+        from . import async_providers
+        return async_providers.run_sync(async_providers.scrape_article_content(url, validators))
+
+    # ScraperAPI has a long latency tail, so slow scrapes may be hedged (see resilience.py)
+    return resilience.hedged_call(
+        "scrape", _scrape_article_content_once, url, validators,
+        is_failure=lambda result: result[0] is None and not result[2].get("not_modified"),
+    )
+
+def _scrape_article_content_once(url, validators=None):
+    """
+    One ScraperAPI attempt for scrape_article_content. Returns (text, error, info), where info holds the
+    content type and validators (scrape_response_info), 'permanent' for failures worth caching, or
+    'not_modified' when a conditional request came back 304.
+    """
+    params = build_scraperapi_params(url, conditional=bool(validators))
 
-        if 'application/pdf' in content_type:
-            try:
-                pdf_file = BytesIO(response.content)
-                text = extract_text(pdf_file)
-                text = re.sub(r'\s+', ' ', text).strip()
-                return text, None
-            except Exception as e:
-                return None, f"Failed to extract text from PDF returned by ScraperAPI: {e}"
-        elif 'text/html' in content_type:
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            main_content = None
-            for tag_name in ['article', 'main', 'div']:
-                main_content = soup.find(tag_name, class_=re.compile(r'(article|content|main|body|post|entry)', re.I))
-                if main_content:
-                    break
-            
-            if not main_content:
-                main_content = soup.find('body')
-
-            if main_content:
-                for unwanted_tag in main_content(['script', 'style', 'nav', 'footer', 'header', 'aside', 'form', 'img', 'svg', 'canvas', 'noscript']):
-                    unwanted_tag.decompose()
-                
-                text = main_content.get_text(separator=' ', strip=True)
-                text = re.sub(r'\s+', ' ', text).strip()
-                text = re.sub(r'(Skip to content|Privacy Policy|Terms of Use|Cookie Policy|All Rights Reserved|Copyright © \d{4}.*?|Read more|Continue reading)', '', text, flags=re.IGNORECASE).strip()
-                
-                if len(text) < 200:
-                    return None, "Scraped HTML content was too short or seemed to lack main article text."
-                
-                return text, None
-            else:
-                return None, "Could not identify main article content on the page."
-        else:
-            return None, f"ScraperAPI returned unsupported content type: {content_type}"
+    try:
+        with rate_limit.limit("scraperapi"):
+            # Streamed, so a huge PDF is cut off at SCRAPE_MAX_DOWNLOAD_BYTES instead of being buffered whole
+            with requests.get(SCRAPERAPI_URL, params=params, headers=dict(SCRAPERAPI_HEADERS, **(validators or {})), timeout=30, stream=True) as response: # Increased timeout for ScraperAPI
+                if response.status_code == 304:
+                    return None, None, {"not_modified": True}
+                response.raise_for_status()
+
+                info = scrape_response_info(response.headers)
+                content, truncated = read_capped(response.iter_content(chunk_size=SCRAPE_CHUNK_SIZE))
+        text, error, transient = extract_scraped_text(content, info["content_type"], truncated=truncated)
+        # A page that came back without usable text won't have any on a retry either, unless extraction itself did not finish
+        info["permanent"] = not transient
+        return text, error, info
 
     except requests.exceptions.HTTPError as e:
+        info = {"permanent": e.response.status_code in PERMANENT_SCRAPE_STATUSES}
         if e.response.status_code == 403:
-            return None, f"Access Forbidden (403): Likely a paywall or anti-scraping measure. Cannot scrape full content even with ScraperAPI."
-        return None, f"HTTP error {e.response.status_code} during ScraperAPI request: {e}"
+            return None, f"Access Forbidden (403): Likely a paywall or anti-scraping measure. Cannot scrape full content even with ScraperAPI.", info
+        return None, f"HTTP error {e.response.status_code} during ScraperAPI request: {e}", info
     except requests.exceptions.ConnectionError as e:
-        return None, f"Connection error during ScraperAPI request: {e}"
+        return None, f"Connection error during ScraperAPI request: {e}", {}
     except requests.exceptions.Timeout as e:
-        return None, f"Timeout during ScraperAPI request: {e}"
+        return None, f"Timeout during ScraperAPI request: {e}", {}
     except Exception as e:
-        return None, f"An unexpected error occurred during ScraperAPI request: {e}"
+        return None, f"An unexpected error occurred during ScraperAPI request: {e}", {}
+
+
+def read_capped(chunks):
+    """
+    Joins the chunks of a streamed download, stopping after SCRAPE_MAX_DOWNLOAD_BYTES.
+    Returns (content, truncated). Used by the blocking scraper; async_providers has an async twin.
+    """
+    limit = getattr(settings, 'SCRAPE_MAX_DOWNLOAD_BYTES', 15 * 1024 * 1024)
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= limit:
+            print(f"DEBUG: Scrape download cut off at {limit} bytes")
+            return bytes(buffer[:limit]), True
+    return bytes(buffer), False
+
+def extract_scraped_text(content, content_type, truncated=False):
+    """
+    Extracts cleaned text from a raw PDF or HTML body returned by ScraperAPI, in the extraction
+    process pool when it is enabled (see extraction.py). Shared by the blocking and the httpx-based
+    scrapers. Returns (text, error, transient); see extraction.extract.
+    """
+    return extraction.extract(content, content_type, truncated=truncated)
 
 
-def search_tavily(query, search_depth="basic", max_results=7):
+# Scraped text shorter than this is treated as a failed scrape (usually a paywall, login or cookie page)
+SCRAPE_MIN_TEXT_LENGTH = 200
+
+_scrape_executor = None
+_scrape_executor_lock = threading.Lock()
+
+def get_scrape_executor():
+    """Returns the process-wide thread pool that races scrape candidates (see scrape_best_candidate)."""
+    global _scrape_executor
+    if _scrape_executor is None:
+        with _scrape_executor_lock:
+            if _scrape_executor is None:
+                _scrape_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'SCRAPE_EXECUTOR_MAX_WORKERS', 8),
+                    thread_name_prefix="scrape-candidate",
+                )
+    return _scrape_executor
+
+def _with_db_cleanup(fn, *args, **kwargs):
+    """
+    Runs fn on a long-lived worker thread. Like Django does around each request, connections that
+    outlived CONN_MAX_AGE or broke are closed before and after, so one dropped connection does not
+    break every later task on the thread.
+    """
+    close_old_connections()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+def scrape_candidates(result):
+    """
+    URLs worth scraping for a search result, most preferred first: the PDF, the main publication page
+    and the result URL, followed by the other URLs the same work was found under when SCRAPE_ALTERNATE_URLS
+    is on. URLs with the same canonical form are only listed once (they share a scrape cache entry anyway),
+    and at most SCRAPE_MAX_CANDIDATES are returned, each a paid ScraperAPI request. Returns [{"url", "type"}].
+    """
+    candidates = []
+    if result.pdf_url:
+        candidates.append({"url": result.pdf_url, "type": "pdf"})
+    if result.main_pub_url:
+        candidates.append({"url": result.main_pub_url, "type": "html"})
+    if result.url:
+        candidates.append({"url": result.url, "type": "pdf" if ".pdf" in result.url.lower() else "html"})
+    if getattr(settings, 'SCRAPE_ALTERNATE_URLS', False):
+        for alternate_url in result.alternate_urls:
+            candidates.append({"url": alternate_url, "type": "pdf" if ".pdf" in alternate_url.lower() else "html"})
+
+    unique = {}
+    for candidate in candidates:
+        unique.setdefault(url_id(candidate["url"]), candidate)
+    return list(unique.values())[:getattr(settings, 'SCRAPE_MAX_CANDIDATES', 3)]
+
+def scrape_best_candidate(result):
+    """
+    Scrapes a result's candidates (scrape_candidates) and returns (text, failures): the text of the most
+    preferred candidate that yields at least SCRAPE_MIN_TEXT_LENGTH characters, or None, and a list of
+    (url, error) for the more preferred candidates that failed.
+
+    In 'race' mode (SCRAPE_CANDIDATE_MODE) all candidates are scraped at once. A successful candidate wins
+    as soon as every candidate ranked above it has failed, or when those have had SCRAPE_RACE_PREFERENCE_WAIT
+    more seconds; the rest are cancelled. In 'serial' mode candidates are tried one after the other.
+    """
+    candidates = scrape_candidates(result)
+    if getattr(settings, 'SCRAPE_CANDIDATE_MODE', 'race') != 'race' or len(candidates) < 2:
+        failures = []
+        for candidate in candidates:
+            text, error = scrape_article_content(candidate["url"])
+            if text and len(text) >= SCRAPE_MIN_TEXT_LENGTH:
+                return text, failures
+            failures.append((candidate["url"], error or "Scraped content was too short."))
+        return None, failures
+    return _race_scrape_candidates(candidates)
+
+def _race_scrape_candidates(candidates):
+    executor = get_scrape_executor()
+    futures = [executor.submit(_with_db_cleanup, scrape_article_content, candidate["url"]) for candidate in candidates]
+    rank = {future: index for index, future in enumerate(futures)}
+    outcomes = {} # rank -> (text, error)
+    pending = set(futures)
+    deadline = None
+    best = None
+
+    while True:
+        successful = [index for index, (text, _error) in outcomes.items() if text and len(text) >= SCRAPE_MIN_TEXT_LENGTH]
+        if successful:
+            best = min(successful)
+            if all(index in outcomes for index in range(best)) or time.monotonic() >= deadline:
+                break
+        if not pending:
+            break
+        done, pending = wait(pending, timeout=None if deadline is None else max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                outcomes[rank[future]] = future.result()
+            except Exception as e:
+                outcomes[rank[future]] = (None, f"An unexpected error occurred while scraping: {e}")
+        if deadline is None and any(text and len(text) >= SCRAPE_MIN_TEXT_LENGTH for text, _error in outcomes.values()):
+            # A less preferred candidate came back first; give the preferred ones a little longer
+            deadline = time.monotonic() + getattr(settings, 'SCRAPE_RACE_PREFERENCE_WAIT', 3.0)
+
+    for future in pending:
+        future.cancel() # Scrapes already running finish in the background and still fill the scrape cache
+    failures = [
+        (candidates[index]["url"], outcomes[index][1] or "Scraped content was too short.")
+        for index in sorted(outcomes) if best is None or index < best
+    ]
+    if best is None:
+        return None, failures
+    print(f"DEBUG: Scrape race won by candidate {best + 1} of {len(candidates)}: {candidates[best]['url']}")
+    return outcomes[best][0], failures
+
+
+def search_tavily(query, search_depth="basic", num_results=7, timeout=None):
     """Performs a search using the Tavily API, now with domain filtering."""
     try:
-        response = tavily_client.search(
-            query=query,
-            search_depth=search_depth,
-            max_results=max_results,
-            include_domains=ACADEMIC_DOMAINS # NEW: Apply domain filter
-        )
+        with rate_limit.limit("tavily"):
+            response = tavily_client.search(
+                query=query,
+                search_depth=search_depth,
+                max_results=num_results,
+                include_domains=ACADEMIC_DOMAINS, # NEW: Apply domain filter
+                timeout=max(int(timeout), 1) if timeout else 60,
+            )
         return response.get('results', []), None
     except Exception as e:
         return [], str(e)
 
-def optimize_scholar_query(user_query):
-    """Uses Gemini to optimize a user's natural language query into a concise, effective,
-    and keyword-rich search query suitable for academic databases like Google Scholar.
-    The output query will be a single string of keywords, without internal double quotes.
-    """
-    prompt_template = f"""
+# Few-shot prompts for the LLM query optimizers. Editing a template changes its prompt version,
+# which invalidates the optimized queries memoized for it.
+SCHOLAR_QUERY_PROMPT = """
     You are an AI research assistant. Your task is to rephrase a user's natural language research query into a concise, effective, and keyword-rich search query suitable for academic databases like Google Scholar.
 
     Focus on:
@@ -224,23 +402,8 @@ def optimize_scholar_query(user_query):
     User Query: "{user_query}"
     Optimized Query:
     """
-    optimized_query, error = generate_gemini(prompt_template)
-    if error:
-        return user_query, error
-    
-    optimized_query = optimized_query.strip()
-    # Remove any double quotes that the model might still generate despite instructions
-    optimized_query = optimized_query.replace('"', '')
-    optimized_query = optimized_query.replace(',', ' ').strip()
-    optimized_query = re.sub(r'\s+', ' ', optimized_query)
 
-    return optimized_query, None
-
-def optimize_doaj_query(user_query):
-    """Uses Gemini to optimize a user's natural language query into a concise,
-    space-separated list of keywords suitable for DOAJ API search.
-    """
-    prompt_template = f"""
+DOAJ_QUERY_PROMPT = """
     You are an AI research assistant. Your task is to rephrase a user's natural language research query into a concise, space-separated list of keywords suitable for searching academic databases like DOAJ.
 
     Focus on:
@@ -265,24 +428,213 @@ def optimize_doaj_query(user_query):
     User Query: "{user_query}"
     Optimized Query:
     """
-    optimized_query, error = generate_gemini(prompt_template)
-    if error:
-        return user_query, error
-    
+
+# Optimized query strings: in-process LRU in front of the shared Django cache
+optimizer_memo = search_cache.TwoTierMemo(
+    "optimizer",
+    maxsize=getattr(settings, 'QUERY_OPTIMIZER_MEMO_SIZE', 1024),
+    ttl=getattr(settings, 'QUERY_OPTIMIZER_MEMO_TTL', 30 * 24 * 3600),
+)
+
+def _memoized_optimization(family, prompt_template, user_query, optimize_fn):
+    """
+    Returns (optimized_query, error) for `user_query`, calling `optimize_fn` only when no result is
+    memoized for this query and prompt version. Failed optimizations are not memoized.
+    """
+    memo_key = optimizer_memo.make_key(family, search_cache.prompt_version(prompt_template), user_query)
+    optimized_query = optimizer_memo.get(memo_key)
+    if optimized_query is not None:
+        return optimized_query, None
+
+    optimized_query, error = optimize_fn(user_query)
+    if not error:
+        optimizer_memo.set(memo_key, optimized_query)
+    return optimized_query, error
+
+def _optimize_query(family, prompt_template, user_query, llm_fn, clean_fn):
+    """
+    Dispatches on settings.QUERY_OPTIMIZER_MODE:
+    - 'llm' (default): memoized Gemini rewrite.
+    - 'local': rule-based rewrite from query_optimizer.py, no LLM call.
+    - 'hybrid': rule-based rewrite, falling back to Gemini only when it looks too weak.
+    """
+    local_query = _local_rewrite(user_query, clean_fn)
+    if local_query is not None:
+        return local_query, None
+    return _memoized_optimization(family, prompt_template, user_query, llm_fn)
+
+def _local_rewrite(user_query, clean_fn):
+    """Returns the rule-based rewrite when the optimizer mode accepts it, or None if the LLM is needed."""
+    mode = getattr(settings, 'QUERY_OPTIMIZER_MODE', 'llm')
+    if mode not in ('local', 'hybrid'):
+        return None
+    local_query = clean_fn(query_optimizer.optimize_query_locally(user_query))
+    if mode == 'local' or not query_optimizer.looks_weak(local_query, user_query):
+        return local_query or user_query
+    return None
+
+def clean_scholar_query(optimized_query):
+    """Post-processes an optimized Scholar/Exa/Tavily query into plain space-separated keywords."""
+    optimized_query = optimized_query.strip()
+    # Remove any double quotes that the model might still generate despite instructions
+    optimized_query = optimized_query.replace('"', '')
+    optimized_query = optimized_query.replace(',', ' ').strip()
+    optimized_query = re.sub(r'\s+', ' ', optimized_query)
+    return optimized_query
+
+def clean_doaj_query(optimized_query):
+    """Post-processes an optimized DOAJ query into plain space-separated keywords."""
     optimized_query = optimized_query.strip()
     # Remove any stray double quotes or commas
     optimized_query = optimized_query.replace('"', '').replace(',', '')
     # Ensure it's space-separated, consolidating multiple spaces
     optimized_query = re.sub(r'\s+', ' ', optimized_query).strip()
+    return optimized_query
 
-    return optimized_query, None
+def optimize_scholar_query(user_query):
+    """Uses Gemini to optimize a user's natural language query into a concise, effective,
+    and keyword-rich search query suitable for academic databases like Google Scholar.
+    The output query will be a single string of keywords, without internal double quotes.
+    Results are memoized per prompt version, so repeat queries skip the LLM call.
+    See _optimize_query for the local/hybrid modes.
+    """
+    return _optimize_query("scholar", SCHOLAR_QUERY_PROMPT, user_query, _optimize_scholar_query_llm, clean_scholar_query)
 
+def _optimize_scholar_query_llm(user_query):
+    optimized_query, error = generate_gemini(SCHOLAR_QUERY_PROMPT.format(user_query=user_query))
+    if error:
+        return user_query, error
+    return clean_scholar_query(optimized_query), None
 
-def search_google_scholar(query, num_results=7):
+def optimize_doaj_query(user_query):
+    """Uses Gemini to optimize a user's natural language query into a concise,
+    space-separated list of keywords suitable for DOAJ API search.
+    Results are memoized per prompt version, so repeat queries skip the LLM call.
+    See _optimize_query for the local/hybrid modes.
+    """
+    return _optimize_query("doaj", DOAJ_QUERY_PROMPT, user_query, _optimize_doaj_query_llm, clean_doaj_query)
+
+def _optimize_doaj_query_llm(user_query):
+    optimized_query, error = generate_gemini(DOAJ_QUERY_PROMPT.format(user_query=user_query))
+    if error:
+        return user_query, error
+    return clean_doaj_query(optimized_query), None
+
+
+# One prompt that produces every provider family's rewrite in a single Gemini call
+COMBINED_QUERY_PROMPT = """
+    You are an AI research assistant. Your task is to rephrase a user's natural language research query into search queries for academic databases, and to answer with a JSON object only.
+
+    Focus on:
+    - Extracting the core topic and key concepts.
+    - Expanding common abbreviations (e.g., "AI" to "Artificial Intelligence", "EHR" to "Electronic Health Record").
+    - Removing conversational filler ("I want to research...", "articles about...").
+    - Prioritizing academic terms.
+    - **Crucially, every value must be a space-separated list of keywords. Do NOT use double quotes around individual phrases, and do NOT add any commas or other punctuation between keywords.**
+
+    Return exactly these fields:
+    - "scholar": a concise, effective, and keyword-rich search query suitable for Google Scholar.
+    - "doaj": a concise list of keywords suitable for searching the DOAJ (Directory of Open Access Journals).
+
+    Example 1:
+    User Query: "i want to research Articles in AI"
+    JSON: {{"scholar": "Artificial Intelligence research articles", "doaj": "Artificial Intelligence"}}
+
+    Example 2:
+    User Query: "papers on climate change impact on agriculture"
+    JSON: {{"scholar": "climate change agriculture impact papers", "doaj": "climate change agriculture impact"}}
+
+    Example 3:
+    User Query: "i want AI-Enhanced EHR System with Intelligent Prescription Processing"
+    JSON: {{"scholar": "Artificial Intelligence Electronic Health Record Intelligent Prescription Processing", "doaj": "Artificial Intelligence Electronic Health Record Intelligent Prescription Processing"}}
+
+    User Query: "{user_query}"
+    JSON:
+    """
+
+# Post-processing and error label for each provider family's query variant
+QUERY_FAMILIES = {
+    "scholar": (clean_scholar_query, "Scholar/Exa"),
+    "doaj": (clean_doaj_query, "DOAJ"),
+}
+
+def optimize_queries(user_query):
+    """
+    Produces the query variant for every provider family ('scholar' for Scholar/Exa/Tavily, 'doaj' for DOAJ).
+    Returns (variants, errors); a family whose optimization failed falls back to the raw query.
+    With QUERY_OPTIMIZER_BATCHED (the default) every LLM rewrite comes from a single Gemini call,
+    otherwise optimize_scholar_query and optimize_doaj_query run side by side.
+    """
+    if getattr(settings, 'QUERY_OPTIMIZER_BATCHED', True):
+        outcomes = _optimize_queries_batched(user_query)
+    else:
+        scholar_future = _submit_search_task(optimize_scholar_query, user_query)
+        doaj_future = _submit_search_task(optimize_doaj_query, user_query) # Specific optimization for DOAJ
+        outcomes = {"scholar": scholar_future.result(), "doaj": doaj_future.result()}
+
+    variants = {}
+    errors = []
+    for family, (optimized_query, error) in outcomes.items():
+        if error:
+            errors.append(f"{QUERY_FAMILIES[family][1]} query optimization failed: {error}")
+            optimized_query = user_query # Fallback to original query
+        variants[family] = optimized_query
+    return variants, errors
+
+def _optimize_queries_batched(user_query):
+    """Returns {family: (optimized_query, error)}, asking Gemini once for whatever is not local or memoized."""
+    outcomes = {}
+    pending = []
+    version = search_cache.prompt_version(COMBINED_QUERY_PROMPT)
+    for family, (clean_fn, _label) in QUERY_FAMILIES.items():
+        local_query = _local_rewrite(user_query, clean_fn)
+        if local_query is not None:
+            outcomes[family] = (local_query, None)
+            continue
+        memo_key = optimizer_memo.make_key(family, version, user_query)
+        memoized = optimizer_memo.get(memo_key)
+        if memoized is not None:
+            outcomes[family] = (memoized, None)
+            continue
+        pending.append((family, clean_fn, memo_key))
+
+    if pending:
+        rewrites, error = _generate_combined_rewrites(user_query)
+        for family, clean_fn, memo_key in pending:
+            value = rewrites.get(family) if rewrites else None
+            # Sanitize each field exactly like the single-family optimizers; fall back per field
+            optimized_query = clean_fn(value) if isinstance(value, str) else ""
+            if optimized_query:
+                optimizer_memo.set(memo_key, optimized_query)
+                outcomes[family] = (optimized_query, None)
+            else:
+                outcomes[family] = (user_query, error or f"No usable '{family}' rewrite in the batched response.")
+    return outcomes
+
+def _generate_combined_rewrites(user_query):
+    """Makes the single batched Gemini call. Returns (dict of rewrites, error)."""
+    text, error = generate_gemini(
+        COMBINED_QUERY_PROMPT.format(user_query=user_query),
+        generation_config={"response_mime_type": "application/json"},
+    )
+    if error:
+        return None, error
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        # Tolerate a JSON object wrapped in prose or a code fence
+        match = re.search(r'\{.*\}', text, re.DOTALL)
+        try:
+            data = json.loads(match.group(0)) if match else None
+        except json.JSONDecodeError:
+            data = None
+    if not isinstance(data, dict):
+        return None, "Failed to parse the batched query rewrites returned by the AI."
+    return data, None
+
+
+def search_google_scholar(query, num_results=7, timeout=None):
     """Performs a search using the SerpApi Google Scholar API with improved debugging."""
-    scholar_results = []
-    error = None
-    
     params = {
         "engine": "google_scholar",
         "q": query,
@@ -290,188 +642,210 @@ def search_google_scholar(query, num_results=7):
         "api_key": settings.SERPAPI_API_KEY
     }
 
+    # SerpApi has a long latency tail, so slow searches may be hedged (see resilience.py)
+    return resilience.hedged_call(
+        "scholar", _search_google_scholar_once, params, timeout, is_failure=lambda result: bool(result[1])
+    )
+
+def _search_google_scholar_once(params, timeout=None):
+    """One SerpApi attempt for search_google_scholar. Returns (results, error)."""
     try:
         search = serpapi_client(params)
-        results_json = search.get_dict()
-        
-        if results_json.get('search_metadata', {}).get('status') == 'Error':
-            error = results_json.get('search_metadata', {}).get('error') or "Unknown SerpApi error."
-            return [], error
-        
-        if 'error' in results_json:
-            error = results_json['error']
-            return [], error
+        if timeout:
+            search.timeout = timeout # Passed to requests by the SerpApi client
+        with rate_limit.limit("serpapi"):
+            results_json = search.get_dict()
+        return parse_scholar_results(results_json)
+    except Exception as e:
+        return [], f"SerpApi Google Scholar search failed: {e}"
 
-        search_metadata = results_json.get('search_metadata', {}) 
-        if search_metadata.get('status') != 'Success':
-            error = f"Search not successful. Status: {search_metadata.get('status')}"
-            return [], error
+def parse_scholar_results(results_json):
+    """
+    Normalizes a SerpApi Google Scholar JSON response into result dicts.
+    Shared by the SDK-based and the httpx-based providers. Returns (results, error).
+    """
+    scholar_results = []
+
+    if results_json.get('search_metadata', {}).get('status') == 'Error':
+        error = results_json.get('search_metadata', {}).get('error') or "Unknown SerpApi error."
+        return [], error
+    
+    if 'error' in results_json:
+        error = results_json['error']
+        return [], error
 
-        organic_results = results_json.get('organic_results', [])
+    search_metadata = results_json.get('search_metadata', {}) 
+    if search_metadata.get('status') != 'Success':
+        error = f"Search not successful. Status: {search_metadata.get('status')}"
+        return [], error
 
-        if not organic_results:
-            return [], None
+    organic_results = results_json.get('organic_results', [])
+
+    if not organic_results:
+        return [], None
+
+    for i, result in enumerate(organic_results):
+        
+        title = result.get('title', NO_TITLE)
+        snippet = result.get('snippet', NO_SNIPPET)
+        main_link = result.get('link')
+        
+        pdf_link = None
+        source_type = "Google Scholar Article"
+        doi = ""
+        journal_name = ""
+        authors = ""
+        year = ""
+        volume = ""
+        pages = ""
+
+        if 'resources' in result:
+            for resource in result['resources']:
+                if resource.get('file_format') == 'PDF' and resource.get('link'):
+                    pdf_link = resource['link']
+                    break
 
-        for i, result in enumerate(organic_results):
+        if snippet:
+            doi_match = re.search(r'(10\.\d{4,}\/[^\s]+)', snippet)
+            if doi_match:
+                doi = doi_match.group(1).strip()
+        if not doi and main_link:
+            doi_match = re.search(r'(10\.\d{4,}\/[^\s]+)', main_link)
+            if doi_match:
+                doi = doi_match.group(1).strip()
+
+        pub_summary = result.get('publication_info', {}).get('summary', '')
+        if pub_summary:
+            # Extract authors (text before the first '-' or before a year if no '-')
+            author_match = re.match(r'^(.*?)(?: - |\b\d{4}\b|$)', pub_summary)
+            if author_match:
+                authors = author_match.group(1).strip()
             
-            title = result.get('title', 'No Title')
-            snippet = result.get('snippet', 'No snippet available.')
-            main_link = result.get('link')
+            # Extract year (e.g., "2017")
+            year_match = re.search(r'\b(\d{4})\b', pub_summary)
+            if year_match:
+                year = year_match.group(1)
             
-            pdf_link = None
-            source_type = "Google Scholar Article"
-            doi = ""
-            journal_name = ""
-            authors = ""
-            year = ""
-            volume = ""
-            pages = ""
-
-            if 'resources' in result:
-                for resource in result['resources']:
-                    if resource.get('file_format') == 'PDF' and resource.get('link'):
-                        pdf_link = resource['link']
-                        break
-
-            if snippet:
-                doi_match = re.search(r'(10\.\d{4,}\/[^\s]+)', snippet)
-                if doi_match:
-                    doi = doi_match.group(1).strip()
-            if not doi and main_link:
-                doi_match = re.search(r'(10\.\d{4,}\/[^\s]+)', main_link)
-                if doi_match:
-                    doi = doi_match.group(1).strip()
-
-            pub_summary = result.get('publication_info', {}).get('summary', '')
-            if pub_summary:
-                # Extract authors (text before the first '-' or before a year if no '-')
-                author_match = re.match(r'^(.*?)(?: - |\b\d{4}\b|$)', pub_summary)
-                if author_match:
-                    authors = author_match.group(1).strip()
-                
-                # Extract year (e.g., "2017")
-                year_match = re.search(r'\b(\d{4})\b', pub_summary)
-                if year_match:
-                    year = year_match.group(1)
-                
-                # Try to extract volume and pages from the summary (e.g., "69, S36-S40" or "541(7635), 1-10")
-                # Pattern: (volume)(optional sub-volume)(optional comma/space/colon)(pages)
-                # This regex aims to capture:
-                # 1. Volume (e.g., 69 or 135)
-                # 2. Optional sub-volume (e.g., (1))
-                # 3. Pages (e.g., S36-S40 or 1-10)
-                
-                # Remove author part if present to simplify parsing the rest
-                temp_summary_for_parsing = pub_summary
-                if authors:
-                    temp_summary_for_parsing = temp_summary_for_parsing.replace(authors, '', 1).strip(' -').strip(',')
-                
-                vol_pages_match = re.search(r'(\d+)(?:\((\d+)\))?(?:,\s*|:\s*|\s*)(S?\d+-\d+|\d+-\d+)', temp_summary_for_parsing)
-                if vol_pages_match:
-                    volume = vol_pages_match.group(1)
-                    pages = vol_pages_match.group(3) # Group 3 captures the pages (e.g., S36-S40 or 1-10)
-                else: # Try just volume if no pages
-                    vol_match = re.search(r'\b(\d{4})\b', temp_summary_for_parsing)
-                    if vol_match and vol_match.group(1) != year: # Ensure it's not the year itself
-                        volume = vol_match.group(1)
-
-                # Extract journal name:
-                # It's usually the part between authors and the year/volume/pages info.
-                journal_candidate = temp_summary_for_parsing
-                journal_candidate = re.sub(r'\b\d{4}\b', '', journal_candidate).strip(',').strip() # Remove year
-                if volume:
-                    journal_candidate = journal_candidate.replace(volume, '', 1).strip(',').strip()
-                if pages:
-                    journal_candidate = journal_candidate.replace(pages, '', 1).strip(',').strip()
-                
-                # Remove any remaining numeric or short parts, and common delimiters
-                journal_candidate = re.sub(r'\b\d+\b', '', journal_candidate).strip() # Remove any remaining numbers
-                journal_candidate = re.sub(r'[,;:\-()]', '', journal_candidate).strip() # Remove common delimiters
-
-                if journal_candidate and len(journal_candidate) > 3: # Heuristic for journal name
-                    journal_name = journal_candidate.split(',')[0].strip() # Take first part if comma separated
-
-            url_to_use = main_link or pdf_link
-
-            if url_to_use:
-                scholar_results.append({
-                    "title": title,
-                    "url": url_to_use,
-                    "pdf_url": pdf_link,
-                    "main_pub_url": main_link,
-                    "content_snippet": snippet,
-                    "source_type": source_type,
-                    "authors": authors,
-                    "year": year,
-                    "doi": doi,
-                    "journal_name": journal_name,
-                    "volume": volume,
-                    "pages": pages
-                })
-            # else:
-            #     # In Django, we won't have st.warning, but can log or add to error list
-            #     pass
+            # Try to extract volume and pages from the summary (e.g., "69, S36-S40" or "541(7635), 1-10")
+            # Pattern: (volume)(optional sub-volume)(optional comma/space/colon)(pages)
+            # This regex aims to capture:
+            # 1. Volume (e.g., 69 or 135)
+            # 2. Optional sub-volume (e.g., (1))
+            # 3. Pages (e.g., S36-S40 or 1-10)
+            
+            # Remove author part if present to simplify parsing the rest
+            temp_summary_for_parsing = pub_summary
+            if authors:
+                temp_summary_for_parsing = temp_summary_for_parsing.replace(authors, '', 1).strip(' -').strip(',')
+            
+            vol_pages_match = re.search(r'(\d+)(?:\((\d+)\))?(?:,\s*|:\s*|\s*)(S?\d+-\d+|\d+-\d+)', temp_summary_for_parsing)
+            if vol_pages_match:
+                volume = vol_pages_match.group(1)
+                pages = vol_pages_match.group(3) # Group 3 captures the pages (e.g., S36-S40 or 1-10)
+            else: # Try just volume if no pages
+                vol_match = re.search(r'\b(\d{4})\b', temp_summary_for_parsing)
+                if vol_match and vol_match.group(1) != year: # Ensure it's not the year itself
+                    volume = vol_match.group(1)
+
+            # Extract journal name:
+            # It's usually the part between authors and the year/volume/pages info.
+            journal_candidate = temp_summary_for_parsing
+            journal_candidate = re.sub(r'\b\d{4}\b', '', journal_candidate).strip(',').strip() # Remove year
+            if volume:
+                journal_candidate = journal_candidate.replace(volume, '', 1).strip(',').strip()
+            if pages:
+                journal_candidate = journal_candidate.replace(pages, '', 1).strip(',').strip()
+            
+            # Remove any remaining numeric or short parts, and common delimiters
+            journal_candidate = re.sub(r'\b\d+\b', '', journal_candidate).strip() # Remove any remaining numbers
+            journal_candidate = re.sub(r'[,;:\-()]', '', journal_candidate).strip() # Remove common delimiters
+
+            if journal_candidate and len(journal_candidate) > 3: # Heuristic for journal name
+                journal_name = journal_candidate.split(',')[0].strip() # Take first part if comma separated
+
+        url_to_use = main_link or pdf_link
+
+        if url_to_use:
+            scholar_results.append({
+                "title": title,
+                "url": url_to_use,
+                "pdf_url": pdf_link,
+                "main_pub_url": main_link,
+                "content_snippet": snippet,
+                "source_type": source_type,
+                "authors": authors,
+                "year": year,
+                "doi": doi,
+                "journal_name": journal_name,
+                "volume": volume,
+                "pages": pages
+            })
+        # else:
+        #     # In Django, we won't have st.warning, but can log or add to error list
+        #     pass
 
-    except Exception as e:
-        error = f"SerpApi Google Scholar search failed: {e}"
-    
-    return scholar_results, error
+    return scholar_results, None
 
-def search_exa(query, num_results=7):
-    """Performs a search using the Exa.ai API (document retrieval), now with domain filtering."""
+def search_exa(query, num_results=7, timeout=None):
+    """
+    Performs a search using the Exa.ai API (document retrieval), now with domain filtering.
+    The Exa SDK takes no timeout, so `timeout` is only honoured by the httpx backend.
+    """
     exa_results = []
     error = None
     try:
-        response = exa_client.search(
-            query=query,
-            num_results=num_results,
-            type="neural",
-            include_domains=ACADEMIC_DOMAINS # NEW: Apply domain filter
-        )
+        with rate_limit.limit("exa"):
+            response = exa_client.search(
+                query=query,
+                num_results=num_results,
+                type="neural",
+                include_domains=ACADEMIC_DOMAINS # NEW: Apply domain filter
+            )
         
         if response.results:
-            for i, result in enumerate(response.results):
-                title = result.title or "No Title"
-                url = result.url
-                snippet = result.text or "No snippet available."
-                authors = result.author or ""
-                year = ""
-                if result.published_date:
-                    try:
-                        year = str(datetime.datetime.strptime(result.published_date, '%Y-%m-%d').year)
-                    except ValueError:
-                        year = result.published_date.split('-')[0]
-                
-                # Exa results typically don't provide volume/pages directly, so leave them empty
-                volume = ""
-                pages = ""
-
-                if url:
-                    exa_results.append({
-                        "title": title,
-                        "url": url,
-                        "content_snippet": snippet,
-                        "source_type": "Exa.ai Search",
-                        "query": query,
-                        "authors": authors,
-                        "year": year,
-                        "pdf_url": "", # Exa doesn't typically provide direct PDF links, but its main URL could be a PDF
-                        "main_pub_url": url,
-                        "doi": "",
-                        "journal_name": "",
-                        "volume": volume,
-                        "pages": pages
-                    })
-                # else:
-                #     pass # Log or handle missing URL
+            for result in response.results:
+                normalized = normalize_exa_result(
+                    result.title, result.url, result.text, result.author, result.published_date, query
+                )
+                if normalized:
+                    exa_results.append(normalized)
 
     except Exception as e:
         error = f"Exa.ai search failed: {e}"
     
     return exa_results, error
 
+def normalize_exa_result(title, url, text, author, published_date, query):
+    """Builds a result dict from the fields of one Exa.ai search hit. Returns None if it has no URL."""
+    if not url:
+        return None
+
+    year = ""
+    if published_date:
+        try:
+            year = str(datetime.datetime.strptime(published_date, '%Y-%m-%d').year)
+        except ValueError:
+            year = published_date.split('-')[0]
+
+    # Exa results typically don't provide volume/pages directly, so leave them empty
+    return {
+        "title": title or NO_TITLE,
+        "url": url,
+        "content_snippet": text or NO_SNIPPET,
+        "source_type": "Exa.ai Search",
+        "query": query,
+        "authors": author or "",
+        "year": year,
+        "pdf_url": "", # Exa doesn't typically provide direct PDF links, but its main URL could be a PDF
+        "main_pub_url": url,
+        "doi": "",
+        "journal_name": "",
+        "volume": "",
+        "pages": ""
+    }
+
 # Corrected DOAJ Search Function
-def search_doaj(query, num_results=7):
+def search_doaj(query, num_results=7, timeout=None):
     """Performs an article search using the DOAJ API, passing query as 'q' parameter."""
     doaj_results = []
     error = None
@@ -488,93 +862,12 @@ def search_doaj(query, num_results=7):
             "pageSize": num_results
         }
         
-        response = requests.get(full_url, params=params, timeout=15)
+        with rate_limit.limit("doaj"):
+            response = requests.get(full_url, params=params, timeout=timeout or 15)
         response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
         
         data = response.json()
-        
-        if data.get('results'):
-            for result in data['results']:
-                bibjson = result.get('bibjson', {})
-                
-                title = bibjson.get('title', 'No Title')
-                
-                # Try to find a fulltext HTML link, then PDF, then any link
-                url = None # This will be the primary URL for the item
-                pdf_url = None
-                main_pub_url = None
-
-                links = bibjson.get('link', [])
-                for link in links:
-                    if link.get('type') == 'fulltext' and link.get('url'):
-                        url = link['url']
-                        main_pub_url = link['url'] # Assume fulltext is main publication URL
-                    if link.get('type') == 'pdf' and link.get('url'):
-                        pdf_url = link['url']
-                
-                # If no specific fulltext or PDF URL found, take the first available link
-                if not url and links:
-                    for link in links: # Iterate to find the first general URL
-                        if link.get('url'):
-                            url = link['url']
-                            if not main_pub_url: # If main_pub_url wasn't set by fulltext, use this one
-                                main_pub_url = url
-                            break # Take the first available URL
-                
-                authors_list = bibjson.get('author', [])
-                authors = ", ".join([a.get('name', '') for a in authors_list if a.get('name')])
-                
-                # Year can be at bibjson level or inside journal info
-                year = bibjson.get('year', '')
-                journal_info = bibjson.get('journal', {})
-                journal_name = journal_info.get('title', '')
-                volume = journal_info.get('volume', '')
-
-                # Pages from start_page and end_page
-                pages = ""
-                start_page = bibjson.get('start_page')
-                end_page = bibjson.get('end_page')
-
-                if start_page is not None and end_page is not None:
-                    pages = f"{start_page}-{end_page}"
-                elif start_page is not None:
-                    pages = str(start_page)
-                elif end_page is not None:
-                    pages = str(end_page)
-                
-                # Ensure year is string
-                year = str(year) if year else ""
-                
-                doi_identifiers = [i.get('id') for i in bibjson.get('identifier', []) if i.get('type') == 'doi']
-                doi = doi_identifiers[0] if doi_identifiers else ''
-
-                # DOAJ search results typically don't include snippets or abstracts directly.
-                # We can try to get the abstract from the bibjson if present, though it's rare in search results.
-                content_snippet = bibjson.get('abstract', 'No abstract available from DOAJ search result.')
-                if not content_snippet or len(content_snippet) < 50:
-                    content_snippet = 'No snippet available from DOAJ search result.'
-
-
-                if url:
-                    doaj_results.append({
-                        "title": title,
-                        "url": url,
-                        "pdf_url": pdf_url,
-                        "main_pub_url": main_pub_url,
-                        "content_snippet": content_snippet,
-                        "source_type": "DOAJ Article",
-                        "query": query,
-                        "authors": authors,
-                        "year": year,
-                        "doi": doi,
-                        "journal_name": journal_name,
-                        "volume": volume,
-                        "pages": pages
-                    })
-                # else:
-                #     pass # Log or handle missing URL
-        # else:
-        #     pass # Log no articles found
+        doaj_results = parse_doaj_articles(data, query)
 
     except requests.exceptions.RequestException as e:
         error = f"DOAJ API request failed: {e}"
@@ -585,7 +878,92 @@ def search_doaj(query, num_results=7):
     
     return doaj_results, error
 
-def search_doaj_journals(query, num_results=7):
+def parse_doaj_articles(data, query):
+    """Normalizes a DOAJ article search JSON response into result dicts."""
+    doaj_results = []
+    for result in data.get('results') or []:
+        bibjson = result.get('bibjson', {})
+        
+        title = bibjson.get('title', NO_TITLE)
+        
+        # Try to find a fulltext HTML link, then PDF, then any link
+        url = None # This will be the primary URL for the item
+        pdf_url = None
+        main_pub_url = None
+
+        links = bibjson.get('link', [])
+        for link in links:
+            if link.get('type') == 'fulltext' and link.get('url'):
+                url = link['url']
+                main_pub_url = link['url'] # Assume fulltext is main publication URL
+            if link.get('type') == 'pdf' and link.get('url'):
+                pdf_url = link['url']
+        
+        # If no specific fulltext or PDF URL found, take the first available link
+        if not url and links:
+            for link in links: # Iterate to find the first general URL
+                if link.get('url'):
+                    url = link['url']
+                    if not main_pub_url: # If main_pub_url wasn't set by fulltext, use this one
+                        main_pub_url = url
+                    break # Take the first available URL
+        
+        authors_list = bibjson.get('author', [])
+        authors = ", ".join([a.get('name', '') for a in authors_list if a.get('name')])
+        
+        # Year can be at bibjson level or inside journal info
+        year = bibjson.get('year', '')
+        journal_info = bibjson.get('journal', {})
+        journal_name = journal_info.get('title', '')
+        volume = journal_info.get('volume', '')
+
+        # Pages from start_page and end_page
+        pages = ""
+        start_page = bibjson.get('start_page')
+        end_page = bibjson.get('end_page')
+
+        if start_page is not None and end_page is not None:
+            pages = f"{start_page}-{end_page}"
+        elif start_page is not None:
+            pages = str(start_page)
+        elif end_page is not None:
+            pages = str(end_page)
+        
+        # Ensure year is string
+        year = str(year) if year else ""
+        
+        doi_identifiers = [i.get('id') for i in bibjson.get('identifier', []) if i.get('type') == 'doi']
+        doi = doi_identifiers[0] if doi_identifiers else ''
+
+        # DOAJ search results typically don't include snippets or abstracts directly.
+        # We can try to get the abstract from the bibjson if present, though it's rare in search results.
+        content_snippet = bibjson.get('abstract', 'No abstract available from DOAJ search result.')
+        if not content_snippet or len(content_snippet) < 50:
+            content_snippet = NO_DOAJ_SNIPPET
+
+
+        if url:
+            doaj_results.append({
+                "title": title,
+                "url": url,
+                "pdf_url": pdf_url,
+                "main_pub_url": main_pub_url,
+                "content_snippet": content_snippet,
+                "source_type": "DOAJ Article",
+                "query": query,
+                "authors": authors,
+                "year": year,
+                "doi": doi,
+                "journal_name": journal_name,
+                "volume": volume,
+                "pages": pages
+            })
+        # else:
+        #     pass # Log or handle missing URL
+
+    return doaj_results
+
+def search_doaj_journals(query, num_results=7, timeout=None):
     """Performs a journal search using the DOAJ API."""
     doaj_journal_results = []
     error = None
@@ -600,64 +978,12 @@ def search_doaj_journals(query, num_results=7):
             "pageSize": num_results
         }
         
-        response = requests.get(full_url, params=params, timeout=15)
+        with rate_limit.limit("doaj"):
+            response = requests.get(full_url, params=params, timeout=timeout or 15)
         response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
         
         data = response.json()
-        
-        if data.get('results'):
-            for result in data['results']:
-                bibjson = result.get('bibjson', {})
-                
-                title = bibjson.get('title', 'No Title')
-                publisher = bibjson.get('publisher', '')
-                
-                issns = []
-                for identifier in bibjson.get('identifier', []):
-                    if identifier.get('type') in ['pissn', 'eissn'] and identifier.get('id'):
-                        issns.append(identifier['id'])
-                issn = ", ".join(issns) if issns else ""
-
-                journal_url = None
-                links = bibjson.get('link', [])
-                # First, try to find a homepage link
-                for link in links:
-                    if link.get('type') == 'homepage' and link.get('url'):
-                        journal_url = link['url']
-                        break
-                # If no homepage found, try to find any link with a URL
-                if not journal_url:
-                    for link in links:
-                        if link.get('url'):
-                            journal_url = link['url']
-                            break # Take the first available URL
-                
-                # Content snippet for a journal could be its keywords or a general description
-                keywords = bibjson.get('keywords', [])
-                content_snippet = f"Keywords: {', '.join(keywords)}" if keywords else "No detailed description available for this journal."
-
-                if journal_url:
-                    doaj_journal_results.append({
-                        "title": title,
-                        "url": journal_url,
-                        "pdf_url": "", # Not applicable for journal entry
-                        "main_pub_url": journal_url,
-                        "content_snippet": content_snippet,
-                        "source_type": "DOAJ Journal", # Specific source type for journals
-                        "query": query,
-                        "authors": "", # Not applicable for journal entry
-                        "year": "", # Not applicable for journal entry
-                        "doi": "", # Not applicable for journal entry
-                        "journal_name": title, # Journal title is the title of the entry
-                        "volume": "", # Not applicable for journal entry
-                        "pages": "", # Not applicable for journal entry
-                        "publisher": publisher, # New field for journals
-                        "issn": issn # New field for journals
-                    })
-                # else:
-                #     pass # Log or handle missing URL
-        # else:
-        #     pass # Log no journals found
+        doaj_journal_results = parse_doaj_journals(data, query)
 
     except requests.exceptions.RequestException as e:
         error = f"DOAJ Journal API request failed: {e}"
@@ -669,19 +995,82 @@ def search_doaj_journals(query, num_results=7):
     return doaj_journal_results, error
 
 
-def generate_exa_research_report(query):
+def parse_doaj_journals(data, query):
+    """Normalizes a DOAJ journal search JSON response into result dicts."""
+    doaj_journal_results = []
+    for result in data.get('results') or []:
+        bibjson = result.get('bibjson', {})
+        
+        title = bibjson.get('title', NO_TITLE)
+        publisher = bibjson.get('publisher', '')
+        
+        issns = []
+        for identifier in bibjson.get('identifier', []):
+            if identifier.get('type') in ['pissn', 'eissn'] and identifier.get('id'):
+                issns.append(identifier['id'])
+        issn = ", ".join(issns) if issns else ""
+
+        journal_url = None
+        links = bibjson.get('link', [])
+        # First, try to find a homepage link
+        for link in links:
+            if link.get('type') == 'homepage' and link.get('url'):
+                journal_url = link['url']
+                break
+        # If no homepage found, try to find any link with a URL
+        if not journal_url:
+            for link in links:
+                if link.get('url'):
+                    journal_url = link['url']
+                    break # Take the first available URL
+        
+        # Content snippet for a journal could be its keywords or a general description
+        keywords = bibjson.get('keywords', [])
+        content_snippet = f"Keywords: {', '.join(keywords)}" if keywords else NO_JOURNAL_DESCRIPTION
+
+        if journal_url:
+            doaj_journal_results.append({
+                "title": title,
+                "url": journal_url,
+                "pdf_url": "", # Not applicable for journal entry
+                "main_pub_url": journal_url,
+                "content_snippet": content_snippet,
+                "source_type": "DOAJ Journal", # Specific source type for journals
+                "query": query,
+                "authors": "", # Not applicable for journal entry
+                "year": "", # Not applicable for journal entry
+                "doi": "", # Not applicable for journal entry
+                "journal_name": title, # Journal title is the title of the entry
+                "volume": "", # Not applicable for journal entry
+                "pages": "", # Not applicable for journal entry
+                "publisher": publisher, # New field for journals
+                "issn": issn # New field for journals
+            })
+        # else:
+        #     pass # Log or handle missing URL
+
+    return doaj_journal_results
+
+
+def exa_research_messages(query):
+    """Builds the chat messages sent to the `exa-research` model."""
+    return [
+        {"role": "user", "content": f"Provide a comprehensive, concise, and structured summary of the research topic: {query}"}
+    ]
+
+def generate_exa_research_report(query, timeout=None):
     """
     Generates a comprehensive research report using Exa.ai's research task API via OpenAI client.
     """
     report_content = ""
     try:
-        completion = openai_exa_client.chat.completions.create(
-            model="exa-research",
-            messages=[
-                {"role": "user", "content": f"Provide a comprehensive, concise, and structured summary of the research topic: {query}"}
-            ],
-            stream=False, # Changed to False for Django's request-response model
-        )
+        with rate_limit.limit("exa_research"):
+            completion = openai_exa_client.chat.completions.create(
+                model="exa-research",
+                messages=exa_research_messages(query),
+                stream=False, # Changed to False for Django's request-response model
+                timeout=timeout or getattr(settings, 'EXA_RESEARCH_TIMEOUT', 120.0),
+            )
         if completion.choices and completion.choices[0].message and completion.choices[0].message.content:
             report_content = completion.choices[0].message.content
         else:
@@ -693,180 +1082,535 @@ def generate_exa_research_report(query):
     return report_content
 
 
-def perform_unified_search(query):
+# Built-in providers in merge-precedence order: a later provider's fields override an earlier one's
+# for the same URL. Limits, timeouts and enable flags can be overridden at runtime (see providers.py).
+providers.register(providers.SearchProvider(
+    "tavily", search_tavily, "scholar", "Tavily search", cost_class=providers.STANDARD, critical=True,
+))
+providers.register(providers.SearchProvider(
+    "scholar", search_google_scholar, "scholar", "Google Scholar search", cost_class=providers.PREMIUM, critical=True,
+))
+providers.register(providers.SearchProvider(
+    "exa", search_exa, "scholar", "Exa.ai individual article search", cost_class=providers.STANDARD, critical=True,
+))
+providers.register(providers.SearchProvider(
+    "doaj", search_doaj, "doaj", "DOAJ article search", cost_class=providers.FREE,
+))
+providers.register(providers.SearchProvider(
+    "doaj_journals", search_doaj_journals, "doaj", "DOAJ journal search", cost_class=providers.FREE,
+))
+
+_search_executor = None
+_search_executor_lock = threading.Lock()
+
+def get_search_executor():
+    """Returns the process-wide, bounded thread pool used to fan out provider calls."""
+    global _search_executor
+    if _search_executor is None:
+        with _search_executor_lock:
+            if _search_executor is None:
+                _search_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'SEARCH_EXECUTOR_MAX_WORKERS', 16),
+                    thread_name_prefix="search-provider",
+                )
+    return _search_executor
+
+def _is_concurrent_mode():
+    return getattr(settings, 'SEARCH_EXECUTION_MODE', 'concurrent') == 'concurrent'
+
+def _use_async_providers():
+    """True when provider calls should go through the httpx-based async layer instead of the SDKs."""
+    return getattr(settings, 'SEARCH_PROVIDER_BACKEND', 'sdk') == 'httpx'
+
+def _submit_search_task(fn, *args, **kwargs):
+    """
+    Schedules a provider call and returns a Future.
+    In 'sequential' execution mode the call runs inline and an already-resolved Future is returned,
+    so callers can use the same code path for both modes.
+    """
+    if not _is_concurrent_mode():
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return get_search_executor().submit(fn, *args, **kwargs)
+
+def _resolved_future(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+def _submit_provider_search(provider, query):
+    """
+    Schedules one provider search on the configured backend and returns a Future of (results, error).
+    The provider's circuit breaker may skip the call with a fast error, and sets its adaptive timeout.
+    Providers without an httpx counterpart always use their sync search function.
+    """
+    breaker = resilience.get_breaker(provider.key)
+    if not breaker.allow():
+        return _resolved_future(([], breaker.open_error()))
+    timeout = breaker.timeout(ceiling=provider.timeout)
+    started = time.monotonic()
+    waits = rate_limit.Waits()
+    async_provider = None
+    if _use_async_providers():
+        from . import async_providers
+        async_provider = async_providers.PROVIDERS.get(provider.key)
+    if async_provider is not None:
+        coro = rate_limit.ameasure(
+            waits, async_provider.search_with_error(query, num_results=provider.num_results, timeout=timeout)
+        )
+        if _is_concurrent_mode():
+            # The event loop does the waiting, so no executor thread is held per provider
+            future = async_providers.submit(coro)
+        else:
+            future = _submit_search_task(async_providers.run_sync, coro)
+    else:
+        future = _submit_search_task(rate_limit.measure, waits, provider.search, query, timeout=timeout)
+    return resilience.track(breaker, started, future, lambda result: bool(result[1]), timeout, waits=waits)
+
+def _submit_research_report(query):
+    """
+    Returns a Future of the Exa.ai research report text for `query`, served from the shared search
+    cache when possible. Stale reports are returned immediately and refreshed in the background.
+    """
+    if not search_cache.is_enabled():
+        return _schedule_research_report(query)
+
+    cache_key = search_cache.make_key("report", query)
+    cached_report, state = search_cache.lookup(cache_key)
+    if state == search_cache.MISS:
+        future = _schedule_research_report(query)
+        future.add_done_callback(lambda done: _cache_research_report(cache_key, done))
+        return future
+
+    if state == search_cache.STALE and search_cache.claim_refresh(cache_key):
+        refresh = _schedule_research_report(query)
+        refresh.add_done_callback(lambda done: _cache_research_report(cache_key, done, release=True))
+    return _resolved_future(cached_report)
+
+def _cache_research_report(cache_key, future, release=False):
+    """Done-callback that caches a successfully generated research report."""
+    try:
+        report = future.result()
+        if is_usable_report(report):
+            search_cache.store(cache_key, report)
+    except Exception:
+        pass
+    finally:
+        if release:
+            search_cache.release_refresh(cache_key)
+
+def is_usable_report(report):
+    """False for error texts (generation errors, open breaker, rate limits) and empty reports, which are not worth serving to other users."""
+    return bool(report) and not report.startswith("🚨") and report.strip() != "No report content generated."
+
+def _schedule_research_report(query):
+    """Schedules the Exa.ai research report on the configured backend and returns a Future of the report text."""
+    breaker = resilience.get_breaker("exa_report")
+    if not breaker.allow():
+        return _resolved_future(f"🚨 Error generating Exa.ai Research Report: {breaker.open_error()}")
+    timeout = breaker.timeout()
+    started = time.monotonic()
+    waits = rate_limit.Waits()
+    if _use_async_providers():
+        from . import async_providers
+        coro = rate_limit.ameasure(waits, async_providers.generate_exa_research_report(query, timeout=timeout))
+        if _is_concurrent_mode():
+            future = async_providers.submit(coro)
+        else:
+            future = _submit_search_task(async_providers.run_sync, coro)
+    else:
+        future = _submit_search_task(rate_limit.measure, waits, generate_exa_research_report, query, timeout=timeout)
+    return resilience.track(
+        breaker, started, future, lambda report: not report or report.startswith("🚨"), timeout, waits=waits
+    )
+
+def _start_speculative_searches(query, search_providers):
+    """
+    Speculative dispatch: fires the SEARCH_SPECULATIVE_PROVIDERS searches on the raw query so their
+    network time overlaps the LLM optimization. Returns {provider key: Future of (results, error)}.
+    Only used in concurrent mode with an LLM-backed optimizer; the local optimizer is too fast to overlap.
+    """
+    if not getattr(settings, 'SEARCH_SPECULATIVE_DISPATCH', False) or not _is_concurrent_mode():
+        return {}
+    if getattr(settings, 'QUERY_OPTIMIZER_MODE', 'llm') == 'local':
+        return {}
+    speculative_keys = getattr(settings, 'SEARCH_SPECULATIVE_PROVIDERS', ["tavily", "exa"])
+    return {
+        provider.key: _submit_provider_search(provider, query)
+        for provider in search_providers
+        if provider.key in speculative_keys
+    }
+
+def _speculative_fallback(speculative_future, provider_results, provider_error):
+    """Returns the raw-query results when the reissued search failed but the speculative one succeeded."""
+    try:
+        speculative_results, speculative_error = speculative_future.result()
+    except Exception:
+        return provider_results, provider_error
+    if speculative_error:
+        return provider_results, provider_error
+    return speculative_results, None
+
+def perform_unified_search(query, include_report=True):
     """
     Performs search across Tavily, Google Scholar, Exa.ai (search), and DOAJ,
     and also initiates an Exa.ai research task.
-    Returns merged individual results (articles and journals) and the Exa.ai research report.
+    Returns merged individual results (articles and journals, as results.SearchResult records), the
+    Exa.ai research report, the errors, and the providers still running when the latency budget ran out ({'search_id', 'providers', ...}
+    for poll_late_results(), or None when every provider answered in time).
+    With include_report=False the research task is skipped and the report is None; callers then
+    use start_research_report() to generate it in the background.
+    """
+    for event in iter_unified_search(query, include_report=include_report):
+        if event["type"] == "done":
+            return event["results"], event["report"], event["errors"], event["late"]
+
+
+def iter_unified_search(query, include_report=True, use_cache=True, latency_budget=None):
     """
-    all_processed_results = {}
+    Generator form of perform_unified_search that reports progress while providers run.
+
+    With SEARCH_EXECUTION_MODE = 'concurrent' (the default) all providers are fanned out at once on
+    the shared search executor, so wall time is roughly that of the slowest provider. Yields dicts:
+    - {"type": "error", "message": ...} as soon as an optimization or provider error is known.
+    - {"type": "provider", "provider": key, "results": [...]} as soon as a provider finishes, with its
+      results in merged form (provisionally combined with whatever arrived before it).
+    - {"type": "done", "results": [...], "report": ..., "errors": [...], "late": ...} once, at the end.
+      These final results are always merged in provider registration order, so the merge precedence
+      is deterministic and the same as in 'sequential' mode, regardless of which provider answered first.
+
+    Only the enabled providers from the registry are searched, each with its own result quota (see providers.py).
+
+    Providers get SEARCH_LATENCY_BUDGET seconds (or `latency_budget`; 0 disables it) from the start of
+    the search, optimization included. Providers still running at the deadline are left out of the
+    'done' results and listed in its 'late' entry; their results are stored under the search id as
+    they arrive, for poll_late_results(). The research report is not bound by the budget.
+
+    Finished result sets are kept in the shared search cache (see search_cache.py). A cache hit
+    yields only the 'done' event; a stale hit also schedules one background refresh.
+    With use_cache=False the cache is not read, but the fresh result set is still stored.
+
+    Identical searches already in flight (in this process or another worker) are coalesced: the
+    caller waits for that search and yields only its 'done' event (see single_flight.py).
+    """
+    search_providers = providers.enabled_providers()
+    cache_key = search_cache.make_key(
+        "search", query, [f"{provider.key}:{provider.num_results}" for provider in search_providers]
+    )
+    if use_cache and search_cache.is_enabled():
+        cached_results, state = search_cache.lookup(cache_key)
+        if state != search_cache.MISS:
+            if state == search_cache.STALE and search_cache.claim_refresh(cache_key):
+                # A dedicated thread, since the refresh itself fans out on the search executor
+                threading.Thread(
+                    target=_with_db_cleanup, args=(_refresh_search_cache, query, cache_key), daemon=True
+                ).start()
+            cached_results = [SearchResult.from_dict(result) for result in cached_results]
+            for result in cached_results:
+                result.query = query # Keep the caller's wording of the query
+            report = _submit_research_report(query).result() if include_report else None
+            yield {"type": "done", "results": cached_results, "report": report, "errors": [], "late": None}
+            return
+
+    is_leader = False
+    if use_cache and single_flight.is_enabled():
+        is_leader, shared = single_flight.join(cache_key)
+        if not is_leader and shared is None:
+            # An identical search is still running; another attempt here would only pile onto the providers
+            message = "The same search is already running and taking unusually long, please try again in a moment."
+            yield {"type": "error", "message": message}
+            yield {"type": "done", "results": [], "report": None, "errors": [message], "late": None}
+            return
+        if shared is not None:
+            # Each follower gets its own records, since callers annotate the results they are given
+            shared = dict(shared, results=[SearchResult.from_dict(result) for result in shared["results"]])
+            for result in shared["results"]:
+                result.query = query
+            for error in shared["errors"]:
+                yield {"type": "error", "message": error}
+            report = _submit_research_report(query).result() if include_report else None
+            yield dict(shared, type="done", report=report)
+            return
+
+    try:
+        for event in _iter_provider_search(query, include_report, search_providers, cache_key, latency_budget):
+            if event["type"] == "done" and is_leader:
+                single_flight.publish(cache_key, {
+                    "results": [result.to_compact() for result in event["results"]],
+                    "errors": event["errors"],
+                    "late": event["late"],
+                })
+                is_leader = False
+            yield event
+    finally:
+        if is_leader:
+            # The search failed or its consumer went away; let followers run their own
+            single_flight.publish(cache_key, None)
+
+def _iter_provider_search(query, include_report, search_providers, cache_key, latency_budget):
+    """The uncached part of iter_unified_search: optimize, fan out to the providers and merge."""
+    if latency_budget is None:
+        latency_budget = getattr(settings, 'SEARCH_LATENCY_BUDGET', 6.0)
+    deadline = time.monotonic() + latency_budget if latency_budget else None
+
+    merger = merge.ResultMerger()
     errors = []
-    
-    # Optimize the query once for all search engines
-    optimized_scholar_exa_query, opt_schol_err = optimize_scholar_query(query)
-    if opt_schol_err:
-        errors.append(f"Scholar/Exa query optimization failed: {opt_schol_err}")
-        optimized_scholar_exa_query = query # Fallback to original query
-    
-    doaj_optimized_query, opt_doaj_err = optimize_doaj_query(query) # NEW: Specific optimization for DOAJ
-    if opt_doaj_err:
-        errors.append(f"DOAJ query optimization failed: {opt_doaj_err}")
-        doaj_optimized_query = query # Fallback to original query
-
-    # 1. Search with Tavily (using optimized query and domain filter)
-    tavily_results, tavily_error = search_tavily(optimized_scholar_exa_query)
-    if tavily_error:
-        errors.append(f"Tavily search encountered an issue: {tavily_error}")
-    for result in tavily_results:
-        url = result.get('url')
-        if url:
-            all_processed_results[url] = {
-                "title": result.get('title', 'No Title'),
-                "url": url,
-                "content_snippet": result.get('content', 'No snippet available.'),
-                "source_type": result.get('source', 'Website'),
-                "query": query, # Store original query
-                "optimized_query": optimized_scholar_exa_query, # Store optimized query
-                "summary": None,
-                "annotation": None,
-                "authors": "",
-                "year": "",
-                "pdf_url": "",
-                "main_pub_url": "",
-                "doi": "",
-                "journal_name": "",
-                "volume": "",
-                "pages": "",
-                "publisher": "", # Default for non-journal entries
-                "issn": "" # Default for non-journal entries
-            }
-
-    # 2. Search with Google Scholar (already uses optimized query)
-    scholar_results, scholar_error = search_google_scholar(optimized_scholar_exa_query)
-    if scholar_error:
-        errors.append(f"Google Scholar search encountered an issue: {scholar_error}")
-    for result in scholar_results:
-        url = result.get('url')
-        if url:
-            existing_data = all_processed_results.get(url, {})
-            all_processed_results[url] = {
-                "title": result.get('title', existing_data.get('title', 'No Title')),
-                "url": url,
-                "content_snippet": result.get('content_snippet', existing_data.get('content_snippet', 'No snippet available.')),
-                "source_type": result.get('source_type', existing_data.get('source_type', 'Website')),
-                "query": query,
-                "optimized_query": optimized_scholar_exa_query,
-                "summary": existing_data.get('summary'),
-                "annotation": existing_data.get('annotation'),
-                "authors": result.get('authors', existing_data.get('authors', '')),
-                "year": result.get('year', existing_data.get('year', '')),
-                "pdf_url": result.get('pdf_url', existing_data.get('pdf_url', '')),
-                "main_pub_url": result.get('main_pub_url', existing_data.get('main_pub_url', '')),
-                "doi": result.get('doi', existing_data.get('doi', '')),
-                "journal_name": result.get('journal_name', existing_data.get('journal_name', '')),
-                "volume": result.get('volume', existing_data.get('volume', '')),
-                "pages": result.get('pages', existing_data.get('pages', '')),
-                "publisher": "", # Default for articles
-                "issn": "" # Default for articles
-            }
-
-    # 3. Search with Exa.ai (for individual articles/snippets, using optimized query and domain filter)
-    exa_search_results, exa_search_error = search_exa(optimized_scholar_exa_query)
-    if exa_search_error:
-        errors.append(f"Exa.ai individual article search encountered an issue: {exa_search_error}")
-    for result in exa_search_results:
-        url = result.get('url')
-        if url:
-            existing_data = all_processed_results.get(url, {})
-            all_processed_results[url] = {
-                "title": result.get('title', existing_data.get('title', 'No Title')),
-                "url": url,
-                "content_snippet": result.get('content_snippet') if len(result.get('content_snippet', '')) > len(existing_data.get('content_snippet', '')) else existing_data.get('content_snippet', 'No snippet available.'),
-                "source_type": result.get('source_type', existing_data.get('source_type', 'Website')),
-                "query": query,
-                "optimized_query": optimized_scholar_exa_query,
-                "summary": existing_data.get('summary'),
-                "annotation": existing_data.get('annotation'),
-                "authors": result.get('authors', existing_data.get('authors', '')),
-                "year": result.get('year', existing_data.get('year', '')),
-                "pdf_url": result.get('pdf_url', existing_data.get('pdf_url', '')),
-                "main_pub_url": result.get('main_pub_url', existing_data.get('main_pub_url', '')),
-                "doi": result.get('doi', existing_data.get('doi', '')),
-                "journal_name": result.get('journal_name', existing_data.get('journal_name', '')),
-                "volume": result.get('volume', existing_data.get('volume', '')), 
-                "pages": result.get('pages', existing_data.get('pages', '')),
-                "publisher": "", # Default for articles
-                "issn": "" # Default for articles
-            }
-
-    # 4. Search with DOAJ Articles (using DOAJ-specific optimized query)
-    doaj_search_results, doaj_search_error = search_doaj(doaj_optimized_query)
-    if doaj_search_error:
-        errors.append(f"DOAJ article search encountered an issue: {doaj_search_error}")
-    for result in doaj_search_results:
-        url = result.get('url')
-        if url:
-            existing_data = all_processed_results.get(url, {})
-            all_processed_results[url] = {
-                "title": result.get('title', existing_data.get('title', 'No Title')),
-                "url": url,
-                "content_snippet": result.get('content_snippet') if len(result.get('content_snippet', '')) > len(existing_data.get('content_snippet', '')) else existing_data.get('content_snippet', 'No snippet available.'),
-                "source_type": result.get('source_type', existing_data.get('source_type', 'Website')),
-                "query": query,
-                "optimized_query": doaj_optimized_query, # Store DOAJ optimized query
-                "summary": existing_data.get('summary'),
-                "annotation": existing_data.get('annotation'),
-                "authors": result.get('authors', existing_data.get('authors', '')),
-                "year": result.get('year', existing_data.get('year', '')),
-                "pdf_url": result.get('pdf_url', existing_data.get('pdf_url', '')),
-                "main_pub_url": result.get('main_pub_url', existing_data.get('main_pub_url', '')),
-                "doi": result.get('doi', existing_data.get('doi', '')),
-                "journal_name": result.get('journal_name', existing_data.get('journal_name', '')),
-                "volume": result.get('volume', existing_data.get('volume', '')),
-                "pages": result.get('pages', existing_data.get('pages', '')),
-                "publisher": "", # Default for articles
-                "issn": "" # Default for articles
-            }
-    
-    # NEW: 5. Search with DOAJ Journals (using DOAJ-specific optimized query)
-    doaj_journal_search_results, doaj_journal_search_error = search_doaj_journals(doaj_optimized_query)
-    if doaj_journal_search_error:
-        errors.append(f"DOAJ journal search encountered an issue: {doaj_journal_search_error}")
-    for result in doaj_journal_search_results:
-        url = result.get('url')
-        if url:
-            existing_data = all_processed_results.get(url, {})
-            all_processed_results[url] = {
-                "title": result.get('title', existing_data.get('title', 'No Title')),
-                "url": url,
-                "content_snippet": result.get('content_snippet', existing_data.get('content_snippet', 'No snippet available.')),
-                "source_type": result.get('source_type', existing_data.get('source_type', 'Website')), # This will be "DOAJ Journal"
-                "query": query,
-                "optimized_query": doaj_optimized_query, # Store DOAJ optimized query
-                "summary": existing_data.get('summary'), # Will be None for journals
-                "annotation": existing_data.get('annotation'), # Will be None for journals
-                "authors": result.get('authors', existing_data.get('authors', '')), # Empty for journals
-                "year": result.get('year', existing_data.get('year', '')), # Empty for journals
-                "pdf_url": result.get('pdf_url', existing_data.get('pdf_url', '')), # Empty for journals
-                "main_pub_url": result.get('main_pub_url', existing_data.get('main_pub_url', '')), # Journal homepage
-                "doi": result.get('doi', existing_data.get('doi', '')), # Empty for journals
-                "journal_name": result.get('journal_name', existing_data.get('journal_name', '')), # Journal title
-                "volume": result.get('volume', existing_data.get('volume', '')), # Empty for journals
-                "pages": result.get('pages', existing_data.get('pages', '')), # Empty for journals
-                "publisher": result.get('publisher', existing_data.get('publisher', '')), # NEW
-                "issn": result.get('issn', existing_data.get('issn', '')), # NEW
-            }
-    # 5. Generate Exa.ai Research Report (separate, synthesized output, using original query)
+    provider_failed = False
+
+    # The research task uses the original query, so it can start before optimization finishes.
     # The research task is a synthesis, so the original, broader query is often more suitable here.
-    exa_research_report = generate_exa_research_report(query)
+    report_future = _submit_research_report(query) if include_report else None
+
+    # Latency-sensitive providers can start on the raw query while the optimizer is still running
+    speculative = _start_speculative_searches(query, search_providers)
+
+    # Optimize the query once for all search engines
+    query_variants, optimization_errors = optimize_queries(query)
+    for error in optimization_errors:
+        errors.append(error)
+        yield {"type": "error", "message": error}
+
+    futures = {}
+    fallbacks = {}
+    for index, provider in enumerate(search_providers):
+        speculative_future = speculative.get(provider.key)
+        if speculative_future is not None and query_optimizer.queries_equivalent(query, query_variants[provider.variant]):
+            # The rewrite adds nothing, so the speculative search already answers it
+            print(f"DEBUG: Keeping speculative {provider.key} search for '{query}'")
+            futures[speculative_future] = index
+            continue
+        futures[_submit_provider_search(provider, query_variants[provider.variant])] = index
+        if speculative_future is not None:
+            # Reissued on the optimized query; the raw-query search is kept in case the reissue fails
+            fallbacks[index] = speculative_future
+
+    # Providers finish in any order. Progress events use a provisional merge in arrival order;
+    # the authoritative merge buffers finished providers and commits each one only once every
+    # provider registered ahead of it has been merged.
+    provisional = merge.ResultMerger()
+    finished = {}
+    next_to_merge = 0
+    answered = set()
+    completed = as_completed(futures, timeout=max(deadline - time.monotonic(), 0) if deadline else None)
+    while True:
+        try:
+            future = next(completed)
+        except StopIteration:
+            break
+        except TimeoutError:
+            # Latency budget exhausted; whatever is still running is backfilled later
+            break
+        index = futures[future]
+        answered.add(index)
+        provider = search_providers[index]
+        try:
+            provider_results, provider_error = future.result()
+        except Exception as e:
+            provider_results, provider_error = [], f"Unexpected error: {e}"
+        if provider_error and index in fallbacks:
+            provider_results, provider_error = _speculative_fallback(fallbacks[index], provider_results, provider_error)
+        finished[index] = (provider_results, provider_error)
+
+        if provider_error:
+            yield {"type": "error", "message": f"{provider.label} encountered an issue: {provider_error}"}
+        touched = provisional.add_all(provider.key, provider_results, query, query_variants[provider.variant])
+        yield {
+            "type": "provider",
+            "provider": provider.key,
+            "results": [provisional.records[url] for url in touched],
+        }
 
-    return list(all_processed_results.values()), exa_research_report, errors
+        while next_to_merge in finished:
+            provider_failed |= _commit_provider_results(
+                merger, errors, search_providers[next_to_merge], finished.pop(next_to_merge),
+                query, query_variants,
+            )
+            next_to_merge += 1
+
+    # Providers that finished behind a late one are still merged in registration order
+    for index in sorted(finished):
+        provider_failed |= _commit_provider_results(
+            merger, errors, search_providers[index], finished[index], query, query_variants,
+        )
+
+    results = merger.results()
+    if near_duplicates.is_enabled():
+        results, _absorbed = near_duplicates.collapse(results)
+
+    late = None
+    late_futures = {index: future for future, index in futures.items() if index not in answered}
+    if late_futures:
+        late = _track_late_providers(query, query_variants, search_providers, late_futures)
+        for index in sorted(late_futures):
+            label = search_providers[index].label
+            message = f"{label} is taking longer than {latency_budget:g}s; its results will be added when they arrive."
+            errors.append(message)
+            yield {"type": "error", "message": message}
+
+    # Partial result sets (a critical provider failed, or a provider ran late) are not cached, so the next search retries it
+    if search_cache.is_enabled() and not provider_failed and not late:
+        search_cache.store(cache_key, [result.to_compact() for result in results])
+
+    exa_research_report = None
+    if report_future is not None:
+        try:
+            exa_research_report = report_future.result()
+        except Exception as e:
+            exa_research_report = f"🚨 Error generating Exa.ai Research Report: {e}"
+
+    yield {
+        "type": "done",
+        "results": results,
+        "report": exa_research_report,
+        "errors": errors,
+        "late": late,
+    }
+
+def _commit_provider_results(merger, errors, provider, outcome, query, query_variants):
+    """Authoritative merge of one provider's (results, error). Returns True if a critical provider failed."""
+    provider_results, provider_error = outcome
+    if provider_error:
+        errors.append(f"{provider.label} encountered an issue: {provider_error}")
+    merger.add_all(provider.key, provider_results, query, query_variants[provider.variant])
+    return bool(provider_error) and provider.critical
+
+def _refresh_search_cache(query, cache_key):
+    """Background stale-while-revalidate refresh of one cached result set."""
+    try:
+        # Nobody is waiting on a background refresh, so it is not bound by the latency budget
+        for _event in iter_unified_search(query, include_report=False, use_cache=False, latency_budget=0):
+            pass
+    finally:
+        search_cache.release_refresh(cache_key)
+
+# --- Late provider results ---
+# Providers that miss the search latency budget keep running. Each one's outcome is written to the
+# Django cache under the search id when it arrives, and the chat page polls poll_late_results() to
+# merge it into the user's stored result set.
+
+def late_result_key(search_id, provider_key):
+    return f"search_late:{search_id}:{provider_key}"
+
+def _track_late_providers(query, query_variants, search_providers, late_futures):
+    """Registers done-callbacks for providers still running at the deadline. Returns the 'late' descriptor."""
+    search_id = uuid.uuid4().hex
+    timeout = getattr(settings, 'SEARCH_LATE_RESULTS_TIMEOUT', 600)
+    late_providers = {}
+    for index, future in late_futures.items():
+        provider = search_providers[index]
+        key, label = provider.key, provider.label
+        late_providers[key] = query_variants[provider.variant]
+        future.add_done_callback(
+            lambda done, key=key, label=label: _store_late_result(late_result_key(search_id, key), label, done, timeout)
+        )
+    return {
+        "search_id": search_id,
+        "query": query,
+        "providers": late_providers, # provider key -> the query it was sent
+        "expires_at": time.time() + timeout,
+    }
+
+def _store_late_result(result_key, label, future, timeout):
+    """Done-callback that records one late provider's (results, error) in the cache."""
+    try:
+        provider_results, provider_error = future.result()
+    except Exception as e:
+        provider_results, provider_error = [], f"Unexpected error: {e}"
+    error = f"{label} encountered an issue: {provider_error}" if provider_error else None
+    cache.set(result_key, {"results": provider_results, "error": error}, timeout=timeout)
+
+def poll_late_results(late, current_processed_results):
+    """
+    Merges late provider results that have arrived into `current_processed_results` (keyed by result id)
+    in place; summaries and annotations generated meanwhile are kept by the merge. The stored late results
+    are left to expire, since searches coalesced by single-flight share them.
+    Returns (changed_results, errors, still_late) where still_late is the updated descriptor, or
+    None once every provider has reported or the descriptor has expired.
+    """
+    result_keys = {late_result_key(late["search_id"], key): key for key in late["providers"]}
+    arrived = cache.get_many(list(result_keys))
+
+    changed = {}
+    errors = []
+    remaining = dict(late["providers"])
+    merger = merge.ResultMerger(current_processed_results.values()) if arrived else None
+    for result_key, entry in arrived.items():
+        provider_key = result_keys[result_key]
+        optimized_query = remaining.pop(provider_key)
+        if entry["error"]:
+            errors.append(entry["error"])
+        for url in merger.add_all(provider_key, entry["results"], late["query"], optimized_query):
+            record = merger.records[url]
+            current_processed_results[record.id] = changed[record.id] = record
+
+    if changed and near_duplicates.is_enabled():
+        # Late records come last, so they are folded into the cards already shown rather than the reverse
+        _kept, absorbed = near_duplicates.collapse(list(current_processed_results.values()))
+        for result_id, primary_id in absorbed.items():
+            del current_processed_results[result_id]
+            changed.pop(result_id, None)
+            changed[primary_id] = current_processed_results[primary_id]
+
+    if not remaining or late["expires_at"] <= time.time():
+        return list(changed.values()), errors, None
+    return list(changed.values()), errors, dict(late, providers=remaining)
+
+# --- Deferred Exa.ai research reports ---
+# The research report is by far the slowest call of a search, so it can be generated in the
+# background while the individual results are shown. Report state lives in the Django cache
+# (shared across workers when Redis is configured), keyed by the normalized query.
+
+def research_report_key(query):
+    """Returns the cache key under which the research report for `query` is stored."""
+    digest = hashlib.sha256(normalize_query(query).encode('utf-8')).hexdigest()
+    return f"exa_report:{digest}"
+
+def start_research_report(query):
+    """
+    Starts generating the Exa.ai research report for `query` in the background, unless one is
+    already pending or finished for the same normalized query. Returns the report key to poll.
+    """
+    report_key = research_report_key(query)
+    pending_timeout = getattr(settings, 'EXA_REPORT_PENDING_TIMEOUT', 300)
+    # cache.add only succeeds for the first caller, so concurrent searches share one task
+    if cache.add(report_key, {"status": "pending"}, timeout=pending_timeout):
+        report_future = _submit_research_report(query)
+        report_future.add_done_callback(lambda future: _store_research_report(report_key, future))
+    return report_key
+
+def _store_research_report(report_key, future):
+    """
+    Done-callback that records a finished report task in the cache. A failed report is only kept for
+    EXA_REPORT_ERROR_CACHE_TIMEOUT seconds, so pages waiting for it can show the error, and the next
+    search after that starts a new task.
+    """
+    try:
+        report = future.result()
+    except Exception as e:
+        report = f"🚨 Error generating Exa.ai Research Report: {e}"
+    if is_usable_report(report):
+        timeout = getattr(settings, 'EXA_REPORT_CACHE_TIMEOUT', 3600)
+    else:
+        timeout = getattr(settings, 'EXA_REPORT_ERROR_CACHE_TIMEOUT', 60)
+    cache.set(report_key, {"status": "done", "report": report}, timeout=timeout)
+
+def get_research_report(report_key):
+    """
+    Returns the state of a background research report: {'status': 'pending'} or
+    {'status': 'done', 'report': ...}, or None if the task is unknown or expired.
+    """
+    return cache.get(report_key)
 
 
-def generate_gemini(prompt):
+def generate_gemini(prompt, generation_config=None):
     """Generates text using the Gemini API, handling potential blocks."""
     try:
-        response = gemini_model.generate_content(prompt)
+        with rate_limit.limit("gemini"):
+            response = gemini_model.generate_content(prompt, generation_config=generation_config)
         if not response.parts:
             if response.candidates and response.candidates[0].finish_reason != "STOP":
                  block_reason = response.candidates[0].finish_reason
@@ -0,0 +1,130 @@
+# research_assistant/single_flight.py
+"""
+Single-flight coalescing of identical searches that are in flight at the same time.
+
+The first caller for a key becomes the leader and does the work; concurrent callers with the same key
+wait for the leader's outcome instead of repeating it. Within a process followers wait on an event.
+Across gunicorn workers the leader holds a cache lock (cache.add) and publishes its outcome to the
+cache, where followers in other workers pick it up.
+
+Only one caller at a time ever replaces a leader, so a slow or failed leader never sets off a stampede:
+- If the leader's lock is gone without an outcome (the leader failed or its worker died), the followers
+  race for the lock with cache.add and the one that gets it leads.
+- After SINGLE_FLIGHT_WAIT_TIMEOUT seconds without an outcome, the followers race for a takeover lock the
+  same way. The winner repeats the work while the slow leader carries on, and the waiting workers take
+  whichever outcome is published first.
+- Within a process only the first caller talks to the cache; the others wait on an event and, if their
+  leader fails, join again.
+Followers still without an outcome after SINGLE_FLIGHT_LOCK_TIMEOUT seconds give up with an error.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+_POLL_INTERVAL = 0.2
+
+
+class _LocalFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.held_lock_key = None # The cache lock this process's leader took, released when it finishes
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def is_enabled():
+    return getattr(settings, 'SEARCH_SINGLE_FLIGHT', True)
+
+
+def _lock_key(key):
+    return f"single_flight:{key}:lock"
+
+
+def _takeover_key(key):
+    return f"single_flight:{key}:takeover"
+
+
+def _result_key(key):
+    return f"single_flight:{key}:result"
+
+
+def join(key):
+    """
+    Joins the flight for `key`. Returns (is_leader, value):
+    - (True, None): the caller must do the work and then call publish(key, value), also on failure.
+    - (False, value): another caller did the work and published `value`.
+    - (False, None): no outcome within SINGLE_FLIGHT_LOCK_TIMEOUT seconds; the caller should report
+      an error instead of doing the work as well.
+    """
+    started = time.monotonic()
+    takeover_at = started + getattr(settings, 'SINGLE_FLIGHT_WAIT_TIMEOUT', 20)
+    give_up_at = started + max(getattr(settings, 'SINGLE_FLIGHT_LOCK_TIMEOUT', 60), takeover_at - started)
+    while time.monotonic() < give_up_at:
+        with _flights_lock:
+            flight = _flights.get(key)
+            is_local_leader = flight is None
+            if is_local_leader:
+                flight = _flights[key] = _LocalFlight()
+
+        if not is_local_leader:
+            if not flight.done.wait(give_up_at - time.monotonic()):
+                break
+            if flight.value is not None:
+                return False, flight.value
+            continue # That leader failed; join again, so only one caller here replaces it
+
+        is_leader, value = _join_across_workers(key, flight, takeover_at, give_up_at)
+        if is_leader:
+            return True, None
+        _finish(key, flight, value)
+        return False, value
+    return False, None
+
+
+def publish(key, value):
+    """Hands the leader's outcome (None if it failed) to every follower and releases the flight."""
+    with _flights_lock:
+        flight = _flights.get(key)
+    if value is not None:
+        cache.set(_result_key(key), value, timeout=getattr(settings, 'SINGLE_FLIGHT_RESULT_TTL', 30))
+    if flight is not None:
+        _finish(key, flight, value)
+
+
+def _finish(key, flight, value):
+    if flight.held_lock_key:
+        cache.delete(flight.held_lock_key)
+    with _flights_lock:
+        if _flights.get(key) is flight:
+            del _flights[key]
+    flight.value = value
+    flight.done.set()
+
+
+def _join_across_workers(key, flight, takeover_at, give_up_at):
+    """
+    Takes the cross-worker lock or follows its holder; see the module docstring. Returns (True, None)
+    once this process leads (flight.held_lock_key is set), (False, value) with the leader's outcome,
+    or (False, None) after `give_up_at`.
+    """
+    lock_timeout = getattr(settings, 'SINGLE_FLIGHT_LOCK_TIMEOUT', 60)
+    while True:
+        # A leader that just finished has published its outcome (see publish) before releasing its lock
+        value = cache.get(_result_key(key))
+        if value is not None:
+            return False, value
+        if cache.add(_lock_key(key), True, timeout=lock_timeout):
+            flight.held_lock_key = _lock_key(key)
+            return True, None
+        if time.monotonic() >= takeover_at and cache.add(_takeover_key(key), True, timeout=lock_timeout):
+            print(f"DEBUG: Single-flight leader for {key} is slow; taking over")
+            flight.held_lock_key = _takeover_key(key)
+            return True, None
+        if time.monotonic() >= give_up_at:
+            return False, None
+        time.sleep(_POLL_INTERVAL)
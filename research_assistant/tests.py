@@ -1,3 +1,1198 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import extraction, near_duplicates, providers, query_optimizer, rate_limit, resilience, result_store, scrape_cache, search_cache, services, single_flight
+from .canonical_urls import URL_ID_LENGTH, canonicalize, url_id
+from .management.commands.benchmark_html_extractors import DEFAULT_CORPUS, _similarity
+from .merge import ResultMerger
+from .models import ProviderConfig, ScrapedPage
+from .results import DEFAULTS, NO_DOAJ_SNIPPET, NO_JOURNAL_DESCRIPTION, NO_SNIPPET, NO_TITLE, SearchResult, is_placeholder
+
+
+class NearDuplicateTests(SimpleTestCase):
+    def test_collapses_same_work_with_different_metadata(self):
+        preprint = SearchResult(
+            "https://arxiv.org/abs/2101.00001", source_type="Web Article",
+            title="Deep learning for protein structure prediction: a survey",
+            content_snippet="We review deep learning methods for predicting protein structure from sequence.",
+        )
+        published = SearchResult(
+            "https://doi.org/10.1000/xyz", source_type="Scholarly Article",
+            title="Deep Learning for Protein Structure Prediction - A Survey",
+            content_snippet="We review deep learning methods for predicting protein structure from sequence data.",
+        )
+        kept, absorbed = near_duplicates.collapse([preprint, published])
+        self.assertEqual(kept, [preprint])
+        self.assertEqual(absorbed, {published.id: preprint.id})
+        self.assertEqual(preprint.alternate_urls, ["https://doi.org/10.1000/xyz"])
+
+    def test_placeholder_snippets_do_not_make_results_similar(self):
+        journals = [
+            SearchResult("https://doaj.org/toc/1111-1111", source_type="DOAJ Journal",
+                         title="Marine Biology", content_snippet=NO_JOURNAL_DESCRIPTION),
+            SearchResult("https://doaj.org/toc/2222-2222", source_type="DOAJ Journal",
+                         title="Urban Planning", content_snippet=NO_JOURNAL_DESCRIPTION),
+        ]
+        articles = [
+            SearchResult("https://doaj.org/article/a", source_type="Scholarly Article",
+                         title="Coral reefs", content_snippet=NO_DOAJ_SNIPPET),
+            SearchResult("https://doaj.org/article/b", source_type="Scholarly Article",
+                         title="Housing markets", content_snippet=NO_DOAJ_SNIPPET),
+        ]
+        for results in (journals, articles):
+            kept, absorbed = near_duplicates.collapse(results)
+            self.assertEqual(kept, results)
+            self.assertEqual(absorbed, {})
+
+    def test_journals_are_not_grouped_with_articles(self):
+        title = "Journal of Sustainable Agriculture and Food Systems Research"
+        journal = SearchResult("https://doaj.org/toc/3333-3333", source_type="DOAJ Journal", title=title)
+        article = SearchResult("https://example.org/paper", source_type="Scholarly Article", title=title)
+        kept, absorbed = near_duplicates.collapse([journal, article])
+        self.assertEqual(kept, [journal, article])
+        self.assertEqual(absorbed, {})
+
+    def test_threshold(self):
+        first = SearchResult("https://a.example/1", title="Effects of soil tillage on carbon storage in wheat fields")
+        second = SearchResult("https://b.example/2", title="Effects of soil tillage on nitrogen leaching in maize fields")
+        self.assertEqual(len(near_duplicates.collapse([first, second], threshold=1.0)[0]), 2)
+        self.assertEqual(len(near_duplicates.collapse([first, second], threshold=0.0)[0]), 1)
+
+    def test_fold_replaces_placeholders_only(self):
+        primary = SearchResult("https://a.example/paper", title="A paper", content_snippet=NO_DOAJ_SNIPPET)
+        duplicate = SearchResult("https://b.example/paper", title="A paper (preprint)", content_snippet="The real abstract.")
+        near_duplicates._fold(primary, duplicate)
+        self.assertEqual(primary.title, "A paper")
+        self.assertEqual(primary.content_snippet, "The real abstract.")
+
+    def test_is_placeholder(self):
+        self.assertTrue(is_placeholder(NO_JOURNAL_DESCRIPTION))
+        self.assertTrue(is_placeholder("  "))
+        self.assertFalse(is_placeholder("Marine Biology"))
+        self.assertFalse(is_placeholder(None))
+
+
+class HtmlExtractionTests(SimpleTestCase):
+    PARAGRAPH = "<p>" + "The survey results were analysed region by region over three years. " * 5 + "</p>"
+
+    def test_compound_classes_are_not_boilerplate(self):
+        for html in (
+            f'<html><body><article class="post type-post tag-social-media">{self.PARAGRAPH}</article></body></html>',
+            f'<html><body><div class="content has-sidebar">{self.PARAGRAPH}</div></body></html>',
+            f'<html><body><div class="entry-content share-enabled">{self.PARAGRAPH}</div></body></html>',
+            f'<html><body><div class="story tag-related">{self.PARAGRAPH}</div></body></html>',
+        ):
+            text, error = extraction.extract_html_text_lxml(html)
+            self.assertIsNone(error, html)
+            self.assertIn("analysed region by region", text)
+
+    def test_boilerplate_blocks_are_dropped(self):
+        html = (
+            '<html><body><div class="sidebar"><p>Most read: everything else on this site</p></div>'
+            f'<article class="post">{self.PARAGRAPH}<div class="share">Share this on every network</div></article>'
+            '<div id="cookie-banner">We use cookies to improve your experience</div></body></html>'
+        )
+        text, error = extraction.extract_html_text_lxml(html)
+        self.assertIsNone(error)
+        for boilerplate in ("Most read", "Share this", "We use cookies"):
+            self.assertNotIn(boilerplate, text)
+
+    def test_engines_agree_on_saved_corpus(self):
+        # lxml must keep as much of each page's reference article text as bs4 does, and never fail where bs4 succeeds
+        pages = sorted(DEFAULT_CORPUS.glob("*.html"))
+        self.assertTrue(pages)
+        for page in pages:
+            content = page.read_bytes()
+            bs4_text, bs4_error = extraction.extract_html_text(content)
+            lxml_text, lxml_error = extraction.extract_html_text_lxml(content)
+            self.assertIsNone(lxml_error, page.name)
+            reference = page.with_suffix(".txt").read_text(encoding="utf-8")
+            bs4_kept = _similarity(reference, bs4_text or "")
+            self.assertGreaterEqual(_similarity(reference, lxml_text), bs4_kept - 0.05, page.name)
+
+
+class ExtractionFailureTests(TestCase):
+    def tearDown(self):
+        if extraction._pool is not None:
+            extraction._discard_pool(extraction._pool)
+
+    @override_settings(EXTRACTION_MODE="process", EXTRACTION_TIMEOUT=0.5)
+    def test_worker_alarm_stops_slow_job_and_keeps_pool(self):
+        pool = extraction.get_pool()
+        with self.assertRaises(extraction.ExtractionTimeout):
+            extraction._run_in_pool(time.sleep, 10)
+        self.assertIs(extraction._pool, pool)
+        self.assertIsNone(extraction._run_in_pool(time.sleep, 0))
+
+    @override_settings(EXTRACTION_MODE="process")
+    def test_pool_failures_are_transient(self):
+        for exception in (FutureTimeoutError(), BrokenProcessPool("worker died"), extraction.ExtractionTimeout()):
+            with mock.patch.object(extraction, "_run_in_pool", side_effect=exception):
+                text, error, transient = extraction.extract(b"<html></html>", "text/html")
+            self.assertIsNone(text)
+            self.assertTrue(error)
+            self.assertTrue(transient)
+
+    @override_settings(EXTRACTION_MODE="inline")
+    def test_pages_without_text_are_permanent(self):
+        self.assertEqual(extraction.extract(b"<html><body>Hi</body></html>", "text/html")[2], False)
+
+    @override_settings(SCRAPE_CACHE_ENABLED=True, SEARCH_PROVIDER_BACKEND="sdk")
+    def test_transient_extraction_failure_is_not_negative_cached(self):
+        response = mock.MagicMock(status_code=200, headers={"Content-Type": "application/pdf"})
+        response.__enter__.return_value = response
+        response.iter_content.return_value = [b"%PDF-1.4"]
+        timeout_result = (None, "Text extraction took longer than 30 seconds and was stopped.", True)
+        url = "https://example.org/paper.pdf"
+        with mock.patch.object(services.requests, "get", return_value=response), \
+                mock.patch.object(services.extraction, "extract", return_value=timeout_result):
+            text, error = services.scrape_article_content(url)
+        self.assertIsNone(text)
+        self.assertIn("took longer", error)
+        self.assertIsNone(scrape_cache.lookup(url))
+
+        with mock.patch.object(services.requests, "get", return_value=response), \
+                mock.patch.object(services.extraction, "extract", return_value=(None, "No text in this PDF.", False)):
+            services.scrape_article_content(url)
+        self.assertEqual(scrape_cache.lookup(url).error, "No text in this PDF.")
+
+
+class ScrapeCandidateTests(SimpleTestCase):
+    def make_result(self):
+        return SearchResult(
+            url="https://example.com/article", pdf_url="https://example.com/article.pdf",
+            main_pub_url="https://publisher.example.org/article",
+            alternate_urls=["https://doi.org/10.1000/xyz", "https://mirror.example.net/article"],
+        )
+
+    def test_only_the_three_preferred_urls_are_candidates_by_default(self):
+        urls = [candidate["url"] for candidate in services.scrape_candidates(self.make_result())]
+        self.assertEqual(urls, [
+            "https://example.com/article.pdf", "https://publisher.example.org/article", "https://example.com/article",
+        ])
+
+    @override_settings(SCRAPE_ALTERNATE_URLS=True, SCRAPE_MAX_CANDIDATES=4)
+    def test_alternate_urls_are_opt_in_and_capped(self):
+        urls = [candidate["url"] for candidate in services.scrape_candidates(self.make_result())]
+        self.assertEqual(urls[3:], ["https://doi.org/10.1000/xyz"])
+
+    def test_race_tasks_close_stale_db_connections(self):
+        cleanup_threads = []
+        candidates = [{"url": "https://example.com/a.pdf"}]
+        with mock.patch.object(services, "close_old_connections", side_effect=lambda: cleanup_threads.append(threading.current_thread())), \
+                mock.patch.object(services, "scrape_article_content", return_value=("x" * services.SCRAPE_MIN_TEXT_LENGTH, None)):
+            text, _failures = services._race_scrape_candidates(candidates)
+        self.assertTrue(text)
+        # Before and after the scrape, on a scrape executor thread
+        self.assertEqual(len(cleanup_threads), 2)
+        self.assertNotIn(threading.current_thread(), cleanup_threads)
+
+
+@override_settings(EXA_REPORT_CACHE_TIMEOUT=3600, EXA_REPORT_ERROR_CACHE_TIMEOUT=0)
+class ResearchReportCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _start_twice(self, report):
+        with mock.patch.object(services, "_submit_research_report", return_value=services._resolved_future(report)) as submit:
+            for _ in range(2):
+                report_key = services.start_research_report("soil carbon sequestration")
+        return submit.call_count, services.get_research_report(report_key)
+
+    def test_finished_report_is_reused(self):
+        calls, state = self._start_twice("A long report on soil carbon.")
+        self.assertEqual(calls, 1)
+        self.assertEqual(state, {"status": "done", "report": "A long report on soil carbon."})
+
+    def test_error_reports_are_not_kept(self):
+        for report in (
+            "🚨 Error generating Exa.ai Research Report: timed out",
+            "🚨 Error generating Exa.ai Research Report: exa_report is unavailable (circuit breaker open)",
+            "No report content generated.",
+        ):
+            cache.clear()
+            calls, state = self._start_twice(report)
+            self.assertEqual(calls, 2, report)
+            self.assertIsNone(state)
+
+
+class QueryOptimizerTests(SimpleTestCase):
+    def test_all_caps_acronyms_are_not_stopwords(self):
+        self.assertEqual(query_optimizer.optimize_query_locally("IT governance in banks"), "IT governance banks")
+        self.assertEqual(query_optimizer.optimize_query_locally("trade policy of the US"), "trade policy US")
+        self.assertEqual(query_optimizer.optimize_query_locally("is it effective"), "effective")
+
+    def test_abbreviations_match_any_case(self):
+        self.assertEqual(query_optimizer.optimize_query_locally("ai in healthcare"), "Artificial Intelligence healthcare")
+        self.assertEqual(
+            query_optimizer.optimize_query_locally("i want AI-Enhanced EHR systems"),
+            "Artificial Intelligence Enhanced Electronic Health Record systems",
+        )
+        self.assertEqual(query_optimizer.optimize_query_locally("iot security"), "Internet of Things security")
+        self.assertEqual(query_optimizer.expand_abbreviation("Llms"), "Large Language Models")
+        self.assertIsNone(query_optimizer.expand_abbreviation("governance"))
+
+    def test_looks_weak(self):
+        user_query = "ai in healthcare"
+        self.assertFalse(query_optimizer.looks_weak(query_optimizer.optimize_query_locally(user_query), user_query))
+        user_query = "IT governance in banks"
+        self.assertTrue(query_optimizer.looks_weak(query_optimizer.optimize_query_locally(user_query), user_query))
+        self.assertTrue(query_optimizer.looks_weak("healthcare", "healthcare"))
+
+
+@override_settings(QUERY_OPTIMIZER_BATCHED=True, QUERY_OPTIMIZER_MODE="llm")
+class BatchedQueryOptimizerTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        services.optimizer_memo._local.clear()
+        self.addCleanup(services.optimizer_memo._local.clear)
+
+    def optimize(self, user_query, model_output, error=None):
+        with mock.patch.object(services, "generate_gemini", return_value=(model_output, error)) as generate:
+            variants, errors = services.optimize_queries(user_query)
+        return variants, errors, generate.call_count
+
+    def test_one_call_rewrites_every_family(self):
+        variants, errors, calls = self.optimize(
+            "i want papers on ai in healthcare",
+            '{"scholar": "Artificial Intelligence \\"healthcare\\", diagnosis", "doaj": "AI,  healthcare"}',
+        )
+        self.assertEqual(variants, {"scholar": "Artificial Intelligence healthcare diagnosis", "doaj": "AI healthcare"})
+        self.assertEqual((errors, calls), ([], 1))
+
+    def test_json_wrapped_in_a_code_fence_is_parsed(self):
+        variants, errors, _calls = self.optimize(
+            "ai in healthcare", 'Here you go:\n```json\n{"scholar": "AI healthcare", "doaj": "AI healthcare"}\n```',
+        )
+        self.assertEqual(variants, {"scholar": "AI healthcare", "doaj": "AI healthcare"})
+        self.assertEqual(errors, [])
+
+    def test_malformed_response_falls_back_to_the_raw_query(self):
+        variants, errors, _calls = self.optimize("ai in healthcare", '{"scholar": "AI healthcare", "doaj": ')
+        self.assertEqual(variants, {"scholar": "ai in healthcare", "doaj": "ai in healthcare"})
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(all("Failed to parse" in error for error in errors))
+
+    def test_missing_or_unusable_fields_fall_back_one_by_one(self):
+        for model_output in ('{"scholar": "AI healthcare"}', '{"scholar": "AI healthcare", "doaj": ["AI"]}',
+                             '{"scholar": "AI healthcare", "doaj": " \\"\\" "}'):
+            services.optimizer_memo._local.clear()
+            cache.clear()
+            variants, errors, _calls = self.optimize("ai in healthcare", model_output)
+            self.assertEqual(variants, {"scholar": "AI healthcare", "doaj": "ai in healthcare"}, model_output)
+            self.assertEqual(len(errors), 1)
+            self.assertIn("'doaj'", errors[0])
+
+    def test_gemini_error_falls_back_for_every_family(self):
+        variants, errors, _calls = self.optimize("ai in healthcare", None, error="quota exceeded")
+        self.assertEqual(variants, {"scholar": "ai in healthcare", "doaj": "ai in healthcare"})
+        self.assertTrue(all("quota exceeded" in error for error in errors))
+
+    def test_rewrites_are_memoized_but_fallbacks_are_not(self):
+        self.optimize("ai in healthcare", '{"scholar": "AI healthcare"}')
+        variants, errors, calls = self.optimize("ai in healthcare", '{"doaj": "AI healthcare"}')
+        self.assertEqual(variants, {"scholar": "AI healthcare", "doaj": "AI healthcare"})
+        self.assertEqual((errors, calls), ([], 1))
+        self.assertEqual(self.optimize("AI in  healthcare", "not json")[2], 0)
+
+    @override_settings(QUERY_OPTIMIZER_MODE="local")
+    def test_local_mode_never_calls_gemini(self):
+        variants, errors, calls = self.optimize("IT governance in banks", "not json")
+        self.assertEqual(variants, {"scholar": "IT governance banks", "doaj": "IT governance banks"})
+        self.assertEqual((errors, calls), ([], 0))
+
+    @override_settings(QUERY_OPTIMIZER_MODE="hybrid")
+    def test_hybrid_mode_only_asks_gemini_about_weak_rewrites(self):
+        variants, _errors, calls = self.optimize("ai in healthcare", "not json")
+        self.assertEqual(variants["scholar"], "Artificial Intelligence healthcare")
+        self.assertEqual(calls, 0)
+        variants, errors, calls = self.optimize(
+            "IT governance in banks", '{"scholar": "IT governance banking sector", "doaj": "IT governance banks"}',
+        )
+        self.assertEqual(variants["scholar"], "IT governance banking sector")
+        self.assertEqual((errors, calls), ([], 1))
+
+
+@override_settings(HEDGED_PROVIDERS=["test_hedge"], HEDGE_MAX_RATIO=1.0, ADAPTIVE_TIMEOUT_MIN_SAMPLES=20)
+class HedgedCallTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        tracker = resilience.LatencyTracker(200)
+        for _ in range(20):
+            tracker.add(0.05)
+        resilience._attempt_latency["test_hedge"] = tracker
+
+    def tearDown(self):
+        resilience._attempt_latency.pop("test_hedge", None)
+
+    def test_fast_first_attempt_is_not_hedged(self):
+        result = resilience.hedged_call("test_hedge", lambda: "ok")
+        self.assertEqual(result, "ok")
+        self.assertEqual(resilience.get_hedge_stats("test_hedge")["hedges"], 0)
+
+    def test_hedge_answers_first_while_first_attempt_is_slow(self):
+        attempts = []
+        release = threading.Event()
+
+        def fetch():
+            attempts.append(None)
+            if len(attempts) == 1:
+                release.wait(5)
+                return "from first attempt"
+            return "from hedge"
+
+        started = time.monotonic()
+        try:
+            result = resilience.hedged_call("test_hedge", fetch)
+        finally:
+            release.set()
+        self.assertEqual(result, "from hedge")
+        self.assertLess(time.monotonic() - started, 2)
+        stats = resilience.get_hedge_stats("test_hedge")
+        self.assertEqual((stats["calls"], stats["hedges"], stats["hedge_wins"]), (1, 1, 1))
+
+    def test_first_attempt_wins_when_hedge_fails(self):
+        attempts = []
+
+        def fetch():
+            attempts.append(None)
+            if len(attempts) == 1:
+                time.sleep(0.3)
+                return "from first attempt"
+            return None
+
+        result = resilience.hedged_call("test_hedge", fetch, is_failure=lambda value: value is None)
+        self.assertEqual(result, "from first attempt")
+        stats = resilience.get_hedge_stats("test_hedge")
+        self.assertEqual((stats["hedges"], stats["hedge_wins"]), (1, 0))
+
+    def test_first_attempt_error_is_raised_without_hedge(self):
+        def fail():
+            raise ValueError("provider down")
+
+        with self.assertRaises(ValueError):
+            resilience.hedged_call("test_hedge", fail)
+
+
+class CanonicalUrlTests(SimpleTestCase):
+    def test_trivial_variants_share_one_form(self):
+        self.assertEqual(
+            canonicalize("http://WWW.Example.com:80//a/b/?b=2&a=1#section"),
+            "https://example.com/a/b?a=1&b=2",
+        )
+
+    def test_only_known_tracking_params_are_removed(self):
+        self.assertEqual(
+            canonicalize("https://example.com/paper?id=7&utm_source=x&UTM_Campaign=y&gclid=1&fbclid=2&mc_cid=3&_hsenc=4"),
+            "https://example.com/paper?id=7",
+        )
+        for key in ("source", "sid", "ref", "via", "referrer", "campaign", "sessionid", "jsessionid"):
+            self.assertEqual(canonicalize(f"https://example.com/view?{key}=abc"), f"https://example.com/view?{key}=abc")
+
+    def test_domain_rules(self):
+        self.assertEqual(canonicalize("https://arxiv.org/pdf/2101.00001v2.pdf"), "https://arxiv.org/abs/2101.00001")
+        self.assertEqual(canonicalize("https://dx.doi.org/10.1000/ABC"), "https://doi.org/10.1000/abc")
+        self.assertEqual(
+            canonicalize("https://onlinelibrary.wiley.com/doi/pdf/10.1002/x.1"),
+            "https://onlinelibrary.wiley.com/doi/10.1002/x.1",
+        )
+
+    def test_url_id(self):
+        self.assertEqual(url_id("https://arxiv.org/abs/2101.00001"), url_id("http://www.arxiv.org/pdf/2101.00001v3.pdf"))
+        self.assertNotEqual(url_id("https://example.com/view?sid=1"), url_id("https://example.com/view?sid=2"))
+        self.assertEqual(len(url_id("https://example.com")), URL_ID_LENGTH)
+
+
+class ResultMergerTests(SimpleTestCase):
+    def merge(self, *batches):
+        merger = ResultMerger()
+        for provider_key, results in batches:
+            merger.add_all(provider_key, results, "query", "optimized query")
+        return merger.results()
+
+    def test_merges_on_doi(self):
+        results = self.merge(
+            ("scholar", [{"url": "https://publisher.example/article/1", "title": "Paper", "doi": "10.1000/ABC.1"}]),
+            ("doaj", [{"url": "https://doaj.org/article/xyz", "title": "Paper", "doi": "https://doi.org/10.1000/abc.1"}]),
+        )
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].url, "https://publisher.example/article/1")
+        self.assertEqual(results[0].alternate_urls, ["https://doaj.org/article/xyz"])
+
+    def test_merges_on_canonical_url(self):
+        results = self.merge(
+            ("tavily", [{"url": "https://arxiv.org/abs/2101.00001", "title": "A", "content": "Tavily snippet"}]),
+            ("exa", [{"url": "http://www.arxiv.org/pdf/2101.00001v2.pdf", "title": "A", "authors": "Doe, J."}]),
+        )
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].authors, "Doe, J.")
+        self.assertEqual(results[0].content_snippet, "Tavily snippet")
+
+    def test_merges_on_title_fingerprint(self):
+        results = self.merge(
+            ("scholar", [{"url": "https://a.example/x", "title": "Soil Carbon Under No-Till Farming"}]),
+            ("exa", [{"url": "https://b.example/y", "title": "soil carbon under no till farming!"}]),
+        )
+        self.assertEqual(len(results), 1)
+
+    def test_short_and_placeholder_titles_do_not_merge(self):
+        results = self.merge(
+            ("scholar", [{"url": "https://a.example/x", "title": "Editorial"}, {"url": "https://b.example/y", "title": NO_TITLE}]),
+            ("exa", [{"url": "https://c.example/z", "title": "Editorial"}, {"url": "https://d.example/w", "title": NO_TITLE}]),
+        )
+        self.assertEqual(len(results), 4)
+
+    def test_field_precedence(self):
+        results = self.merge(
+            ("scholar", [{"url": "https://a.example/x", "title": "T", "content_snippet": "A longer snippet from scholar", "year": "2020"}]),
+            ("doaj", [{"url": "https://a.example/x", "content_snippet": "Short", "year": "", "publisher": "P"}]),
+        )
+        self.assertEqual(results[0].content_snippet, "A longer snippet from scholar")
+        self.assertEqual(results[0].year, "2020")
+        self.assertEqual(results[0].publisher, "")
+
+    def test_existing_records_are_indexed(self):
+        merger = ResultMerger(self.merge(("scholar", [{"url": "https://a.example/x", "title": "T", "doi": "10.1000/q"}])))
+        self.assertEqual(merger.add("doaj", {"url": "https://doaj.org/article/q", "doi": "10.1000/Q"}, "query", ""), "https://a.example/x")
+
+
+class SearchResultTests(SimpleTestCase):
+    def make_result(self):
+        return SearchResult(
+            "https://arxiv.org/abs/2101.00001", title="A paper", authors="Doe, J.", year="2021",
+            doi="10.1000/abc", alternate_urls=["https://doi.org/10.1000/abc"], summary="Summary",
+        )
+
+    def test_dict_round_trip(self):
+        result = self.make_result()
+        self.assertEqual(SearchResult.from_dict(result.to_dict()), result)
+        self.assertEqual(set(result.to_dict()), set(DEFAULTS))
+
+    def test_compact_round_trip(self):
+        result = self.make_result()
+        compact = result.to_compact()
+        self.assertNotIn("content_snippet", compact)
+        self.assertNotIn("pdf_url", compact)
+        self.assertEqual(compact["id"], url_id("https://arxiv.org/abs/2101.00001"))
+        self.assertEqual(SearchResult.from_dict(compact), result)
+
+    def test_legacy_dict_with_unknown_keys(self):
+        result = SearchResult.from_dict({"url": "https://example.com/a", "title": "T", "legacy_field": 1})
+        self.assertEqual(result.title, "T")
+        self.assertEqual(result.content_snippet, NO_SNIPPET)
+        self.assertEqual(result.id, url_id("https://example.com/a"))
+
+    def test_mutable_defaults_are_not_shared(self):
+        first, second = SearchResult("https://example.com/a"), SearchResult("https://example.com/b")
+        first.alternate_urls.append("https://example.com/c")
+        self.assertEqual(second.alternate_urls, [])
+        self.assertEqual(DEFAULTS["alternate_urls"], [])
+
+    def test_get(self):
+        result = self.make_result()
+        self.assertEqual(result.get("title"), "A paper")
+        self.assertEqual(result.get("annotation", "none yet"), "none yet")
+        self.assertEqual(result.get("unknown", "fallback"), "fallback")
+
+
+class TokenBucketTests(SimpleTestCase):
+    def make_limiter(self, clock, **config):
+        with mock.patch.object(rate_limit.time, "monotonic", return_value=clock[0]):
+            return rate_limit.LocalLimiter("test", dict({"rate": 2.0, "burst": 3, "concurrency": 2}, **config))
+
+    def take(self, limiter, clock):
+        with mock.patch.object(rate_limit.time, "monotonic", return_value=clock[0]):
+            return limiter.try_take_token()
+
+    def test_burst_then_refill_at_rate(self):
+        clock = [100.0]
+        limiter = self.make_limiter(clock)
+        self.assertEqual([self.take(limiter, clock) for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(self.take(limiter, clock), 0.5) # One token takes 1 / rate seconds
+        clock[0] += 0.25
+        self.assertAlmostEqual(self.take(limiter, clock), 0.25)
+        clock[0] += 0.25
+        self.assertEqual(self.take(limiter, clock), 0.0)
+
+    def test_refill_is_capped_at_burst(self):
+        clock = [100.0]
+        limiter = self.make_limiter(clock)
+        clock[0] += 3600
+        self.assertEqual([self.take(limiter, clock) for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertGreater(self.take(limiter, clock), 0)
+
+    def test_concurrency_slots(self):
+        limiter = self.make_limiter([0.0], concurrency=1)
+        slot = limiter.try_acquire_slot()
+        self.assertIsNotNone(slot)
+        self.assertIsNone(limiter.try_acquire_slot())
+        limiter.release_slot(slot)
+        self.assertIsNotNone(limiter.try_acquire_slot())
+
+    @override_settings(PROVIDER_RATE_LIMITS={"exa_research": {"concurrency": 8}})
+    def test_settings_override_the_default_limits(self):
+        config = rate_limit.get_limit_config("exa_research")
+        self.assertEqual(config["concurrency"], 8)
+        self.assertEqual(config["lease"], rate_limit.DEFAULT_RATE_LIMITS["exa_research"]["lease"])
+
+    @override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMIT_MAX_WAIT=0.2)
+    def test_limit_fails_fast_when_the_wait_exceeds_max_wait(self):
+        limiter = rate_limit.LocalLimiter("test", {"rate": 1.0, "burst": 1, "concurrency": 1})
+        with mock.patch.object(rate_limit, "get_limiter", return_value=limiter):
+            with rate_limit.limit("test"):
+                pass
+            with self.assertRaises(rate_limit.RateLimitExceeded):
+                with rate_limit.limit("test"):
+                    pass
+
+
+@override_settings(
+    RATE_LIMIT_ENABLED=True, SEARCH_EXECUTION_MODE="sequential", SEARCH_PROVIDER_BACKEND="sdk",
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD=3, CIRCUIT_BREAKER_COOLDOWN=30, CIRCUIT_BREAKER_WINDOW=60,
+)
+class LimiterBreakerAccountingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        resilience._breakers.pop("test_limited", None)
+        self.addCleanup(resilience._breakers.pop, "test_limited", None)
+
+    def search(self, query, timeout=None):
+        try:
+            with rate_limit.limit("test_limited"):
+                return [{"url": "https://example.com/" + query}], None
+        except Exception as e:
+            return [], str(e)
+
+    def run_searches(self, limiter, count, provider_timeout=10.0):
+        provider = mock.Mock(key="test_limited", timeout=provider_timeout, num_results=5, search=self.search)
+        with mock.patch.object(rate_limit, "get_limiter", return_value=limiter):
+            return [services._submit_provider_search(provider, f"q{n}").result() for n in range(count)]
+
+    @override_settings(RATE_LIMIT_MAX_WAIT=2.0)
+    def test_limiter_queueing_is_not_counted_as_latency(self):
+        limiter = rate_limit.LocalLimiter("test_limited", {"rate": 5.0, "burst": 1, "concurrency": 1})
+        outcomes = self.run_searches(limiter, 3, provider_timeout=0.1)
+        self.assertTrue(all(error is None for _results, error in outcomes))
+        breaker = resilience.get_breaker("test_limited")
+        self.assertLess(max(breaker.latency._samples), 0.1)
+        self.assertFalse(cache.get(breaker._failures_key))
+
+    @override_settings(RATE_LIMIT_MAX_WAIT=0.1)
+    def test_rate_limit_rejections_do_not_open_the_breaker(self):
+        limiter = rate_limit.LocalLimiter("test_limited", {"rate": 0.01, "burst": 1, "concurrency": 1})
+        outcomes = self.run_searches(limiter, 5)
+        self.assertIsNone(outcomes[0][1])
+        self.assertTrue(all("rate limit" in error for _results, error in outcomes[1:]))
+        self.assertEqual(resilience.get_breaker("test_limited").state(), resilience.CLOSED)
+
+    @override_settings(RATE_LIMIT_MAX_WAIT=0.1)
+    def test_async_limiter_rejection_is_measured(self):
+        limiter = rate_limit.LocalLimiter("test_limited", {"rate": 0.01, "burst": 1, "concurrency": 1})
+        limiter.try_take_token()
+        waits = rate_limit.Waits()
+
+        async def call():
+            async with rate_limit.limit_async("test_limited"):
+                pass
+
+        with mock.patch.object(rate_limit, "get_limiter", return_value=limiter):
+            with self.assertRaises(rate_limit.RateLimitExceeded):
+                asyncio.run(rate_limit.ameasure(waits, call()))
+        self.assertTrue(waits.rejected)
+
+
+@override_settings(CIRCUIT_BREAKER_FAILURE_THRESHOLD=3, CIRCUIT_BREAKER_COOLDOWN=30, CIRCUIT_BREAKER_WINDOW=60)
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.0
+        patcher = mock.patch.object(resilience.time, "time", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = resilience.CircuitBreaker("test_breaker")
+
+    def trip(self):
+        for _ in range(3):
+            self.breaker.record(0.1, failed=True)
+
+    def test_opens_after_threshold_failures(self):
+        self.breaker.record(0.1, failed=True)
+        self.breaker.record(0.1, failed=True)
+        self.assertEqual(self.breaker.state(), resilience.CLOSED)
+        self.breaker.record(0.1, failed=True)
+        self.assertEqual(self.breaker.state(), resilience.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_failure_count(self):
+        self.breaker.record(0.1, failed=True)
+        self.breaker.record(0.1, failed=True)
+        self.breaker.record(0.1, failed=False)
+        self.breaker.record(0.1, failed=True)
+        self.assertEqual(self.breaker.state(), resilience.CLOSED)
+
+    def test_half_open_lets_one_probe_through_and_closes_on_success(self):
+        self.trip()
+        self.now += 31
+        self.assertEqual(self.breaker.state(), resilience.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record(0.1, failed=False)
+        self.assertEqual(self.breaker.state(), resilience.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        self.trip()
+        self.now += 31
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(0.1, failed=True)
+        self.assertEqual(self.breaker.state(), resilience.OPEN)
+        self.now += 31
+        self.assertTrue(self.breaker.allow())
+
+    def test_slow_call_counts_as_failure(self):
+        for _ in range(3):
+            self.breaker.record(5.0, failed=False, timeout=2.0)
+        self.assertEqual(self.breaker.state(), resilience.OPEN)
+
+
+@override_settings(SINGLE_FLIGHT_WAIT_TIMEOUT=0.3, SINGLE_FLIGHT_LOCK_TIMEOUT=3, SINGLE_FLIGHT_RESULT_TTL=30)
+class SingleFlightTests(SimpleTestCase):
+    key = "test-flight"
+
+    def setUp(self):
+        cache.clear()
+        single_flight._flights.clear()
+
+    def run_followers(self, count, join):
+        """Runs `count` concurrent join() callers; each leader publishes its index. Returns the outcomes."""
+        outcomes = [None] * count
+
+        def follower(index):
+            is_leader, value = join()
+            if is_leader:
+                single_flight.publish(self.key, {"leader": index})
+            outcomes[index] = (is_leader, value)
+
+        threads = [threading.Thread(target=follower, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_one_worker_takes_over_from_slow_leader(self):
+        # Another worker leads and never answers; callers in five "workers" (separate local flights) time out
+        cache.add(single_flight._lock_key(self.key), True)
+        started = time.monotonic()
+        outcomes = self.run_followers(5, lambda: single_flight._join_across_workers(
+            self.key, single_flight._LocalFlight(), started + 0.3, started + 3,
+        ))
+        leaders = [index for index, (is_leader, _value) in enumerate(outcomes) if is_leader]
+        self.assertEqual(len(leaders), 1)
+        for is_leader, value in outcomes:
+            if not is_leader:
+                self.assertEqual(value, {"leader": leaders[0]})
+
+    def test_failed_leader_is_replaced_by_one_local_follower(self):
+        is_leader, _value = single_flight.join(self.key)
+        self.assertTrue(is_leader)
+        threading.Timer(0.1, single_flight.publish, args=(self.key, None)).start()
+        outcomes = self.run_followers(4, lambda: single_flight.join(self.key))
+        self.assertEqual(sum(is_leader for is_leader, _value in outcomes), 1)
+
+    @override_settings(SINGLE_FLIGHT_LOCK_TIMEOUT=0.6)
+    def test_followers_give_up_without_searching(self):
+        cache.add(single_flight._lock_key(self.key), True)
+        cache.add(single_flight._takeover_key(self.key), True)
+        self.assertEqual(single_flight.join(self.key), (False, None))
+
+
+class SlowLimiter:
+    """Stands in for a Redis limiter: every step blocks its thread for `delay` seconds."""
+
+    name = "slow"
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.step_threads = set()
+        self.released = []
+
+    def try_take_token(self):
+        self.step_threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return 0.0
+
+    def try_acquire_slot(self):
+        time.sleep(self.delay)
+        return "slot"
+
+    def release_slot(self, slot):
+        self.released.append(slot)
+
+
+class AsyncProviderTests(SimpleTestCase):
+    def test_provider_without_search_cannot_be_instantiated(self):
+        from . import async_providers
+
+        class IncompleteProvider(async_providers.AsyncSearchProvider):
+            name = "incomplete"
+
+        with self.assertRaises(TypeError):
+            IncompleteProvider()
+        self.assertEqual(set(async_providers.PROVIDERS), {"tavily", "scholar", "exa", "doaj", "doaj_journals"})
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMIT_MAX_WAIT=5.0)
+class EventLoopOffloadTests(SimpleTestCase):
+    def test_limiter_steps_run_off_the_event_loop(self):
+        limiter = SlowLimiter(0.1)
+        ticks = []
+
+        async def ticker():
+            for _ in range(10):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def limited():
+            async with rate_limit.limit_async("slow"):
+                pass
+
+        async def main():
+            await asyncio.gather(limited(), ticker())
+            return threading.get_ident()
+
+        with mock.patch.object(rate_limit, "get_limiter", return_value=limiter):
+            loop_thread = asyncio.run(main())
+        self.assertNotIn(loop_thread, limiter.step_threads)
+        self.assertLess(ticks[-1] - ticks[0], 0.15) # The loop kept ticking while the limiter steps slept
+        self.assertEqual(limiter.released, ["slot"])
+
+    def test_slot_taken_after_cancellation_is_released(self):
+        limiter = SlowLimiter(0.1)
+
+        async def main():
+            task = asyncio.ensure_future(rate_limit.limit_async("slow").__aenter__())
+            await asyncio.sleep(0.15) # Cancel while the slot step is running in its thread
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.2)
+
+        with mock.patch.object(rate_limit, "get_limiter", return_value=limiter):
+            asyncio.run(main())
+        self.assertEqual(limiter.released, ["slot"])
+
+    @override_settings(HEDGED_PROVIDERS=["test_hedge"])
+    def test_hedge_counters_run_off_the_event_loop(self):
+        counter_threads = []
+
+        async def fetch():
+            return "ok"
+
+        async def main():
+            return await resilience.hedged_acall("test_hedge", fetch), threading.get_ident()
+
+        with mock.patch.object(resilience, "_count", side_effect=lambda *args: counter_threads.append(threading.get_ident())):
+            result, loop_thread = asyncio.run(main())
+        self.assertEqual(result, "ok")
+        self.assertTrue(counter_threads)
+        self.assertNotIn(loop_thread, counter_threads)
+
+    def test_breaker_records_of_async_calls_run_off_the_event_loop(self):
+        breaker = mock.Mock()
+        record_threads = []
+        breaker.record.side_effect = lambda *args: record_threads.append(threading.get_ident())
+
+        async def provider_call():
+            return [], None
+
+        async def main():
+            future = asyncio.run_coroutine_threadsafe(provider_call(), side_loop)
+            resilience.track(breaker, time.monotonic(), future, lambda result: bool(result[1]))
+            await asyncio.wrap_future(future)
+            await asyncio.sleep(0.1)
+            return threading.get_ident()
+
+        side_loop = asyncio.new_event_loop()
+        side_thread = threading.Thread(target=side_loop.run_forever, daemon=True)
+        side_thread.start()
+        try:
+            asyncio.run(main())
+        finally:
+            side_loop.call_soon_threadsafe(side_loop.stop)
+            side_thread.join()
+            side_loop.close()
+        self.assertEqual(len(record_threads), 1)
+        self.assertNotEqual(record_threads[0], side_thread.ident)
+
+
+@override_settings(
+    SEARCH_CACHE_ENABLED=False, SEARCH_SINGLE_FLIGHT=False, SEARCH_SPECULATIVE_DISPATCH=False,
+    SEARCH_EXECUTION_MODE="concurrent", SEARCH_PROVIDER_BACKEND="sdk", NEAR_DUPLICATE_ENABLED=True,
+)
+class LatencyBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        patcher = mock.patch.object(services, "optimize_queries", lambda query: ({"scholar": query, "doaj": query}, []))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def use_providers(self, fast_results, slow_results, slow_delay=None):
+        def fast(query, num_results=7, timeout=None):
+            return fast_results, None
+
+        def slow(query, num_results=7, timeout=None):
+            if slow_delay is None:
+                self.release.wait(5)
+            else:
+                time.sleep(slow_delay)
+            return slow_results, None
+
+        patcher = mock.patch.object(services.providers, "enabled_providers", return_value=[
+            services.providers.SearchProvider("test_fast", fast, "scholar", "Fast search"),
+            services.providers.SearchProvider("test_slow", slow, "scholar", "Slow search"),
+        ])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, latency_budget):
+        events = list(services.iter_unified_search("protein folding", include_report=False, latency_budget=latency_budget))
+        return events[-1]
+
+    def wait_for_late_result(self, late):
+        result_key = services.late_result_key(late["search_id"], "test_slow")
+        for _ in range(100):
+            if cache.get(result_key) is not None:
+                return
+            time.sleep(0.02)
+        self.fail("The late provider's result was never stored")
+
+    def poll_as_user(self, late, results):
+        user = User.objects.create_user("late-reader", password="secret")
+        self.client.force_login(user)
+        session = self.client.session
+        session['pending_late_results'] = late
+        session['current_search_id'] = search_id = result_store.create_search(user, "protein folding", results)
+        session.save()
+        response = self.client.get(reverse("research_assistant:late_results"))
+        self.assertEqual(response.status_code, 200)
+        return response.json(), result_store.load_results(user, search_id)
+
+    def test_provider_finishing_after_the_budget_is_backfilled(self):
+        self.use_providers(
+            [{"url": "https://example.com/fast", "title": "Protein folding with deep networks"}],
+            [{"url": "https://example.com/slow", "title": "Chaperones and the energy landscape of folding"}],
+        )
+        done = self.search(latency_budget=0.2)
+        self.assertEqual([result.url for result in done["results"]], ["https://example.com/fast"])
+        self.assertEqual(list(done["late"]["providers"]), ["test_slow"])
+
+        self.release.set()
+        self.wait_for_late_result(done["late"])
+        response, stored = self.poll_as_user(done["late"], done["results"])
+        self.assertEqual(response["status"], "done")
+        slow_id = SearchResult("https://example.com/slow").id
+        self.assertEqual([card["id"] for card in response["cards"]], [slow_id])
+        self.assertEqual(set(stored), {done["results"][0].id, slow_id})
+
+    def test_late_near_duplicate_is_folded_into_the_shown_card(self):
+        self.use_providers(
+            [{"url": "https://arxiv.org/abs/2101.00001", "source_type": "Web Article",
+              "title": "Deep learning for protein structure prediction: a survey",
+              "content_snippet": "We review deep learning methods for predicting protein structure from sequence."}],
+            [{"url": "https://doi.org/10.1000/xyz", "source_type": "Scholarly Article",
+              "title": "Deep Learning for Protein Structure Prediction - A Survey",
+              "content_snippet": "We review deep learning methods for predicting protein structure from sequence data."}],
+        )
+        done = self.search(latency_budget=0.2)
+        self.release.set()
+        self.wait_for_late_result(done["late"])
+        response, stored = self.poll_as_user(done["late"], done["results"])
+        primary_id = done["results"][0].id
+        self.assertEqual([card["id"] for card in response["cards"]], [primary_id])
+        self.assertEqual(list(stored), [primary_id])
+        self.assertEqual(stored[primary_id].alternate_urls, ["https://doi.org/10.1000/xyz"])
+
+    def test_search_returns_as_soon_as_every_provider_has_answered(self):
+        self.use_providers(
+            [{"url": "https://example.com/fast", "title": "Protein folding with deep networks"}],
+            [{"url": "https://example.com/slow", "title": "Chaperones and the energy landscape of folding"}],
+            slow_delay=0.1,
+        )
+        started = time.monotonic()
+        done = self.search(latency_budget=5)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertIsNone(done["late"])
+        self.assertEqual(len(done["results"]), 2)
+
+
+class ResultStoreTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("reader", password="secret")
+        self.results = [
+            SearchResult("https://example.com/a", title="Protein folding with deep networks"),
+            SearchResult("https://example.com/b", title="Chaperones and the energy landscape of folding"),
+        ]
+
+    # The manifest only exists after collectstatic
+    @override_settings(STORAGES={"staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}})
+    def test_saved_search_is_reloaded_on_the_results_page(self):
+        search_id = result_store.create_search(self.user, "protein folding", self.results)
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['current_search_id'] = search_id
+        session.save()
+        response = self.client.get(reverse("research_assistant:chat"))
+        self.assertEqual(response.status_code, 200)
+        shown = list(response.context['current_processed_results'])
+        self.assertEqual([result.url for result in shown], ["https://example.com/a", "https://example.com/b"])
+        self.assertContains(response, "Chaperones and the energy landscape of folding")
+
+    def test_searches_are_scoped_to_their_user(self):
+        search_id = result_store.create_search(self.user, "protein folding", self.results)
+        other = User.objects.create_user("someone-else", password="secret")
+        self.assertEqual(result_store.load_results(other, search_id), {})
+        self.assertIsNone(result_store.get_result(other, search_id, self.results[0].id))
+
+    def test_saving_one_result_leaves_the_others_alone(self):
+        search_id = result_store.create_search(self.user, "protein folding", self.results)
+        summarized = result_store.get_result(self.user, search_id, self.results[0].id)
+        summarized.summary = "A short summary."
+        result_store.save_result(self.user, search_id, summarized)
+        stored = result_store.load_results(self.user, search_id)
+        self.assertEqual(stored[self.results[0].id].summary, "A short summary.")
+        self.assertIsNone(stored[self.results[1].id].summary)
+
+    def test_late_results_are_appended_after_the_shown_ones(self):
+        search_id = result_store.create_search(self.user, "protein folding", self.results)
+        updated = SearchResult("https://example.com/b", title="Chaperones and the energy landscape of folding", year="2021")
+        late = SearchResult("https://example.com/c", title="Molecular dynamics of folding intermediates")
+        result_store.save_results(self.user, search_id, [late, updated])
+        stored = result_store.load_results(self.user, search_id)
+        self.assertEqual(list(stored), [self.results[0].id, self.results[1].id, late.id])
+        self.assertEqual(stored[updated.id].year, "2021")
+
+    @override_settings(SEARCH_SESSIONS_KEPT_PER_USER=2)
+    def test_only_the_newest_searches_are_kept(self):
+        search_ids = [result_store.create_search(self.user, f"query {n}", self.results) for n in range(3)]
+        self.assertEqual(result_store.load_results(self.user, search_ids[0]), {})
+        self.assertEqual(len(result_store.load_results(self.user, search_ids[2])), 2)
+
+
+@override_settings(
+    SCRAPE_CACHE_ENABLED=True, SCRAPE_CACHE_TTL=3600, SCRAPE_CACHE_NEGATIVE_TTL=600,
+    SCRAPE_CACHE_TOUCH_INTERVAL=3600, SCRAPE_CACHE_MAX_BYTES=10 ** 9,
+)
+class ScrapeCacheTests(TestCase):
+    url = "https://example.org/paper"
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        patcher = mock.patch.object(scrape_cache.timezone, "now", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def advance(self, seconds):
+        self.now += datetime.timedelta(seconds=seconds)
+
+    def test_entry_goes_stale_after_its_ttl(self):
+        scrape_cache.store(self.url, "Full text", "text/html")
+        page = scrape_cache.lookup("http://www.example.org/paper/?utm_source=feed")
+        self.assertEqual(scrape_cache.get_text(page), "Full text")
+        self.assertTrue(scrape_cache.is_fresh(page))
+        self.advance(3601)
+        page = scrape_cache.lookup(self.url)
+        self.assertFalse(scrape_cache.is_fresh(page))
+        self.assertEqual(scrape_cache.get_text(page), "Full text")
+
+    def test_negative_entry_is_served_until_it_expires(self):
+        scrape_cache.store_failure(self.url, "HTTP 404")
+        with mock.patch.object(services, "_fetch_article_content") as fetch:
+            self.assertEqual(services.scrape_article_content(self.url), (None, "HTTP 404"))
+        fetch.assert_not_called()
+        self.advance(601)
+        self.assertIsNone(scrape_cache.lookup(self.url))
+
+    def test_stale_entry_is_revalidated_with_its_validators(self):
+        scrape_cache.store(self.url, "Full text", "text/html", etag='"v1"', last_modified="Mon, 05 Oct 2026 10:00:00 GMT")
+        self.advance(3601)
+        with mock.patch.object(services, "_fetch_article_content", return_value=(None, None, {"not_modified": True})) as fetch:
+            self.assertEqual(services.scrape_article_content(self.url), ("Full text", None))
+        fetch.assert_called_once_with(self.url, {
+            "If-None-Match": '"v1"', "If-Modified-Since": "Mon, 05 Oct 2026 10:00:00 GMT",
+        })
+        self.assertTrue(scrape_cache.is_fresh(scrape_cache.lookup(self.url)))
+
+    def test_last_use_is_written_at_most_once_per_touch_interval(self):
+        scrape_cache.store(self.url, "Full text")
+        self.advance(60)
+        with self.assertNumQueries(1):
+            scrape_cache.lookup(self.url)
+        self.advance(3600)
+        with self.assertNumQueries(2):
+            page = scrape_cache.lookup(self.url)
+        self.assertEqual(page.last_used_at, self.now)
+
+    def test_least_recently_used_entries_are_evicted_over_the_size_bound(self):
+        texts = {f"https://example.org/paper-{n}": os.urandom(600).hex() for n in range(4)}
+        for url, text in texts.items():
+            scrape_cache.store(url, text)
+            self.advance(1)
+        size = ScrapedPage.objects.get(url_id=url_id("https://example.org/paper-0")).size
+        with override_settings(SCRAPE_CACHE_TOUCH_INTERVAL=0):
+            scrape_cache.lookup("https://example.org/paper-0") # Now the most recently used
+        with override_settings(SCRAPE_CACHE_MAX_BYTES=int(size * 4.5)):
+            scrape_cache.store("https://example.org/paper-4", os.urandom(600).hex())
+        kept = set(ScrapedPage.objects.values_list('url', flat=True))
+        self.assertNotIn("https://example.org/paper-1", kept)
+        self.assertIn("https://example.org/paper-0", kept)
+        self.assertIn("https://example.org/paper-4", kept)
+
+    def test_running_size_total_tracks_replaced_entries(self):
+        scrape_cache.store(self.url, os.urandom(300).hex())
+        scrape_cache.store(self.url, os.urandom(100).hex())
+        with self.assertNumQueries(0):
+            total = scrape_cache._total_bytes(0)
+        self.assertEqual(total, ScrapedPage.objects.get(url_id=url_id(self.url)).size)
+
+
+@override_settings(SEARCH_PROVIDER_OVERRIDES={}, SEARCH_DISABLED_COST_CLASSES=[])
+class ProviderRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.search_fn = mock.Mock(return_value=([], None))
+        providers.register(providers.SearchProvider(
+            "test_source", self.search_fn, "scholar", "Test source", num_results=7, timeout=30, cost_class=providers.FREE,
+        ))
+        self.addCleanup(providers._registry.pop, "test_source", None)
+
+    def enabled(self):
+        return {provider.key: provider for provider in providers.enabled_providers()}
+
+    def test_registration_order_is_merge_order(self):
+        self.assertEqual(
+            [provider.key for provider in providers.all_providers()],
+            ["tavily", "scholar", "exa", "doaj", "doaj_journals", "test_source"],
+        )
+
+    def test_disabled_provider_is_not_searched(self):
+        ProviderConfig.objects.create(key="test_source", enabled=False)
+        self.assertNotIn("test_source", self.enabled())
+        self.assertIn("tavily", self.enabled())
+
+    @override_settings(SEARCH_DISABLED_COST_CLASSES=[providers.PREMIUM])
+    def test_disabled_cost_class_is_not_searched(self):
+        self.assertNotIn("scholar", self.enabled())
+        self.assertIn("test_source", self.enabled())
+
+    def test_admin_overrides_win_over_settings_field_by_field(self):
+        with override_settings(SEARCH_PROVIDER_OVERRIDES={"test_source": {"num_results": 10, "timeout": 20}}):
+            self.assertEqual((self.enabled()["test_source"].num_results, self.enabled()["test_source"].timeout), (10, 20))
+            ProviderConfig.objects.create(key="test_source", num_results=3)
+            provider = self.enabled()["test_source"]
+        self.assertEqual((provider.num_results, provider.timeout), (3, 20))
+        provider.search("protein folding", timeout=5)
+        self.search_fn.assert_called_once_with("protein folding", num_results=3, timeout=5)
+        self.assertEqual(providers.get_provider("test_source").num_results, 7) # The registered default is untouched
+
+    def test_admin_changes_apply_to_the_next_search(self):
+        config = ProviderConfig.objects.create(key="test_source", num_results=3)
+        self.assertEqual(self.enabled()["test_source"].num_results, 3)
+        config.num_results = 4
+        config.save()
+        self.assertEqual(self.enabled()["test_source"].num_results, 4)
+        config.delete()
+        self.assertEqual(self.enabled()["test_source"].num_results, 7)
+
+    @override_settings(
+        SEARCH_EXECUTION_MODE="sequential", SEARCH_PROVIDER_BACKEND="sdk",
+        STORAGES={"staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}},
+    )
+    def test_timeout_ceiling_set_in_the_admin_is_applied(self):
+        self.client.force_login(User.objects.create_superuser("admin", password="secret"))
+        response = self.client.post(reverse("admin:research_assistant_providerconfig_add"), {
+            "key": "test_source", "enabled": "on", "num_results": "", "timeout": "2.5",
+        })
+        self.assertEqual(response.status_code, 302)
+        provider = self.enabled()["test_source"]
+        services._submit_provider_search(provider, "protein folding").result()
+        self.search_fn.assert_called_once_with("protein folding", num_results=7, timeout=2.5)
+
+
+@override_settings(
+    SEARCH_CACHE_ENABLED=True, SEARCH_CACHE_TTL=3600, SEARCH_CACHE_STALE_TTL=86400, SEARCH_SINGLE_FLIGHT=False,
+    SEARCH_SPECULATIVE_DISPATCH=False, SEARCH_EXECUTION_MODE="concurrent", SEARCH_PROVIDER_BACKEND="sdk",
+)
+class SearchCacheTests(SimpleTestCase):
+    query = "protein folding"
+
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        self.addCleanup(self.release.set)
+        for patcher in (
+            mock.patch.object(services, "optimize_queries", lambda query: ({"scholar": query, "doaj": query}, [])),
+            mock.patch.object(services.providers, "enabled_providers", return_value=[
+                services.providers.SearchProvider("test_cached", self.search, "scholar", "Cached search"),
+            ]),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def search(self, query, num_results=7, timeout=None):
+        self.calls.append(query)
+        self.release.wait(5)
+        return [{"url": f"https://example.com/{len(self.calls)}", "title": "Protein folding with deep networks"}], None
+
+    def run_search(self):
+        events = list(services.iter_unified_search(self.query, include_report=False))
+        return [event["type"] for event in events], [result.url for result in events[-1]["results"]]
+
+    def cache_key(self):
+        return search_cache.make_key("search", self.query, ["test_cached:7"])
+
+    def test_miss_searches_and_stores_the_result_set(self):
+        types, urls = self.run_search()
+        self.assertEqual(types, ["provider", "done"])
+        self.assertEqual(urls, ["https://example.com/1"])
+        cached, state = search_cache.lookup(self.cache_key())
+        self.assertEqual(([result["url"] for result in cached], state), (urls, search_cache.FRESH))
+        self.assertEqual(search_cache.get_stats("search")["misses"], 1)
+
+    def test_fresh_hit_is_served_without_searching(self):
+        self.run_search()
+        types, urls = self.run_search()
+        self.assertEqual((types, urls), (["done"], ["https://example.com/1"]))
+        self.assertEqual(len(self.calls), 1)
+
+    def test_stale_hits_are_served_and_start_exactly_one_refresh(self):
+        with override_settings(SEARCH_CACHE_TTL=0):
+            self.run_search()
+        self.release.clear()
+        for _ in range(3):
+            self.assertEqual(self.run_search(), (["done"], ["https://example.com/1"]))
+        self.release.set()
+        for _ in range(100):
+            if search_cache.lookup(self.cache_key())[1] == search_cache.FRESH:
+                break
+            time.sleep(0.02)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.run_search(), (["done"], ["https://example.com/2"]))
+        self.assertTrue(search_cache.claim_refresh(self.cache_key())) # The refresh released its claim
@@ -9,11 +9,14 @@ urlpatterns = [
     # All these views now require a user to be logged in
     path('', login_required(views.home_view), name='home'), # Home now requires login
     path('chat/', login_required(views.chat_view), name='chat'),
+    path('search_stream/', login_required(views.search_stream_view), name='search_stream'), # Server-Sent Events stream of a pending search
+    path('report_status/', login_required(views.report_status_view), name='report_status'), # Polled by the chat page for the background research report
+    path('late_results/', login_required(views.late_results_view), name='late_results'), # Polled by the chat page for providers that missed the latency budget
     path('library/', login_required(views.library_view), name='library'),
     path('create_folder/', login_required(views.create_folder_view), name='create_folder'),
     path('delete_folder/<uuid:folder_id>/', login_required(views.delete_folder_view), name='delete_folder'), # Changed to UUID
-    path('process_result/<path:url_id>/', login_required(views.process_result_view), name='process_result'), # Using path for URL_id (which can contain slashes)
-    path('save_item/<path:url_id>/', login_required(views.save_item_view), name='save_item'), # Using path for URL_id
+    path('process_result/<slug:result_id>/', login_required(views.process_result_view), name='process_result'), # Short id of the result's canonical URL
+    path('save_item/<slug:result_id>/', login_required(views.save_item_view), name='save_item'), # Short id of the result's canonical URL
     path('delete_library_item/<uuid:item_id>/', login_required(views.delete_library_item_view), name='delete_library_item'), # Changed to UUID
     path('start_new_research/', login_required(views.start_new_research_session_view), name='start_new_research'),
     path('clear_chat_display/', login_required(views.clear_chat_display_view), name='clear_chat_display'),
@@ -6,7 +6,11 @@ from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User # Import User model
-from . import services # Import your services module
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.template.defaultfilters import linebreaksbr
+from . import result_store, services # Import your services module
 from .models import Folder, LibraryItem, ChatMessage # Import your new models
 
 # Initialize clients (will be called on first import, handles single instance)
@@ -16,7 +20,9 @@ def process_query_and_respond(request, query_text, user):
     """Helper function to encapsulate query processing and response generation."""
     messages.info(request, "🧠 Thinking... Searching across multiple sources (Tavily, Google Scholar, Exa.ai, DOAJ) and generating a research report...")
     
-    combined_results, exa_research_report, search_errors = services.perform_unified_search(query_text)
+    # With a deferred report the results are shown right away and the chat page polls report_status_view
+    defer_report = getattr(settings, 'EXA_REPORT_DEFERRED', True)
+    combined_results, exa_research_report, search_errors, late_providers = services.perform_unified_search(query_text, include_report=not defer_report)
     
     for err in search_errors:
         messages.warning(request, err)
@@ -24,20 +30,54 @@ def process_query_and_respond(request, query_text, user):
     # Store the query for the main heading in session (temporary display)
     request.session['last_search_query'] = query_text
     
-    # Store the Exa.ai research report separately in session (temporary display)
-    request.session['last_exa_report'] = exa_research_report if exa_research_report and exa_research_report.strip() != "No report content generated." else None
+    if defer_report:
+        request.session['last_exa_report'] = None
+        request.session['pending_report_key'] = services.start_research_report(query_text)
+    else:
+        # Store the Exa.ai research report separately in session (temporary display)
+        request.session['last_exa_report'] = _displayable_report(exa_research_report)
+
+    _store_search_results(request, query_text, combined_results, user, late_providers)
 
+def _store_search_results(request, query_text, combined_results, user, late_providers=None):
+    """Stores merged results for the session's current search and records the assistant's reply. Returns the reply text."""
+    # Providers that missed the latency budget are merged in later by late_results_view
+    request.session['pending_late_results'] = late_providers
+    # The results go to the database; the session only keeps the search id (see result_store.py)
+    request.session['current_search_id'] = result_store.create_search(user, query_text, combined_results)
     if combined_results:
-        # Store results in session by URL for processing actions
-        request.session['current_processed_results'] = {res['url']: res for res in combined_results}
         assistant_chat_message = f"Found {len(combined_results)} potential sources for '{query_text}'. Please see the results below."
+    elif late_providers:
+        assistant_chat_message = f"⏳ No results for '{query_text}' yet. Slower sources are still being searched; their results will appear below."
     else:
-        request.session['current_processed_results'] = {}
         assistant_chat_message = f"😕 Sorry, I couldn't find specific individual results for '{query_text}' from any source."
 
     # Append a concise assistant message to the chat history in the database
     ChatMessage.objects.create(user=user, role="assistant", content=assistant_chat_message)
     request.session.modified = True # Ensure session is saved if any session data was updated
+    return assistant_chat_message
+
+def _streaming_enabled():
+    return getattr(settings, 'SEARCH_STREAMING_ENABLED', True)
+
+def _sse_event(event, data):
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _render_result_cards(request, results, folders):
+    """Renders search result cards with the same partial the chat page uses."""
+    return "".join(
+        render_to_string('research_assistant/_result_card.html', {
+            'result': result,
+            'folders': folders,
+            'show_citations_search': {},
+        }, request=request)
+        for result in results
+    )
+
+def _displayable_report(report):
+    """Returns the report text to show, or None if the research task produced nothing."""
+    return report if report and report.strip() != "No report content generated." else None
 
 def landing_page_view(request):
     """
@@ -58,8 +98,8 @@ def home_view(request):
         if 'messages_display' in request.session: # Renamed from 'messages' to avoid conflict with Django messages
             del request.session['messages_display']
             request.session.modified = True
-        if 'current_processed_results' in request.session:
-            del request.session['current_processed_results']
+        if 'current_search_id' in request.session:
+            del request.session['current_search_id']
             request.session.modified = True
         if 'show_citations_search' in request.session:
             del request.session['show_citations_search']
@@ -70,6 +110,15 @@ def home_view(request):
         if 'last_exa_report' in request.session:
             del request.session['last_exa_report']
             request.session.modified = True
+        if 'pending_report_key' in request.session:
+            del request.session['pending_report_key']
+            request.session.modified = True
+        if 'pending_search_query' in request.session:
+            del request.session['pending_search_query']
+            request.session.modified = True
+        if 'pending_late_results' in request.session:
+            del request.session['pending_late_results']
+            request.session.modified = True
     
     if request.method == 'POST':
         initial_query = request.POST.get('initial_query')
@@ -118,8 +167,12 @@ def chat_view(request):
             request.session['messages_display'] = messages_display
             request.session.modified = True
             
-            # Process the query and respond
-            process_query_and_respond(request, prompt, request.user)
+            if _streaming_enabled():
+                # The chat page streams the results from search_stream_view
+                request.session['pending_search_query'] = prompt
+            else:
+                # Process the query and respond
+                process_query_and_respond(request, prompt, request.user)
             return redirect('research_assistant:chat') # Redirect to prevent re-submission on refresh
 
     elif request.method == 'GET':
@@ -133,7 +186,11 @@ def chat_view(request):
                 messages_display.append({"role": "user", "content": prompt_to_process})
                 request.session['messages_display'] = messages_display
                 request.session.modified = True
-                process_query_and_respond(request, prompt_to_process, request.user)
+                if _streaming_enabled():
+                    # Render the page right away; it streams the results from search_stream_view
+                    request.session['pending_search_query'] = prompt_to_process
+                else:
+                    process_query_and_respond(request, prompt_to_process, request.user)
                 # After processing, redirect again to clear the flag and ensure PRG pattern
                 return redirect('research_assistant:chat')
         
@@ -145,7 +202,7 @@ def chat_view(request):
             request.session.modified = True
 
     # Context setup for rendering
-    current_processed_results = request.session.get('current_processed_results', {})
+    current_processed_results = result_store.load_results(request.user, request.session.get('current_search_id'))
     folders = Folder.objects.filter(user=request.user).order_by('name')
     
     selected_folder_id = request.session.get('selected_folder_id')
@@ -165,10 +222,118 @@ def chat_view(request):
         'messages_history': messages_history, # This is for the sidebar chat history
         'last_search_query': request.session.get('last_search_query'),
         'last_exa_report': request.session.get('last_exa_report'),
+        'report_pending': bool(request.session.get('pending_report_key')),
+        'pending_search_query': request.session.get('pending_search_query'),
+        'late_results_pending': bool(request.session.get('pending_late_results')),
         'messages_display': messages_display, # This is for the main chat window display
     }
     return render(request, 'research_assistant/chat.html', context)
 
+@login_required
+def search_stream_view(request):
+    """
+    Runs the pending search and streams its progress as Server-Sent Events:
+    'cards' as each provider finishes, 'warning' for provider errors, and a final 'done' event
+    with the complete, deterministically merged result set, which is also persisted to the session.
+    """
+    query_text = request.session.pop('pending_search_query', None)
+    if not query_text:
+        return StreamingHttpResponse(iter([_sse_event('done', {'html': None, 'message': None})]), content_type='text/event-stream')
+
+    user = request.user
+    folders = list(Folder.objects.filter(user=user).order_by('name'))
+    defer_report = getattr(settings, 'EXA_REPORT_DEFERRED', True)
+    if defer_report:
+        # Start the report before the providers so it overlaps with them
+        request.session['pending_report_key'] = services.start_research_report(query_text)
+        request.session['last_exa_report'] = None
+
+    def event_stream():
+        for event in services.iter_unified_search(query_text, include_report=not defer_report):
+            if event['type'] == 'error':
+                yield _sse_event('warning', {'message': event['message']})
+            elif event['type'] == 'provider':
+                yield _sse_event('cards', {
+                    'provider': event['provider'],
+                    'cards': [
+                        {'id': result.id, 'html': _render_result_cards(request, [result], folders)}
+                        for result in event['results']
+                    ],
+                })
+            elif event['type'] == 'done':
+                request.session['last_search_query'] = query_text
+                if not defer_report:
+                    request.session['last_exa_report'] = _displayable_report(event['report'])
+                assistant_chat_message = _store_search_results(request, query_text, event['results'], user, event['late'])
+                # The session middleware has already run for this streaming response, so save explicitly
+                request.session.save()
+                yield _sse_event('done', {
+                    'html': _render_result_cards(request, event['results'], folders),
+                    'message': assistant_chat_message,
+                    'report_pending': defer_report,
+                    'report_html': None if defer_report else linebreaksbr(request.session['last_exa_report'] or ''),
+                    'late_results_pending': bool(event['late']),
+                })
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Disable proxy buffering so events arrive as they are sent
+    return response
+
+@login_required
+def report_status_view(request):
+    """
+    Lightweight polling endpoint for the background Exa.ai research report.
+    Moves the finished report into the session so later page loads render it directly.
+    """
+    report_key = request.session.get('pending_report_key')
+    if not report_key:
+        report = request.session.get('last_exa_report')
+        return JsonResponse({"status": "done", "html": linebreaksbr(report) if report else None})
+
+    state = services.get_research_report(report_key)
+    if state is None:
+        # The task expired or its worker died before finishing
+        del request.session['pending_report_key']
+        return JsonResponse({"status": "failed", "html": None})
+    if state["status"] != "done":
+        return JsonResponse({"status": "pending"})
+
+    report = _displayable_report(state.get("report"))
+    request.session['last_exa_report'] = report
+    del request.session['pending_report_key']
+    return JsonResponse({"status": "done", "html": linebreaksbr(report) if report else None})
+
+@login_required
+def late_results_view(request):
+    """
+    Polling endpoint for providers that missed the search latency budget.
+    Merges the late results that have arrived into the session's result set and returns their cards.
+    """
+    late_providers = request.session.get('pending_late_results')
+    if not late_providers:
+        return JsonResponse({"status": "done", "cards": [], "warnings": []})
+
+    search_id = request.session.get('current_search_id')
+    current_processed_results = result_store.load_results(request.user, search_id)
+    known_ids = set(current_processed_results)
+    changed_results, late_errors, still_late = services.poll_late_results(late_providers, current_processed_results)
+    result_store.save_results(request.user, search_id, changed_results)
+    # Late duplicates of cards already shown were folded into them
+    result_store.delete_results(request.user, search_id, known_ids - set(current_processed_results))
+    request.session['pending_late_results'] = still_late
+    request.session.modified = True
+
+    folders = list(Folder.objects.filter(user=request.user).order_by('name'))
+    return JsonResponse({
+        "status": "pending" if still_late else "done",
+        "cards": [
+            {"id": result.id, "html": _render_result_cards(request, [result], folders)}
+            for result in changed_results
+        ],
+        "warnings": late_errors,
+    })
+
 @login_required
 def library_view(request):
     if request.method == 'POST':
@@ -298,116 +463,99 @@ def delete_folder_view(request, folder_id):
     return redirect('research_assistant:library')
 
 @login_required
-def process_result_view(request, url_id):
+def process_result_view(request, result_id):
     """Handles summarize, annotate, and cite actions for search results."""
-    current_processed_results = request.session.get('current_processed_results', {})
-    result_data = current_processed_results.get(url_id)
+    search_id = request.session.get('current_search_id')
+    result_data = result_store.get_result(request.user, search_id, result_id)
 
     if not result_data:
         messages.error(request, "Result not found or session expired.")
         return redirect('research_assistant:chat')
 
     action = request.POST.get('action')
-    url = result_data['url'] # Use original URL for scraping
+    url = result_data.url # Use original URL for scraping
 
     if action == 'summarize':
-        is_journal_entry = (result_data.get('source_type') == "DOAJ Journal")
+        is_journal_entry = (result_data.source_type == "DOAJ Journal")
         if is_journal_entry:
             messages.warning(request, "Summarization is not applicable for journal entries.")
             return redirect('research_assistant:chat')
 
         messages.info(request, "Preparing content for summary...")
-        text_for_summary = result_data["content_snippet"]
-        scraped_content = None
-        
-        # Prioritize PDF, then main_pub_url, then original url for scraping
-        urls_to_try = []
-        if result_data.get('pdf_url'):
-            urls_to_try.append({"url": result_data['pdf_url'], "type": "pdf"})
-        if result_data.get('main_pub_url') and result_data['main_pub_url'] != result_data.get('pdf_url'):
-            urls_to_try.append({"url": result_data['main_pub_url'], "type": "html"})
-        if url and url != result_data.get('pdf_url') and url != result_data.get('main_pub_url'):
-            urls_to_try.append({"url": url, "type": "html"})
-        # If the original URL was the only one and it was a PDF, ensure it's tried as HTML too
-        if url and ".pdf" in url.lower() and not any(d['url'] == url and d['type'] == 'html' for d in urls_to_try):
-            urls_to_try.append({"url": url, "type": "html"})
-
-        for attempt in urls_to_try:
-            temp_scraped_content, temp_scrape_error = services.scrape_article_content(attempt["url"])
-            if temp_scraped_content and len(temp_scraped_content) > 200: # Consider it successful if substantial content
-                scraped_content = temp_scraped_content
-                text_for_summary = scraped_content
-                break # Stop trying if we got good content
-            else:
-                messages.warning(request, f"Scraping attempt for {attempt['url']} failed: {temp_scrape_error}")
+        text_for_summary = result_data.content_snippet
+
+        # Prefers the PDF, then main_pub_url, then the original url; candidates are scraped in parallel
+        scraped_content, scrape_failures = services.scrape_best_candidate(result_data)
+        for failed_url, temp_scrape_error in scrape_failures:
+            messages.warning(request, f"Scraping attempt for {failed_url} failed: {temp_scrape_error}")
+        if scraped_content:
+            text_for_summary = scraped_content
 
         if not scraped_content or len(text_for_summary) < 200:
-            text_for_summary = result_data["content_snippet"]
+            text_for_summary = result_data.content_snippet
             if not text_for_summary:
                 messages.error(request, "No content available to summarize (PDF, HTML, or snippet failed/empty).")
                 return redirect('research_assistant:chat')
             messages.info(request, "Using snippet for summary as full content could not be scraped.")
 
         prompt_structured_sum = services.generate_structured_summary_prompt(
-            title=result_data['title'],
-            authors=result_data.get('authors', ''),
-            year=result_data.get('year', ''),
-            journal_name=result_data.get('journal_name', ''),
-            doi=result_data.get('doi', ''),
+            title=result_data.title,
+            authors=result_data.authors,
+            year=result_data.year,
+            journal_name=result_data.journal_name,
+            doi=result_data.doi,
             content_to_summarize=text_for_summary,
             url=url
         )
         generated_summary, error_structured = services.generate_gemini(prompt_structured_sum)
 
         if not error_structured and generated_summary:
-            current_processed_results[url_id]["summary"] = generated_summary
+            result_data.summary = generated_summary
             messages.success(request, "Summary generated successfully.")
         else:
             messages.error(request, f"Summary generation failed: {error_structured or 'Unknown API error'}. Please check content or try again.")
         
-        request.session['current_processed_results'] = current_processed_results
-        request.session.modified = True
+        result_store.save_result(request.user, search_id, result_data)
         return redirect('research_assistant:chat')
 
     elif action == 'annotate':
-        is_journal_entry = (result_data.get('source_type') == "DOAJ Journal")
+        is_journal_entry = (result_data.source_type == "DOAJ Journal")
         if is_journal_entry:
             messages.warning(request, "Annotation is not applicable for journal entries.")
             return redirect('research_assistant:chat')
         
-        if not result_data.get('summary'):
+        if not result_data.summary:
             messages.warning(request, "Please generate a summary first before annotating.")
             return redirect('research_assistant:chat')
         
         messages.info(request, "Generating annotation...")
         prompt_ann = services.generate_annotation_prompt(
-            result_data['title'], url, result_data['optimized_query'], 
-            result_data['summary'], result_data.get('authors', ''), result_data.get('year', '')
+            result_data.title, url, result_data.optimized_query, 
+            result_data.summary, result_data.authors, result_data.year
         )
         generated_annotation, error = services.generate_gemini(prompt_ann)
         if not error and generated_annotation:
-            current_processed_results[url_id]["annotation"] = generated_annotation
+            result_data.annotation = generated_annotation
             messages.success(request, "Annotation generated successfully.")
         else:
             messages.error(request, f"Annotation failed: {error or 'Unknown error'}")
         
-        request.session['current_processed_results'] = current_processed_results
-        request.session.modified = True
+        result_store.save_result(request.user, search_id, result_data)
         return redirect('research_assistant:chat')
 
     elif action == 'cite':
         citations = services.generate_citations(result_data)
         # Store citations in session to display in the template
         show_citations_search = request.session.get('show_citations_search', {})
-        show_citations_search[url_id] = citations
+        show_citations_search[result_id] = citations
         request.session['show_citations_search'] = show_citations_search
         request.session.modified = True
         return redirect('research_assistant:chat')
     
     elif action == 'close_cite_search':
         show_citations_search = request.session.get('show_citations_search', {})
-        if url_id in show_citations_search:
-            del show_citations_search[url_id]
+        if result_id in show_citations_search:
+            del show_citations_search[result_id]
             request.session['show_citations_search'] = show_citations_search
             request.session.modified = True
         return redirect('research_assistant:chat')
@@ -416,10 +564,10 @@ def process_result_view(request, url_id):
     return redirect('research_assistant:chat')
 
 @login_required
-def save_item_view(request, url_id):
+def save_item_view(request, result_id):
     if request.method == 'POST':
-        current_processed_results = request.session.get('current_processed_results', {})
-        result_data = current_processed_results.get(url_id)
+        search_id = request.session.get('current_search_id')
+        result_data = result_store.get_result(request.user, search_id, result_id)
 
         if not result_data:
             messages.error(request, "Item to save not found or session expired.")
@@ -432,45 +580,34 @@ def save_item_view(request, url_id):
             # Ensure the folder belongs to the current user
             folder_obj = get_object_or_404(Folder, user=request.user, id=selected_save_folder_id)
 
-        title = result_data["title"]
-        url = result_data["url"]
-        query = result_data["query"]
-        source_type = result_data["source_type"]
-        content_snippet = result_data["content_snippet"]
-        authors = result_data.get("authors", "")
-        year = result_data.get("year", "")
-        pdf_url = result_data.get("pdf_url", "")
-        main_pub_url = result_data.get("main_pub_url", "")
-        doi = result_data.get("doi", "")
-        journal_name = result_data.get("journal_name", "")
-        volume = result_data.get("volume", "")
-        pages = result_data.get("pages", "")
-        publisher = result_data.get("publisher", "")
-        issn = result_data.get("issn", "")
-
-        current_summary = result_data.get("summary")
-        current_annotation = result_data.get("annotation")
+        title = result_data.title
+        url = result_data.url
+        query = result_data.query
+        source_type = result_data.source_type
+        content_snippet = result_data.content_snippet
+        authors = result_data.authors
+        year = result_data.year
+        pdf_url = result_data.pdf_url
+        main_pub_url = result_data.main_pub_url
+        doi = result_data.doi
+        journal_name = result_data.journal_name
+        volume = result_data.volume
+        pages = result_data.pages
+        publisher = result_data.publisher
+        issn = result_data.issn
+
+        current_summary = result_data.summary
+        current_annotation = result_data.annotation
         is_journal_entry = (source_type == "DOAJ Journal")
 
         # Auto-generate summary if not present and not a journal entry
         if not current_summary and not is_journal_entry:
             messages.info(request, "Generating summary before saving...")
             text_to_summarize_for_save = content_snippet
-            scraped_content_for_save = None
-
-            urls_to_try_for_save = []
-            if pdf_url: urls_to_try_for_save.append({"url": pdf_url, "type": "pdf"})
-            if main_pub_url and main_pub_url != pdf_url: urls_to_try_for_save.append({"url": main_pub_url, "type": "html"})
-            if url and url != pdf_url and url != main_pub_url: urls_to_try_for_save.append({"url": url, "type": "html"})
-            if url and ".pdf" in url.lower() and not any(d['url'] == url and d['type'] == 'html' for d in urls_to_try_for_save):
-                urls_to_try_for_save.append({"url": url, "type": "html"})
-
-            for attempt in urls_to_try_for_save:
-                temp_scraped_content, temp_scrape_error = services.scrape_article_content(attempt["url"])
-                if temp_scraped_content and len(temp_scraped_content) > 200:
-                    scraped_content_for_save = temp_scraped_content
-                    text_to_summarize_for_save = scraped_content_for_save
-                    break
+
+            scraped_content_for_save, _scrape_failures = services.scrape_best_candidate(result_data)
+            if scraped_content_for_save:
+                text_to_summarize_for_save = scraped_content_for_save
             
             if not scraped_content_for_save or len(text_to_summarize_for_save) < 200:
                 text_to_summarize_for_save = content_snippet
@@ -493,7 +630,7 @@ def save_item_view(request, url_id):
                 if error_structured_save or not current_summary:
                     messages.warning(request, f"Summary generation failed for saving: {error_structured_save}. Saving without summary.")
                     current_summary = ""
-                result_data["summary"] = current_summary # Update in session for potential future use
+                result_data.summary = current_summary # Update in session for potential future use
 
         # Auto-generate annotation if not present and summary exists (and not a journal entry)
         if not current_annotation and current_summary and not is_journal_entry:
@@ -505,7 +642,7 @@ def save_item_view(request, url_id):
             if error_ann or not current_annotation:
                 messages.warning(request, "Failed to generate annotation, saving without it.")
                 current_annotation = ""
-            result_data["annotation"] = current_annotation # Update in session
+            result_data.annotation = current_annotation # Update in session
         elif is_journal_entry:
             current_annotation = "" # Ensure annotation is empty for journals
 
@@ -532,13 +669,12 @@ def save_item_view(request, url_id):
                 issn=issn
             )
             messages.success(request, f"Item '{title[:30]}...' saved.")
-            # Remove from current_processed_results after saving to avoid re-saving
-            if url_id in current_processed_results:
-                del current_processed_results[url_id]
-                request.session['current_processed_results'] = current_processed_results
-                request.session.modified = True
+            # Remove from the current results after saving to avoid re-saving
+            result_store.delete_results(request.user, search_id, [result_id])
         except Exception as e:
             messages.error(request, f"Error saving item: {e}. It might already be saved or there was a database issue.")
+            # Keep the summary and annotation generated above
+            result_store.save_result(request.user, search_id, result_data)
         return redirect('research_assistant:chat')
     return redirect('research_assistant:chat')
 
@@ -562,8 +698,8 @@ def start_new_research_session_view(request):
     # This does NOT clear persistent chat history or library items from the DB.
     if 'messages_display' in request.session:
         del request.session['messages_display']
-    if 'current_processed_results' in request.session:
-        del request.session['current_processed_results']
+    if 'current_search_id' in request.session:
+        del request.session['current_search_id']
     if 'show_citations_search' in request.session:
         del request.session['show_citations_search']
     if 'just_submitted_initial_query' in request.session:
@@ -572,6 +708,12 @@ def start_new_research_session_view(request):
         del request.session['last_search_query']
     if 'last_exa_report' in request.session:
         del request.session['last_exa_report']
+    if 'pending_report_key' in request.session:
+        del request.session['pending_report_key']
+    if 'pending_search_query' in request.session:
+        del request.session['pending_search_query']
+    if 'pending_late_results' in request.session:
+        del request.session['pending_late_results']
     
     request.session.modified = True
     messages.info(request, "Started a new research session. Chat display cleared.")
@@ -583,8 +725,8 @@ def clear_chat_display_view(request):
     if 'messages_display' in request.session:
         del request.session['messages_display']
         request.session.modified = True
-    if 'current_processed_results' in request.session:
-        del request.session['current_processed_results']
+    if 'current_search_id' in request.session:
+        del request.session['current_search_id']
         request.session.modified = True
     if 'show_citations_search' in request.session:
         del request.session['show_citations_search']
@@ -593,6 +735,12 @@ def clear_chat_display_view(request):
         del request.session['last_search_query']
     if 'last_exa_report' in request.session:
         del request.session['last_exa_report']
+    if 'pending_report_key' in request.session:
+        del request.session['pending_report_key']
+    if 'pending_search_query' in request.session:
+        del request.session['pending_search_query']
+    if 'pending_late_results' in request.session:
+        del request.session['pending_late_results']
     messages.info(request, "Chat display cleared.")
     return redirect('research_assistant:chat')
 